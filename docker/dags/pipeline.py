@@ -25,6 +25,14 @@ from airflow.utils.task_group import TaskGroup
 from crawl_data.crawl_data import crawl_all_sites
 from process_data.processdt import main as process_main
 from process_data.connect_mongo import main as connect_mongo_main # Tên file là connect_mongo.py, hàm là connect_mongo_main
+from process_data.stream import crawl_and_process
+from crawl_data.scheduler import plan_crawl, CrawlScheduler
+from crawl_data.sharding import discover_shards, run_shard, merge_shards
+
+# Số shard tải bài khi crawl phân tán trên nhiều worker Celery (đọc khi parse DAG).
+# 1 = crawl trên một worker như cũ; N > 1 = task discover_links, N task fetch_shard_<k> chạy song song
+# trên các worker (thêm worker: docker compose up --scale airflow-worker=N), rồi task crawl_data gộp kết quả
+CRAWL_SHARDS = int(os.environ.get('SIC_CRAWL_SHARDS', '1'))
 
 # Định nghĩa các arguments mặc định
 default_args = {
@@ -46,9 +54,58 @@ with DAG(
     schedule_interval=timedelta(hours=6),  # Chạy mỗi 6 giờ
     catchup=False,
     max_active_runs=1,
-    tags=['data', 'pipeline', 'etl']
+    tags=['data', 'pipeline', 'etl'],
+    params={
+        'browser_workers': 2,  # Số Chrome headless chạy song song khi crawl
+        'streaming': True,  # Tiền xử lý + NER ngay khi từng bài được crawl xong, thay vì chờ hết lượt crawl
+        'ner_workers': 2,  # Số worker tiền xử lý + NER khi chạy streaming
+        'use_scheduler': True,  # Bỏ qua trang không có bài mới, crawl sâu hơn ở trang đăng bài nhanh
+        'crawl_deadline_minutes': 60,  # Thời gian tối đa cho bước crawl, hết giờ thì lưu các bài đã có
+        'persistent_profile': True,  # Giữ profile Chrome (cache CSS/JS) giữa các lần chạy, mỗi worker một thư mục
+        'profile_cache_mb': 512,  # Dung lượng tối đa của các profile Chrome giữ lại
+        'full_reprocess': False,  # Tiền xử lý lại toàn bộ kho bài thô thay vì chỉ các bài mới từ lần chạy trước
+        'process_workers': 2,  # Số process tiền xử lý + NER khi không chạy streaming (mỗi process nạp một bản PhoBERT)
+    },
 ) as dag: # <-- Bắt đầu ngữ cảnh của DAG
 
+    # In tổng kết và đẩy kết quả crawl cho các task tiếp theo (dùng chung cho crawl một worker và crawl phân tán)
+    def push_crawl_results(context, results):
+        # Kiểm tra kết quả
+        success_count = 0
+        total_articles = 0
+
+        for site, result in results.items():
+            if result["success"]:
+                success_count += 1
+                total_articles += result["count"]
+                print(f"✅ {site}: {result['count']} bài báo")
+            else:
+                print(f"❌ {site}: {result['error']}")
+
+        print(f"📊 Tổng kết: {success_count}/{len(results)} trang thành công, {total_articles} bài báo")
+        
+        # Trả về kết quả cho các task tiếp theo
+        context['task_instance'].xcom_push(key='crawl_results', value=results)
+        context['task_instance'].xcom_push(key='total_articles', value=total_articles)
+        # Số liệu p50/p95 từng bước và trang/giây của từng trang, để so sánh giữa các lần chạy
+        telemetry = {site: result.get("telemetry") for site, result in results.items()}
+        context['task_instance'].xcom_push(key='crawl_telemetry', value=telemetry)
+
+    # Thư mục data/shards/<run_id> của lượt chạy hiện tại
+    def get_shard_run_id(context):
+        return context['run_id'].replace(':', '-').replace('+', '_')
+
+    # Tham số profile Chrome, dùng chung cho mọi task mở trình duyệt
+    def get_profile_kwargs(context):
+        return {
+            'persistent_profile': bool(context['params'].get('persistent_profile', True)),
+            'profile_cache_mb': int(context['params'].get('profile_cache_mb', 512)),
+        }
+
+    def get_deadline_seconds(context):
+        deadline_minutes = context['params'].get('crawl_deadline_minutes')
+        return float(deadline_minutes) * 60 if deadline_minutes else None
+
     # Hàm wrapper cho crawl_data (giữ nguyên)
     def run_crawl_data(**context):
         """
@@ -57,32 +114,68 @@ with DAG(
         try:
             print("Bắt đầu crawl dữ liệu từ tất cả các trang báo...")
             # Crawl từ tất cả các trang với limit 50 bài/trang
-            results = crawl_all_sites(limit=50)
+            # Số Chrome chạy song song lấy từ params của DAG (có thể đổi khi trigger thủ công)
+            browser_workers = int(context['params'].get('browser_workers', 2))
+            scheduler, schedule, site_limits = None, [], None
+            if context['params'].get('use_scheduler', True):
+                # Lịch crawl: trang nào, bao nhiêu bài, theo thứ tự ưu tiên
+                scheduler, schedule, site_limits = plan_crawl(default_limit=50)
 
-            # Kiểm tra kết quả
-            success_count = 0
-            total_articles = 0
+            deadline_seconds = get_deadline_seconds(context)
 
-            for site, result in results.items():
-                if result["success"]:
-                    success_count += 1
-                    total_articles += result["count"]
-                    print(f"✅ {site}: {result['count']} bài báo")
-                else:
-                    print(f"❌ {site}: {result['error']}")
+            if context['params'].get('streaming', True):
+                # Crawl và NER chạy song song qua hàng đợi, bước process_data không phải làm lại
+                ner_workers = int(context['params'].get('ner_workers', 2))
+                results, process_result = crawl_and_process(limit=50, browser_workers=browser_workers, consumers=ner_workers,
+                                                            site_limits=site_limits, deadline_seconds=deadline_seconds,
+                                                            **get_profile_kwargs(context))
+                context['task_instance'].xcom_push(key='process_results', value=process_result)
+            else:
+                results = crawl_all_sites(limit=50, browser_workers=browser_workers, site_limits=site_limits,
+                                          deadline_seconds=deadline_seconds, **get_profile_kwargs(context))
 
-            print(f"📊 Tổng kết: {success_count}/{len(results)} trang thành công, {total_articles} bài báo")
-            
-            # Trả về kết quả cho các task tiếp theo
-            context['task_instance'].xcom_push(key='crawl_results', value=results)
-            context['task_instance'].xcom_push(key='total_articles', value=total_articles)
-            
+            if scheduler is not None:
+                # Chỉ ghi nhận lượt crawl của các trang crawl thành công
+                scheduler.record([entry for entry in schedule if results.get(entry["site"], {}).get("success")])
+                scheduler.close()
+
+            push_crawl_results(context, results)
             return results
             
         except Exception as e:
             print(f"Lỗi khi crawl data: {str(e)}")
             raise
 
+    # Crawl phân tán, bước 1: lập lịch, thu thập link và chia link thành CRAWL_SHARDS shard
+    def run_discover_links(**context):
+        browser_workers = int(context['params'].get('browser_workers', 2))
+        schedule, site_limits = [], None
+        if context['params'].get('use_scheduler', True):
+            _, schedule, site_limits = plan_crawl(default_limit=50, dry_run=True)
+        manifest = discover_shards(get_shard_run_id(context), CRAWL_SHARDS, limit=50, site_limits=site_limits,
+                                   browser_workers=browser_workers, schedule=schedule, **get_profile_kwargs(context))
+        # Lịch crawl chỉ được ghi nhận ở bước gộp, sau khi biết trang nào crawl thành công
+        context['task_instance'].xcom_push(key='schedule', value=schedule)
+        return manifest['shard_sizes']
+
+    # Crawl phân tán, bước 2: tải bài của một shard (mỗi shard là một task, Celery chia cho các worker)
+    def run_fetch_shard(shard, **context):
+        browser_workers = int(context['params'].get('browser_workers', 2))
+        results = run_shard(get_shard_run_id(context), shard, browser_workers=browser_workers,
+                            deadline_seconds=get_deadline_seconds(context), **get_profile_kwargs(context))
+        return {site: result.get('count', 0) for site, result in results.items()}
+
+    # Crawl phân tán, bước 3: gộp bài của các shard vào kho bài, đẩy kết quả như task crawl một worker
+    def run_merge_shards(**context):
+        results = merge_shards(get_shard_run_id(context))
+        schedule = context['task_instance'].xcom_pull(task_ids='data_processing_group.discover_links', key='schedule')
+        if schedule:
+            scheduler = CrawlScheduler()
+            scheduler.record([entry for entry in schedule if results.get(entry["site"], {}).get("success")])
+            scheduler.close()
+        push_crawl_results(context, results)
+        return results
+
     # Hàm wrapper cho process_data (giữ nguyên)
     def run_process_data(**context):
         """
@@ -97,7 +190,26 @@ with DAG(
             
             print(f"Nhận được {total_articles} bài báo từ crawl_data (nếu cần)")
 
-            result = process_main() # Giả định process_main đọc từ file đã crawl
+            # Crawl phân tán không chạy streaming: xử lý sau khi gộp xong như chế độ thường
+            # full_reprocess: xử lý lại toàn bộ kho kể cả khi đã chạy streaming
+            full = bool(context['params'].get('full_reprocess', False))
+            if context['params'].get('streaming', True) and CRAWL_SHARDS <= 1 and not full:
+                # Dữ liệu đã được xử lý trong lúc crawl
+                result = context['task_instance'].xcom_pull(task_ids='data_processing_group.crawl_data', key='process_results')
+                print(f"Dữ liệu đã được xử lý trong lúc crawl (streaming): {result}")
+                if not result:
+                    raise Exception("Xử lý dữ liệu streaming thất bại.")
+                # Bài đã lưu vào kho nhưng chưa được xử lý (vd. lượt streaming trước lỗi trước khi ghi kết quả)
+                # giữ mốc lại ở chỗ hổng: xử lý nốt phần kho sau mốc, không có bài nào nếu mốc đã ở bài mới nhất
+                result = process_main(full=False, workers=int(context['params'].get('process_workers', 2)))
+                print(f"Xử lý nốt các bài sau mốc: {result}")
+                if not result:
+                    raise Exception("Xử lý các bài còn lại sau mốc thất bại.")
+                context['task_instance'].xcom_push(key='process_results', value=result)
+                return result
+
+            # Chỉ xử lý các bài mới trong kho bài thô (theo mốc của lần chạy trước), trừ khi trigger với full_reprocess
+            result = process_main(full=full, workers=int(context['params'].get('process_workers', 2)))
             print(f"Xử lý dữ liệu hoàn thành: {result}")
             
             # Push kết quả cho task tiếp theo
@@ -136,18 +248,55 @@ with DAG(
     # Cấu hình task groups (CHUYỂN VÀO BÊN TRONG KHỐI with DAG)
     with TaskGroup("data_processing_group") as data_group: # Bỏ 'dag=dag' ở đây, vì nó đã nằm trong ngữ cảnh của DAG
         # Task 1: Crawl Data
-        crawl_data_task = PythonOperator(
-            task_id='crawl_data',
-            python_callable=run_crawl_data,
-            doc_md="""
-            ### Crawl Data Task
-            
-            Task này sẽ:
-            - Crawl dữ liệu từ các nguồn đã định nghĩa
-            - Lưu dữ liệu thô vào thư mục data
-            - Tạo log cho quá trình crawl
-            """,
-        )
+        if CRAWL_SHARDS > 1:
+            # Crawl phân tán: thu thập link -> CRAWL_SHARDS shard tải bài song song -> gộp (task crawl_data)
+            discover_links_task = PythonOperator(
+                task_id='discover_links',
+                python_callable=run_discover_links,
+                doc_md="""
+                ### Discover Links Task
+
+                Lập lịch, thu thập link mới từ RSS / sitemap / trang chủ và chia thành các shard theo hash của URL
+                """,
+            )
+            fetch_shard_tasks = [
+                PythonOperator(
+                    task_id=f'fetch_shard_{shard}',
+                    python_callable=run_fetch_shard,
+                    op_kwargs={'shard': shard},
+                    doc_md=f"""
+                    ### Fetch Shard {shard} Task
+
+                    Tải các bài của shard {shard}/{CRAWL_SHARDS}, ghi ra data/shards/<run_id>
+                    """,
+                )
+                for shard in range(CRAWL_SHARDS)
+            ]
+            crawl_data_task = PythonOperator(
+                task_id='crawl_data',
+                python_callable=run_merge_shards,
+                # Vẫn gộp khi một shard lỗi: bài của các shard còn lại không bị bỏ
+                trigger_rule='all_done',
+                doc_md="""
+                ### Crawl Data Task (merge)
+
+                Gộp bài của các shard vào kho dữ liệu thô và ghi nhận lịch crawl
+                """,
+            )
+            discover_links_task >> fetch_shard_tasks >> crawl_data_task
+        else:
+            crawl_data_task = PythonOperator(
+                task_id='crawl_data',
+                python_callable=run_crawl_data,
+                doc_md="""
+                ### Crawl Data Task
+                
+                Task này sẽ:
+                - Crawl dữ liệu từ các nguồn đã định nghĩa
+                - Lưu dữ liệu thô vào thư mục data
+                - Tạo log cho quá trình crawl
+                """,
+            )
 
         # Task 2: Process Data
         process_data_task = PythonOperator(
@@ -0,0 +1,149 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from crawl_data.fetcher import create_session, fetch_html
+from crawl_data.extractor import extract_article
+
+
+# Giới hạn số request mỗi giây cho một domain
+class RateLimiter:
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class AsyncCrawler:
+    """
+    Crawl song song các bài viết của nhiều trang báo
+    Args:
+        session: requests.Session dùng chung (tạo mới nếu None)
+        concurrency_per_domain (int): Số request đồng thời tối đa cho mỗi domain
+        requests_per_second (float): Số request mỗi giây tối đa cho mỗi domain (0 = không giới hạn)
+        max_in_flight (int): Số request đồng thời tối đa trên toàn bộ các domain
+        on_article (callable): Gọi on_article(site, record) ngay khi mỗi bài trích xuất xong (có thể chặn
+            nếu hàng đợi phía sau đầy, khi đó crawler tự chậm lại)
+        archive (HtmlArchive): Lưu HTML gốc của mọi trang tải được để trích xuất lại sau này
+        budget (CrawlBudget): Hạn chót + ngắt mạch theo domain; trang bị bỏ qua không có trong kết quả
+            (vẫn ở trạng thái discovered trong frontier để lần sau crawl tiếp)
+        telemetry (Telemetry): Ghi thời gian tải / trích xuất, số lần thử lại và số byte của từng trang
+    """
+
+    def __init__(self, session=None, concurrency_per_domain=4, requests_per_second=4.0, max_in_flight=12,
+                 on_article=None, archive=None, budget=None, telemetry=None):
+        self.session = session
+        self.telemetry = telemetry
+        self.budget = budget
+        self.on_article = on_article
+        self.archive = archive
+        self.concurrency_per_domain = concurrency_per_domain
+        self.requests_per_second = requests_per_second
+        self.max_in_flight = max_in_flight
+        self.domain_semaphores = {}
+        self.rate_limiters = {}
+
+    def _domain_limits(self, url):
+        domain = urlparse(url).netloc
+        if domain not in self.domain_semaphores:
+            self.domain_semaphores[domain] = asyncio.Semaphore(self.concurrency_per_domain)
+            self.rate_limiters[domain] = RateLimiter(self.requests_per_second)
+        return self.domain_semaphores[domain], self.rate_limiters[domain]
+
+    async def _crawl_one(self, site, idx, link, global_semaphore):
+        domain_semaphore, rate_limiter = self._domain_limits(link)
+        async with global_semaphore, domain_semaphore:
+            # Kiểm tra sau khi có chỗ: trang chờ lâu trong hàng đợi có thể đã quá hạn
+            if self.budget is not None and not self.budget.allow(site, link):
+                if self.telemetry is not None:
+                    self.telemetry.record(site, link, "http", "skipped", error="deadline / circuit breaker")
+                return None
+            wait_start = time.monotonic()
+            await rate_limiter.wait()
+            start = time.monotonic()
+            stats = {}
+            page_source = await asyncio.to_thread(fetch_html, self.session, link, stats=stats, budget=self.budget)
+            elapsed = time.monotonic() - start
+        # Parse ngoài semaphore để không giữ chỗ của request khác
+        extract_start = time.monotonic()
+        article = await asyncio.to_thread(extract_article, site, page_source, link)
+        if self.telemetry is not None:
+            error = stats.get("error") if page_source is None else (None if article else "missing title/content")
+            self.telemetry.record(
+                site, link, "http", "ok" if article else "failed",
+                phases={"wait": start - wait_start, "fetch": elapsed, "extract": time.monotonic() - extract_start},
+                retries=stats.get("retries", 0), bytes=stats.get("bytes", 0), error=error,
+            )
+        if self.budget is not None:
+            self.budget.record(site, link, "http", elapsed, page_source is not None,
+                               needs_browser=page_source is not None and article is None)
+        if page_source and self.archive is not None:
+            await asyncio.to_thread(self.archive.put, site, link, page_source)
+        if article is not None and self.on_article is not None:
+            await asyncio.to_thread(self.on_article, site, {"id": idx, **article})
+        # Trang tải được nhưng thiếu dữ liệu: error None (mở lại bằng trình duyệt); tải lỗi: lý do lỗi
+        error = None if page_source is not None else stats.get("error", "fetch failed")
+        return site, idx, link, article, error
+
+    async def crawl(self, site_links):
+        """
+        Args:
+            site_links (dict): {site: [url, ...]}
+        Returns:
+            tuple: ({site: [record, ...]}, {site: [(idx, url lỗi, lỗi tải trang), ...]}).
+                Lỗi tải trang là None nếu trang tải được nhưng thiếu tiêu đề / nội dung (cần mở bằng trình duyệt)
+        """
+        # Executor mặc định của asyncio có thể nhỏ hơn max_in_flight
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=self.max_in_flight))
+        global_semaphore = asyncio.Semaphore(self.max_in_flight)
+        tasks = [
+            self._crawl_one(site, idx, link, global_semaphore)
+            for site, links in site_links.items()
+            for idx, link in enumerate(links, start=1)
+        ]
+
+        results = {site: [] for site in site_links}
+        failed = {site: [] for site in site_links}
+        for outcome in await asyncio.gather(*tasks):
+            if outcome is None:
+                continue
+            site, idx, link, article, error = outcome
+            if article is None:
+                failed[site].append((idx, link, error))
+            else:
+                results[site].append({"id": idx, **article})
+        return results, failed
+
+
+# Hàm đồng bộ để gọi từ Airflow / crawl_all_sites
+def crawl_links_concurrently(site_links, session=None, concurrency_per_domain=4, requests_per_second=4.0, max_in_flight=12,
+                             on_article=None, archive=None, budget=None, telemetry=None):
+    owns_session = session is None
+    if owns_session:
+        session = create_session(pool_size=max_in_flight)
+    try:
+        crawler = AsyncCrawler(
+            session=session,
+            concurrency_per_domain=concurrency_per_domain,
+            requests_per_second=requests_per_second,
+            max_in_flight=max_in_flight,
+            on_article=on_article,
+            archive=archive,
+            budget=budget,
+            telemetry=telemetry,
+        )
+        return asyncio.run(crawler.crawl(site_links))
+    finally:
+        if owns_session:
+            session.close()
@@ -0,0 +1,352 @@
+# Benchmark cho crawler, chạy trên các trang HTML đã lưu sẵn (không cần mạng).
+# Ví dụ (chạy từ thư mục sic_project):
+#   python -m crawl_data.bench extraction --site vnexpress --pages saved_pages/vnexpress
+#   python -m crawl_data.bench throughput --site vnexpress --pages saved_pages/vnexpress
+#   python -m crawl_data.bench page-load --site vnexpress --urls vnexpress_urls.txt
+#   python -m crawl_data.bench startup --site vnexpress --urls vnexpress_urls.txt --rounds 5
+#   python -m crawl_data.bench harvest --site vietnamnet --pages saved_pages/vietnamnet_listing
+# Ghi lại một lần crawl thật rồi phát lại offline để so sánh hiệu năng giữa các lần thay đổi code:
+#   python -m crawl_data.bench record --warc fixtures/crawl.warc.gz --limit 25
+#   python -m crawl_data.bench replay --warc fixtures/crawl.warc.gz --limit 25
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from selenium.webdriver.common.by import By
+
+from crawl_data.crawl_data import setup_driver, make_driver_factory, crawl_all_sites, scroll_until_enough_links
+from crawl_data.browser_profile import BrowserProfiles
+from crawl_data.extractor import extract_article, get_extractor
+from crawl_data.replay import ReplayServer
+from crawl_data.sites import SITE_SPECS
+
+# Đếm số lệnh WebDriver (mỗi lệnh là một HTTP round-trip tới chromedriver)
+def count_commands(driver):
+    counter = {"count": 0}
+    original_execute = driver.execute
+
+    def execute(*args, **kwargs):
+        counter["count"] += 1
+        return original_execute(*args, **kwargs)
+
+    driver.execute = execute
+    return counter
+
+
+# Tái hiện cách trích xuất cũ: find_elements rồi .text / get_attribute trên từng phần tử
+def extract_per_element(driver, site):
+    article = {}
+    for field, field_spec in SITE_SPECS[site]["fields"].items():
+        elements = driver.find_elements(By.CSS_SELECTOR, field_spec["selectors"][0])
+        if "attrs" in field_spec:
+            article[field] = next((elements[0].get_attribute(attr) for attr in field_spec["attrs"]
+                                   if elements and elements[0].get_attribute(attr)), "")
+        else:
+            article[field] = "\n".join(el.text.strip() for el in elements if el.text.strip())
+    return article
+
+
+def extract_single_round_trip(driver, site, url):
+    return extract_article(site, driver.page_source, url)
+
+
+def bench_extraction(site, pages_dir, headless=True):
+    pages = sorted(Path(pages_dir).glob("*.html"))
+    if not pages:
+        print(f"❌ Không có file .html nào trong {pages_dir}")
+        return None
+
+    driver = setup_driver(headless=headless)
+    counter = count_commands(driver)
+    stats = {"per_element": {"times": [], "rpcs": []}, "single_round_trip": {"times": [], "rpcs": []}}
+    try:
+        for page in pages:
+            url = page.resolve().as_uri()
+            driver.get(url)
+            for mode, func in (("per_element", lambda: extract_per_element(driver, site)),
+                               ("single_round_trip", lambda: extract_single_round_trip(driver, site, url))):
+                counter["count"] = 0
+                start = time.perf_counter()
+                func()
+                stats[mode]["times"].append(time.perf_counter() - start)
+                stats[mode]["rpcs"].append(counter["count"])
+    finally:
+        driver.quit()
+
+    print(f"\n📊 Trích xuất {len(pages)} trang {site}")
+    for mode, values in stats.items():
+        print(f"{mode:>18}: {statistics.mean(values['times']) * 1000:8.1f} ms/trang, "
+              f"{statistics.mean(values['rpcs']):6.1f} lệnh WebDriver/trang")
+    return stats
+
+
+# Tái hiện cách thu thập link cũ: mỗi lần cuộn gọi find_elements rồi get_attribute("href") cho từng thẻ,
+# luôn cuộn đủ max_scrolls lần
+def harvest_per_element(driver, selector, limit=25, max_scrolls=15, delay=0):
+    seen = set()
+    links = []
+    scrolls = 0
+    while len(links) < limit and scrolls < max_scrolls:
+        for el in driver.find_elements(By.CSS_SELECTOR, selector):
+            href = el.get_attribute("href")
+            if href and href not in seen and "video" not in href:
+                seen.add(href)
+                links.append(href)
+                if len(links) >= limit:
+                    break
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        time.sleep(delay)
+        scrolls += 1
+    return links
+
+
+# So sánh thu thập link trên trang danh sách đã lưu: từng phần tử với một execute_script mỗi lần cuộn
+def bench_harvest(site, urls, limit=25, headless=True):
+    selector = SITE_SPECS[site]["link_selector"]
+    driver = setup_driver(headless=headless)
+    counter = count_commands(driver)
+    stats = {"per_element": {"times": [], "rpcs": [], "links": []}, "execute_script": {"times": [], "rpcs": [], "links": []}}
+    try:
+        for url in urls:
+            for mode, func in (("per_element", lambda: harvest_per_element(driver, selector, limit=limit)),
+                               ("execute_script", lambda: scroll_until_enough_links(
+                                   driver, selector, limit=limit, max_scrolls=15, delay=0))):
+                driver.get(url)
+                counter["count"] = 0
+                start = time.perf_counter()
+                links = func()
+                stats[mode]["times"].append(time.perf_counter() - start)
+                stats[mode]["rpcs"].append(counter["count"])
+                stats[mode]["links"].append(len(links))
+    finally:
+        driver.quit()
+
+    print(f"\n📊 Thu thập link trên {len(urls)} trang danh sách {site} (limit {limit})")
+    for mode, values in stats.items():
+        print(f"{mode:>15}: {statistics.mean(values['times']) * 1000:8.1f} ms/trang, "
+              f"{statistics.mean(values['rpcs']):7.1f} lệnh WebDriver/trang, {statistics.mean(values['links']):5.1f} link")
+    return stats
+
+
+# Đo tốc độ của bộ trích xuất lxml (không cần trình duyệt)
+def bench_throughput(site, pages_dir, repeat=5):
+    pages = [(page.resolve().as_uri(), page.read_text(encoding="utf-8", errors="replace"))
+             for page in sorted(Path(pages_dir).glob("*.html"))]
+    if not pages:
+        print(f"❌ Không có file .html nào trong {pages_dir}")
+        return None
+
+    get_extractor(site)  # Biên dịch selector trước khi đo
+    success = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for url, page_source in pages:
+            if extract_article(site, page_source, url) is not None:
+                success += 1
+    elapsed = time.perf_counter() - start
+
+    total = len(pages) * repeat
+    print(f"\n📊 {site}: {total / elapsed:.1f} trang/giây, "
+          f"{elapsed / total * 1000:.2f} ms/trang, thành công {success / total:.0%}")
+    return {"pages_per_second": total / elapsed, "success_rate": success / total}
+
+
+# Đo thời gian tải trang với profile mặc định và profile gọn (lean)
+def bench_page_load(site, urls, headless=True):
+    stats = {}
+    for profile, lean in (("default", False), ("lean", True)):
+        driver = setup_driver(headless=headless, lean=lean)
+        times = []
+        try:
+            for url in urls:
+                start = time.perf_counter()
+                try:
+                    driver.get(url)
+                except Exception as e:
+                    print(f"⚠️ Lỗi khi tải {url}: {e}")
+                    continue
+                times.append(time.perf_counter() - start)
+        finally:
+            driver.quit()
+        stats[profile] = times
+
+    print(f"\n📊 Thời gian tải {len(urls)} trang {site}")
+    for profile, times in stats.items():
+        if times:
+            print(f"{profile:>8}: trung bình {statistics.mean(times):.2f}s, trung vị {statistics.median(times):.2f}s")
+    if stats["default"] and stats["lean"]:
+        reduction = 1 - statistics.mean(stats["lean"]) / statistics.mean(stats["default"])
+        print(f"⚡ Giảm {reduction:.0%} thời gian tải trang")
+    return stats
+
+
+# Đo thời gian mở Chrome và tải trang đầu tiên: profile tạm mới mỗi lần và profile giữ lại (cache CSS/JS).
+# Lần đầu của profile giữ lại là lần làm nóng cache, không tính vào trung bình
+def bench_startup(site, urls, rounds=5, headless=True, cache_mb=512):
+    stats = {}
+    with tempfile.TemporaryDirectory(prefix="sic_profiles_") as root:
+        profiles = BrowserProfiles(root=root, max_mb=cache_mb, slots=1)
+        for profile, factory in (("fresh", make_driver_factory(headless=headless)),
+                                 ("persistent", make_driver_factory(headless=headless, profiles=profiles))):
+            startup, first_page = [], []
+            for round_index in range(rounds + (profile == "persistent")):
+                start = time.perf_counter()
+                driver = factory()
+                started = time.perf_counter()
+                try:
+                    driver.get(urls[round_index % len(urls)])
+                except Exception as e:
+                    print(f"⚠️ Lỗi khi tải {urls[round_index % len(urls)]}: {e}")
+                    continue
+                finally:
+                    loaded = time.perf_counter()
+                    driver.quit()
+                if profile == "persistent" and round_index == 0:
+                    continue
+                startup.append(started - start)
+                first_page.append(loaded - started)
+            stats[profile] = {"startup": startup, "first_page": first_page}
+        cache_size = profiles.size()
+
+    print(f"\n📊 Mở Chrome và tải trang đầu tiên {site} ({rounds} lần)")
+    for profile, times in stats.items():
+        if times["startup"]:
+            print(f"{profile:>10}: mở Chrome {statistics.mean(times['startup']):.2f}s, "
+                  f"trang đầu {statistics.mean(times['first_page']):.2f}s")
+    print(f"💾 Dung lượng profile giữ lại: {cache_size / 1024 / 1024:.1f} MB (giới hạn {cache_mb} MB)")
+    if stats["fresh"]["first_page"] and stats["persistent"]["first_page"]:
+        reduction = 1 - statistics.mean(stats["persistent"]["first_page"]) / statistics.mean(stats["fresh"]["first_page"])
+        print(f"⚡ Giảm {reduction:.0%} thời gian tải trang đầu tiên")
+    return stats
+
+
+# Crawl trong thư mục data tạm (frontier và kho bài trống) để mọi lần chạy đều tải cùng một tập trang
+def run_isolated_crawl(**kwargs):
+    previous = os.environ.get("SIC_DATA_DIR")
+    with tempfile.TemporaryDirectory(prefix="sic_bench_") as data_dir:
+        os.environ["SIC_DATA_DIR"] = data_dir
+        try:
+            start = time.perf_counter()
+            results = crawl_all_sites(**kwargs)
+            elapsed = time.perf_counter() - start
+        finally:
+            if previous is None:
+                os.environ.pop("SIC_DATA_DIR", None)
+            else:
+                os.environ["SIC_DATA_DIR"] = previous
+    return results, elapsed
+
+
+def report_crawl(results, elapsed):
+    print(f"\n📊 Tổng thời gian: {elapsed:.2f}s")
+    phases = next((result["phase_seconds"] for result in results.values() if "phase_seconds" in result), {})
+    for phase, seconds in phases.items():
+        print(f"⏱️ {phase:>8}: {seconds:.2f}s")
+
+    total = 0
+    for site, result in results.items():
+        if not result.get("success"):
+            print(f"❌ {site}: {result.get('error')}")
+            continue
+        total += result["count"]
+        success_rate = result["count"] / result["links"] if result["links"] else 0.0
+        print(f"✅ {site}: {result['count']}/{result['links']} bài ({success_rate:.0%}), "
+              f"HTTP {result['http_count']}, trình duyệt {result['browser_count']}")
+    print(f"⚡ {total / elapsed:.2f} trang/giây")
+
+
+def bench_record(warc_path, limit, browser_workers=2):
+    Path(warc_path).parent.mkdir(parents=True, exist_ok=True)
+    results, elapsed = run_isolated_crawl(limit=limit, browser_workers=browser_workers, record_to=warc_path)
+    report_crawl(results, elapsed)
+    return results
+
+
+def bench_replay(warc_path, limit, browser_workers=2):
+    # Nạp WARC trước khi bấm giờ và bỏ giới hạn request/giây (server cục bộ): đo tốc độ tải + trích xuất,
+    # không phải thời gian đọc bản ghi hay khoảng cách của RateLimiter
+    replay = ReplayServer([warc_path]).start()
+    try:
+        results, elapsed = run_isolated_crawl(limit=limit, browser_workers=browser_workers, replay=replay,
+                                              requests_per_second=0)
+    finally:
+        replay.stop()
+    report_crawl(results, elapsed)
+    return results
+
+
+def read_urls(pages_dir=None, urls_file=None):
+    if urls_file:
+        with open(urls_file, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    return [page.resolve().as_uri() for page in sorted(Path(pages_dir).glob("*.html"))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark crawler trên các trang đã lưu")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    extraction = subparsers.add_parser("extraction", help="So sánh trích xuất từng phần tử với một round-trip")
+    extraction.add_argument("--site", required=True, choices=sorted(SITE_SPECS))
+    extraction.add_argument("--pages", required=True, help="Thư mục chứa các file .html đã lưu")
+    extraction.add_argument("--no-headless", action="store_true")
+
+    throughput = subparsers.add_parser("throughput", help="Đo tốc độ trích xuất lxml theo cấu hình trang")
+    throughput.add_argument("--site", required=True, choices=sorted(SITE_SPECS))
+    throughput.add_argument("--pages", required=True, help="Thư mục chứa các file .html đã lưu")
+    throughput.add_argument("--repeat", type=int, default=5)
+
+    page_load = subparsers.add_parser("page-load", help="So sánh thời gian tải trang: profile mặc định và lean")
+    page_load.add_argument("--site", required=True, choices=sorted(SITE_SPECS))
+    page_load_source = page_load.add_mutually_exclusive_group(required=True)
+    page_load_source.add_argument("--pages", help="Thư mục chứa các file .html đã lưu")
+    page_load_source.add_argument("--urls", help="File chứa danh sách URL, mỗi dòng một URL")
+    page_load.add_argument("--no-headless", action="store_true")
+
+    startup = subparsers.add_parser("startup", help="So sánh mở Chrome + trang đầu tiên: profile tạm và profile giữ lại")
+    startup.add_argument("--site", required=True, choices=sorted(SITE_SPECS))
+    startup_source = startup.add_mutually_exclusive_group(required=True)
+    startup_source.add_argument("--pages", help="Thư mục chứa các file .html đã lưu")
+    startup_source.add_argument("--urls", help="File chứa danh sách URL, mỗi dòng một URL")
+    startup.add_argument("--rounds", type=int, default=5)
+    startup.add_argument("--cache-mb", type=int, default=512)
+    startup.add_argument("--no-headless", action="store_true")
+
+    harvest = subparsers.add_parser("harvest", help="So sánh thu thập link: từng phần tử với một execute_script mỗi lần cuộn")
+    harvest.add_argument("--site", required=True, choices=sorted(SITE_SPECS))
+    harvest_source = harvest.add_mutually_exclusive_group(required=True)
+    harvest_source.add_argument("--pages", help="Thư mục chứa các trang danh sách .html đã lưu")
+    harvest_source.add_argument("--urls", help="File chứa danh sách URL trang danh sách, mỗi dòng một URL")
+    harvest.add_argument("--limit", type=int, default=25)
+    harvest.add_argument("--no-headless", action="store_true")
+
+    for name, help_text in (("record", "Crawl thật và ghi các trang vào file WARC"),
+                            ("replay", "Crawl offline từ file WARC đã ghi, đo trang/giây và tỉ lệ thành công")):
+        crawl = subparsers.add_parser(name, help=help_text)
+        crawl.add_argument("--warc", required=True, help="File .warc.gz")
+        crawl.add_argument("--limit", type=int, default=25)
+        crawl.add_argument("--browser-workers", type=int, default=2)
+
+    args = parser.parse_args()
+    if args.command == "extraction":
+        bench_extraction(args.site, args.pages, headless=not args.no_headless)
+    elif args.command == "throughput":
+        bench_throughput(args.site, args.pages, repeat=args.repeat)
+    elif args.command == "page-load":
+        bench_page_load(args.site, read_urls(args.pages, args.urls), headless=not args.no_headless)
+    elif args.command == "startup":
+        bench_startup(args.site, read_urls(args.pages, args.urls), rounds=args.rounds, headless=not args.no_headless,
+                      cache_mb=args.cache_mb)
+    elif args.command == "harvest":
+        bench_harvest(args.site, read_urls(args.pages, args.urls), limit=args.limit, headless=not args.no_headless)
+    elif args.command == "record":
+        bench_record(args.warc, args.limit, browser_workers=args.browser_workers)
+    elif args.command == "replay":
+        bench_replay(args.warc, args.limit, browser_workers=args.browser_workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import queue
+import threading
+import time
+
+
+# Driver đã chết thì quit() cũng lỗi: bỏ qua để worker tiếp tục với driver mới
+def _quit(driver):
+    try:
+        driver.quit()
+    except Exception as e:
+        print(f"⚠️ Không đóng được driver: {e}")
+
+
+class BrowserPool:
+    """
+    Nhóm các worker trình duyệt headless chạy song song, mỗi worker (thread) sở hữu một driver.
+    Driver chỉ được tạo khi có việc và được khởi động lại sau `recycle_after` trang để giới hạn bộ nhớ.
+    Args:
+        driver_factory (callable): Hàm tạo driver mới, ví dụ lambda: setup_driver(headless=True)
+        size (int): Số worker (số Chrome chạy cùng lúc)
+        recycle_after (int): Số trang tối đa mỗi driver xử lý trước khi khởi động lại
+    """
+
+    def __init__(self, driver_factory, size=2, recycle_after=50):
+        self.driver_factory = driver_factory
+        self.size = max(1, size)
+        self.recycle_after = recycle_after
+        self.stats = {}
+
+    def _worker(self, worker_id, tasks, results, func):
+        stats = self.stats.setdefault(worker_id, {"pages": 0, "errors": 0, "recycles": 0, "busy_seconds": 0.0})
+        driver = None
+        pages_on_driver = 0
+        try:
+            while True:
+                try:
+                    index, item = tasks.get_nowait()
+                except queue.Empty:
+                    break
+
+                if driver is not None and pages_on_driver >= self.recycle_after:
+                    _quit(driver)
+                    driver = None
+                    stats["recycles"] += 1
+
+                start = time.perf_counter()
+                try:
+                    if driver is None:
+                        driver = self.driver_factory()
+                        pages_on_driver = 0
+                    results[index] = func(driver, item)
+                except Exception as e:
+                    print(f"⚠️ Worker {worker_id} lỗi khi xử lý {item}: {e}")
+                    stats["errors"] += 1
+                    # Phiên chromedriver có thể đã chết (vd. InvalidSessionIdException, renderer crash):
+                    # bỏ driver này để item tiếp theo dùng driver mới thay vì lỗi theo
+                    if driver is not None:
+                        _quit(driver)
+                        driver = None
+                        stats["recycles"] += 1
+                stats["busy_seconds"] += time.perf_counter() - start
+                stats["pages"] += 1
+                pages_on_driver += 1
+        finally:
+            if driver is not None:
+                _quit(driver)
+
+    def map(self, func, items):
+        """
+        Chạy func(driver, item) cho từng item trên các worker.
+        Returns:
+            list: Kết quả theo đúng thứ tự items (None nếu item lỗi)
+        """
+        items = list(items)
+        if not items:
+            return []
+
+        tasks = queue.Queue()
+        for index, item in enumerate(items):
+            tasks.put((index, item))
+        results = [None] * len(items)
+
+        threads = [
+            threading.Thread(target=self._worker, args=(worker_id, tasks, results, func), daemon=True)
+            for worker_id in range(min(self.size, len(items)))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def report(self):
+        for worker_id, stats in sorted(self.stats.items()):
+            rate = stats["pages"] / stats["busy_seconds"] if stats["busy_seconds"] else 0.0
+            print(f"🧵 Worker {worker_id}: {stats['pages']} trang, {rate:.2f} trang/giây, "
+                  f"{stats['errors']} lỗi, khởi động lại {stats['recycles']} lần")
+        return self.stats
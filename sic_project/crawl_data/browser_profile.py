@@ -0,0 +1,204 @@
+import os
+import shutil
+import socket
+import threading
+import time
+
+from webdriver_manager.chrome import ChromeDriverManager
+
+from crawl_data.paths import get_data_dir
+
+DEFAULT_CACHE_MB = 512
+# Khoá của một profile quá thời gian này thì coi như Chrome giữ nó đã chết (vd. worker ở container khác bị kill)
+STALE_LOCK_HOURS = 12
+LOCK_FILE = "in-use"
+# Các thư mục cache trong profile, bị xoá trước khi phải xoá cả profile
+CACHE_DIRS = ("Cache", "Code Cache", "GPUCache", "DawnCache", "Service Worker")
+
+
+def get_browser_dir():
+    return os.path.join(get_data_dir(), "browser")
+
+
+def _pin_file():
+    return os.path.join(get_browser_dir(), "chromedriver.path")
+
+
+_driver_path = None
+_driver_lock = threading.Lock()
+
+
+def resolve_chromedriver():
+    """
+    Đường dẫn chromedriver, chỉ tìm một lần cho mỗi process:
+    1. Biến môi trường CHROMEDRIVER_PATH
+    2. Đường dẫn đã ghim trong data/browser/chromedriver.path từ lần chạy trước
+    3. webdriver-manager tìm / tải driver hợp với Chrome, rồi ghim lại cho các lần sau
+    """
+    global _driver_path
+    with _driver_lock:
+        if _driver_path and os.path.exists(_driver_path):
+            return _driver_path
+        path = os.environ.get("CHROMEDRIVER_PATH")
+        if not path and os.path.exists(_pin_file()):
+            with open(_pin_file(), "r", encoding="utf-8") as f:
+                path = f.read().strip()
+            if not os.path.exists(path):
+                path = None
+        if not path:
+            path = ChromeDriverManager().install()
+            os.makedirs(get_browser_dir(), exist_ok=True)
+            with open(_pin_file(), "w", encoding="utf-8") as f:
+                f.write(path)
+            print(f"📌 Ghim chromedriver: {path}")
+        _driver_path = path
+        return path
+
+
+def unpin_chromedriver():
+    # Chrome được cập nhật thì driver đã ghim không còn khớp: bỏ ghim để lần sau tìm lại
+    global _driver_path
+    with _driver_lock:
+        _driver_path = None
+        if os.path.exists(_pin_file()):
+            os.remove(_pin_file())
+
+
+def _dir_files(path):
+    files = []
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            file_path = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, file_path))
+    return files
+
+
+class BrowserProfiles:
+    """
+    Các thư mục user-data của Chrome được giữ lại giữa các lượt crawl, để không phải tải lại CSS/JS của các
+    trang báo mỗi lần mở trình duyệt. Chrome không cho hai process dùng chung một user-data-dir nên mỗi
+    Chrome đang chạy giữ riêng một thư mục (worker-0, worker-1, ...), khoá bằng file `in-use`;
+    dùng được từ nhiều thread và nhiều process (vd. các shard trên cùng máy).
+    Tổng dung lượng bị giới hạn: khi vượt `max_mb`, xoá các file cache cũ nhất (theo thời điểm sửa) của các
+    profile không dùng tới, còn vượt nữa thì xoá cả profile ít dùng nhất.
+    Args:
+        root (str): Thư mục chứa các profile (mặc định data/browser/profiles)
+        max_mb (int): Dung lượng tối đa của tất cả các profile
+        slots (int): Số Chrome dự kiến chạy cùng lúc, dùng để chia dung lượng cache cho mỗi Chrome
+    """
+
+    def __init__(self, root=None, max_mb=DEFAULT_CACHE_MB, slots=2):
+        self.root = root or os.path.join(get_browser_dir(), "profiles")
+        os.makedirs(self.root, exist_ok=True)
+        self.max_bytes = max_mb * 1024 * 1024
+        # Giới hạn cache HTTP của mỗi Chrome (--disk-cache-size), phần còn lại cho code cache, cookie, ...
+        self.disk_cache_bytes = self.max_bytes // max(1, slots) // 2
+        self.lock = threading.Lock()
+
+    def _is_stale(self, lock_path):
+        try:
+            with open(lock_path, "r", encoding="utf-8") as f:
+                host, pid = f.read().split()
+            age_hours = (time.time() - os.path.getmtime(lock_path)) / 3600
+        except (OSError, ValueError):
+            return True
+        if age_hours >= STALE_LOCK_HOURS:
+            return True
+        if host != socket.gethostname():
+            return False
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            return False
+        return False
+
+    def acquire(self):
+        """
+        Returns:
+            str: Thư mục profile đã khoá cho một Chrome, trả lại bằng release()
+        """
+        with self.lock:
+            slot = 0
+            while True:
+                path = os.path.join(self.root, f"worker-{slot}")
+                os.makedirs(path, exist_ok=True)
+                lock_path = os.path.join(path, LOCK_FILE)
+                try:
+                    fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                except FileExistsError:
+                    if self._is_stale(lock_path):
+                        os.remove(lock_path)
+                        continue
+                    slot += 1
+                    continue
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(f"{socket.gethostname()} {os.getpid()}")
+                return path
+
+    def release(self, path):
+        lock_path = os.path.join(path, LOCK_FILE)
+        if os.path.exists(lock_path):
+            os.remove(lock_path)
+        # Thời điểm sửa của thư mục = lần dùng gần nhất, dùng khi phải xoá cả profile
+        os.utime(path)
+        self.evict()
+
+    def _profiles(self, in_use=False):
+        profiles = []
+        for name in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, name)
+            if os.path.isdir(path) and (in_use or not os.path.exists(os.path.join(path, LOCK_FILE))):
+                profiles.append(path)
+        return profiles
+
+    def size(self):
+        return sum(size for profile in self._profiles(in_use=True) for _, size, _ in _dir_files(profile))
+
+    def evict(self):
+        """
+        Đưa tổng dung lượng về dưới 80% giới hạn nếu đang vượt giới hạn.
+        Returns:
+            int: Số byte đã xoá
+        """
+        with self.lock:
+            total = self.size()
+            if total <= self.max_bytes:
+                return 0
+            target = int(self.max_bytes * 0.8)
+            freed = 0
+
+            # Xoá file cache cũ nhất trước (LRU theo thời điểm sửa)
+            cache_files = sorted(
+                entry
+                for profile in self._profiles()
+                for cache_dir in CACHE_DIRS
+                for entry in _dir_files(os.path.join(profile, "Default", cache_dir))
+            )
+            for _, size, file_path in cache_files:
+                if total - freed <= target:
+                    break
+                try:
+                    os.remove(file_path)
+                    freed += size
+                except OSError:
+                    continue
+
+            # Vẫn vượt: xoá cả profile lâu không dùng nhất
+            profiles = sorted(self._profiles(), key=os.path.getmtime)
+            for profile in profiles:
+                if total - freed <= target:
+                    break
+                profile_size = sum(size for _, size, _ in _dir_files(profile))
+                shutil.rmtree(profile, ignore_errors=True)
+                freed += profile_size
+
+        print(f"🧹 Profile trình duyệt {total / 1024 / 1024:.0f} MB vượt giới hạn "
+              f"{self.max_bytes / 1024 / 1024:.0f} MB, đã xoá {freed / 1024 / 1024:.0f} MB")
+        return freed
+
@@ -0,0 +1,164 @@
+import random
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+from crawl_data.frontier import get_frontier_file
+
+# Chi phí mặc định (giây / trang, tính tuần tự) khi chưa có số liệu từ các lần chạy trước
+DEFAULT_HTTP_SECONDS = 1.0
+DEFAULT_BROWSER_SECONDS = 6.0
+DEFAULT_FALLBACK_RATE = 0.2
+EWMA_ALPHA = 0.2
+
+
+# Thời gian chờ trước lần thử lại thứ `attempt` (0, 1, 2, ...): tăng gấp đôi, có jitter, tối đa `cap` giây
+def backoff_delay(attempt, base=0.5, cap=8.0):
+    return min(cap, base * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+
+class CircuitBreaker:
+    """
+    Ngắt mạch theo domain: sau `failure_threshold` lỗi liên tiếp, ngừng gửi request tới domain đó
+    trong `cooldown` giây, thay vì tiếp tục tốn thời gian thử lại một trang đang lỗi.
+    """
+
+    def __init__(self, failure_threshold=5, cooldown=60):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.failures = {}
+        self.open_until = {}
+
+    def allow(self, url):
+        domain = urlparse(url).netloc
+        with self.lock:
+            return time.monotonic() >= self.open_until.get(domain, 0.0)
+
+    def record(self, url, success):
+        domain = urlparse(url).netloc
+        with self.lock:
+            if success:
+                self.failures[domain] = 0
+                return
+            self.failures[domain] = self.failures.get(domain, 0) + 1
+            if self.failures[domain] >= self.failure_threshold:
+                self.open_until[domain] = time.monotonic() + self.cooldown
+                self.failures[domain] = 0
+                print(f"⛔ {domain} lỗi liên tiếp, tạm ngừng gửi request trong {self.cooldown}s")
+
+
+class CrawlBudget:
+    """
+    Giới hạn thời gian cho một lượt crawl: hạn chót, ngắt mạch theo domain và ước lượng chi phí mỗi trang.
+    Chi phí (giây / trang qua HTTP, qua trình duyệt, tỉ lệ phải mở trình duyệt) được học từ các lần chạy
+    trước và lưu trong file frontier, dùng để chia thời gian cho các trang báo.
+    Args:
+        deadline_seconds (float): Thời gian tối đa cho cả lượt crawl, None nếu không giới hạn
+        reserve_seconds (float): Thời gian chừa lại ở cuối để lưu kết quả
+        db_path (str): File SQLite lưu chi phí (mặc định dùng file frontier)
+    """
+
+    def __init__(self, deadline_seconds=None, reserve_seconds=30, db_path=None, breaker=None):
+        self.started = time.monotonic()
+        self.deadline_seconds = deadline_seconds
+        self.reserve_seconds = reserve_seconds
+        self.breaker = breaker or CircuitBreaker()
+        self.lock = threading.Lock()
+        self.skipped = {}
+        self.conn = sqlite3.connect(db_path or get_frontier_file(), check_same_thread=False, timeout=30)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS page_costs (
+                site TEXT PRIMARY KEY,
+                http_seconds REAL,
+                browser_seconds REAL,
+                fallback_rate REAL
+            )
+        """)
+        self.conn.commit()
+        self.costs = {
+            site: {"http": http, "browser": browser, "fallback_rate": fallback_rate}
+            for site, http, browser, fallback_rate in self.conn.execute("SELECT * FROM page_costs")
+        }
+
+    def remaining(self):
+        if self.deadline_seconds is None:
+            return float("inf")
+        return self.deadline_seconds - self.reserve_seconds - (time.monotonic() - self.started)
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def timeout(self, cap, minimum=1.0):
+        """Timeout cho một lần tải trang: không quá `cap` giây và không vượt quá hạn chót (tối thiểu `minimum`)"""
+        return max(minimum, min(cap, self.remaining()))
+
+    def allow(self, site, url):
+        """True nếu còn thời gian và domain không bị ngắt mạch, ngược lại ghi nhận trang bị bỏ qua"""
+        if not self.expired() and self.breaker.allow(url):
+            return True
+        with self.lock:
+            self.skipped[site] = self.skipped.get(site, 0) + 1
+        return False
+
+    def _cost(self, site):
+        return self.costs.setdefault(site, {
+            "http": DEFAULT_HTTP_SECONDS, "browser": DEFAULT_BROWSER_SECONDS, "fallback_rate": DEFAULT_FALLBACK_RATE,
+        })
+
+    def record(self, site, url, mode, seconds, success, needs_browser=False):
+        """
+        Ghi nhận một lần tải trang.
+        Args:
+            mode (str): "http" hoặc "browser"
+            success (bool): Tải được trang (dùng cho ngắt mạch)
+            needs_browser (bool): Trang HTTP tải được nhưng thiếu dữ liệu, phải mở bằng trình duyệt
+        """
+        self.breaker.record(url, success)
+        with self.lock:
+            cost = self._cost(site)
+            cost[mode] = EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * cost[mode]
+            if mode == "http":
+                cost["fallback_rate"] = EWMA_ALPHA * float(needs_browser) + (1 - EWMA_ALPHA) * cost["fallback_rate"]
+
+    def fit_links(self, site_links, max_in_flight, browser_workers):
+        """
+        Cắt bớt danh sách link của từng trang để lượt crawl ước tính xong trước hạn chót.
+        Mọi trang bị cắt theo cùng một tỉ lệ, link mới nhất được giữ lại.
+        """
+        if self.deadline_seconds is None:
+            return site_links
+        with self.lock:
+            # Thời gian (wall-clock) ước tính mỗi trang đóng góp khi chạy song song
+            per_page = {
+                site: self._cost(site)["http"] / max(1, max_in_flight)
+                + self._cost(site)["fallback_rate"] * self._cost(site)["browser"] / max(1, browser_workers)
+                for site in site_links
+            }
+        estimated = sum(len(links) * per_page[site] for site, links in site_links.items())
+        available = self.remaining()
+        if estimated <= available:
+            return site_links
+
+        scale = max(0.0, available) / estimated
+        print(f"⏳ Ước tính cần {estimated:.0f}s nhưng chỉ còn {available:.0f}s, crawl {scale:.0%} số link mỗi trang")
+        fitted = {}
+        for site, links in site_links.items():
+            keep = int(len(links) * scale)
+            fitted[site] = links[:keep]
+            with self.lock:
+                self.skipped[site] = self.skipped.get(site, 0) + len(links) - keep
+        return fitted
+
+    def save(self):
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO page_costs (site, http_seconds, browser_seconds, fallback_rate) VALUES (?, ?, ?, ?)",
+                [(site, cost["http"], cost["browser"], cost["fallback_rate"]) for site, cost in self.costs.items()],
+            )
+            self.conn.commit()
+
+    def close(self):
+        self.save()
+        self.conn.close()
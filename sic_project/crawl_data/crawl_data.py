@@ -9,45 +9,101 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
+from selenium.common.exceptions import SessionNotCreatedException, InvalidSessionIdException
 from urllib.parse import urlparse, urlunparse
 
+from crawl_data.paths import get_data_dir
+from crawl_data.fetcher import create_session, fetch_html
+from crawl_data.frontier import Frontier
+from crawl_data.raw_store import RawStore
+from crawl_data.html_archive import HtmlArchive
+from crawl_data.discovery import discover_links
+from crawl_data.browser_pool import BrowserPool
+from crawl_data.browser_profile import BrowserProfiles, resolve_chromedriver, unpin_chromedriver
+from crawl_data.extractor import extract_article
+from crawl_data.sites import SITE_SPECS
+from crawl_data.async_crawler import crawl_links_concurrently
+from crawl_data.budget import CrawlBudget, backoff_delay
+from crawl_data.telemetry import Telemetry
+from crawl_data.replay import WarcWriter, ReplayServer, mount_replay, SOURCE_BROWSER
+
 # Lấy đường dẫn từ thu mục data
 def get_output_file():
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    parent_dir = os.path.dirname(current_dir)
-    output_dir = os.path.join(parent_dir, "data")
-    os.makedirs(output_dir, exist_ok=True)
-    return os.path.join(output_dir, "all_news_combined.json")
-
-# Cuộn thu thập links
-def scroll_until_enough_links(driver, selector, limit=25, max_scrolls=10, delay=1.5):
+    return os.path.join(get_data_dir(), "all_news_combined.json")
+
+# Lấy href của mọi thẻ khớp selector rồi cuộn xuống cuối trang, tất cả trong một lệnh WebDriver.
+# Trả về cả số thẻ và chiều cao trang để biết DOM còn tải thêm nội dung hay không
+HARVEST_LINKS_JS = """
+const anchors = document.querySelectorAll(arguments[0]);
+const hrefs = [];
+for (const a of anchors) {
+    if (a.href) hrefs.push(a.href);
+}
+const height = document.body.scrollHeight;
+window.scrollTo(0, height);
+return {hrefs: hrefs, count: anchors.length, height: height};
+"""
+
+# Cuộn thu thập links: mỗi lần cuộn chỉ một round-trip WebDriver (thay vì find_elements + get_attribute
+# cho từng thẻ), dừng sớm khi trang không tải thêm nội dung
+# is_new: hàm kiểm tra URL (đã làm sạch) chưa từng được tải, link đã biết không tính vào limit
+def scroll_until_enough_links(driver, selector, limit=25, max_scrolls=10, delay=1.5, is_new=None):
     seen = set()
     links = []
     scrolls = 0
+    last_state = None
     while len(links) < limit and scrolls < max_scrolls:
-        elements = driver.find_elements(By.CSS_SELECTOR, selector)
-        for el in elements:
-            href = el.get_attribute("href")
-            if href and href not in seen and "video" not in href:
-                links.append(href)
-                seen.add(href)
-                if len(links) >= limit:
-                    break
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        result = driver.execute_script(HARVEST_LINKS_JS, selector)
+        for href in result["hrefs"]:
+            url = clean_url(href)
+            if url in seen or "video" in url:
+                continue
+            seen.add(url)
+            if is_new is not None and not is_new(url):
+                continue
+            links.append(url)
+            if len(links) >= limit:
+                break
+
+        state = (result["count"], result["height"])
+        if state == last_state:
+            # Số thẻ và chiều cao trang không đổi sau lần cuộn trước: không còn gì để tải thêm
+            break
+        last_state = state
         time.sleep(delay)
         scrolls += 1
     return links
 
-# Nếu gặp lỗi thì tự động thử lại một số lần trước khi bỏ cuộc
-def visit_with_retry(driver, url, retries=3, delay=2):
-    for _ in range(retries):
+# Thời gian tối đa (giây) chờ một trang tải xong trong trình duyệt, mặc định của Selenium là 300s
+PAGE_LOAD_TIMEOUT = 30
+
+# Nếu gặp lỗi thì tự động thử lại một số lần trước khi bỏ cuộc (chờ tăng dần giữa các lần thử)
+# stats (dict): nếu có thì ghi số lần thử lại (retries) và lỗi cuối cùng (error)
+# budget (CrawlBudget): timeout tải trang không vượt quá hạn chót, hết giờ thì không thử lại nữa
+def visit_with_retry(driver, url, retries=3, delay=1, stats=None, budget=None):
+    stats = stats if stats is not None else {}
+    for attempt in range(retries):
+        if budget is not None and attempt > 0 and budget.expired():
+            print(f"⏰ Hết giờ, không thử lại {url}")
+            stats["error"] = "deadline"
+            break
+        stats["retries"] = attempt
         try:
+            if budget is not None:
+                driver.set_page_load_timeout(budget.timeout(PAGE_LOAD_TIMEOUT))
             driver.get(url)
             return True
+        except InvalidSessionIdException:
+            # Phiên chromedriver đã chết: thử lại trên driver này vô ích, để BrowserPool thay driver mới
+            raise
         except Exception as e:
+            stats["error"] = type(e).__name__
+            if attempt == retries - 1:
+                print(f"🔁 Lỗi khi load {url}, bỏ qua: {e}")
+                break
             print(f"🔁 Lỗi khi load {url}, thử lại... {e}")
-            time.sleep(delay)
+            wait = backoff_delay(attempt, base=delay)
+            time.sleep(min(wait, max(0.0, budget.remaining())) if budget is not None else wait)
     return False
 
 # Khởi tạo driver
@@ -62,7 +118,23 @@ def visit_with_retry(driver, url, retries=3, delay=2):
 #     options.add_argument("--window-size=1920,1080")
 #     return webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
 
-def setup_driver(headless=True):
+# Các tài nguyên không cần cho việc đọc text: ảnh, video, font và các host quảng cáo / tracking.
+# Chặn qua CDP Network.setBlockedURLs (URL ảnh vẫn đọc được từ thuộc tính src/data-src).
+BLOCKED_URL_PATTERNS = [
+    "*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+    "*.mp4", "*.webm", "*.m3u8", "*.ts", "*.mp3",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*googletagmanager.com*", "*google-analytics.com*", "*doubleclick.net*", "*googlesyndication.com*",
+    "*googleadservices.com*", "*adservice.google.*", "*facebook.net*", "*connect.facebook.*",
+    "*adnxs.com*", "*admicro.vn*", "*eclick.vn*", "*adtimaserver.vn*", "*ants.vn*", "*dable.io*",
+    "*taboola.com*", "*outbrain.com*", "*scorecardresearch.com*", "*chartbeat.*", "*hotjar.com*",
+]
+
+# lean=True: profile gọn cho crawl - chặn ảnh/media/font/quảng cáo, tắt tính năng thừa,
+# và dùng page load strategy "eager" (trả về khi DOM sẵn sàng, không chờ tải hết tài nguyên)
+# profile_dir: thư mục user-data giữ lại giữa các lần chạy (cache CSS/JS), mặc định Chrome dùng profile tạm;
+# disk_cache_bytes: giới hạn cache HTTP của Chrome
+def setup_driver(headless=True, lean=True, profile_dir=None, disk_cache_bytes=None):
     options = Options()
     options.add_argument("user-agent=Mozilla/5.0")
     if headless:
@@ -72,9 +144,71 @@ def setup_driver(headless=True):
     options.add_argument("--disable-gpu")
     options.add_argument("--window-size=1920,1080")
     options.add_experimental_option("excludeSwitches", ["enable-logging"])
-    return webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
 
+    if lean:
+        options.page_load_strategy = "eager"
+        options.add_argument("--blink-settings=imagesEnabled=false")
+        options.add_argument("--mute-audio")
+        options.add_argument("--autoplay-policy=user-gesture-required")
+        for flag in ("--disable-extensions", "--disable-notifications", "--disable-background-networking",
+                     "--disable-default-apps", "--disable-sync", "--disable-translate",
+                     "--disable-component-update", "--no-first-run"):
+            options.add_argument(flag)
+        options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.managed_default_content_settings.media_stream": 2,
+            "profile.default_content_setting_values.notifications": 2,
+            "profile.default_content_setting_values.geolocation": 2,
+        })
+
+    if profile_dir:
+        options.add_argument(f"--user-data-dir={os.path.abspath(profile_dir)}")
+        options.add_argument("--no-first-run")
+        options.add_argument("--hide-crash-restore-bubble")
+    if disk_cache_bytes:
+        options.add_argument(f"--disk-cache-size={disk_cache_bytes}")
+
+    # chromedriver chỉ được tìm một lần rồi ghim lại, thay vì gọi webdriver-manager mỗi lần mở Chrome
+    try:
+        driver = webdriver.Chrome(service=Service(resolve_chromedriver()), options=options)
+    except SessionNotCreatedException:
+        # Chrome đã được cập nhật, driver đã ghim không còn khớp: tìm lại driver một lần
+        unpin_chromedriver()
+        driver = webdriver.Chrome(service=Service(resolve_chromedriver()), options=options)
+
+    # Một trang bị treo không giữ worker quá PAGE_LOAD_TIMEOUT mỗi lần thử
+    driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+    if lean:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    return driver
+
+
+# Hàm tạo driver cho BrowserPool. profiles: BrowserProfiles để dùng lại profile (và cache) giữa các lượt crawl,
+# mỗi Chrome giữ riêng một thư mục profile và trả lại khi driver.quit()
+def make_driver_factory(headless=True, profiles=None):
+    if profiles is None:
+        return lambda: setup_driver(headless=headless)
+
+    def create():
+        profile_dir = profiles.acquire()
+        try:
+            driver = setup_driver(headless=headless, profile_dir=profile_dir, disk_cache_bytes=profiles.disk_cache_bytes)
+        except Exception:
+            profiles.release(profile_dir)
+            raise
+        quit_driver = driver.quit
+
+        def quit_and_release():
+            try:
+                quit_driver()
+            finally:
+                profiles.release(profile_dir)
+
+        driver.quit = quit_and_release
+        return driver
 
+    return create
 
 # Cuộn 5 lần để tải load lại nội dung
 def scroll_down(driver, times=5, delay=2):
@@ -82,27 +216,44 @@ def scroll_down(driver, times=5, delay=2):
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
         time.sleep(delay)
         
-# Lưu dữ liệu
-def save_all_data(all_data):
-    output_file = get_output_file()
+# Đọc file JSON cũ (all_news_combined.json) nếu có
+def load_legacy_data():
     try:
-        with open(output_file, "r", encoding="utf-8") as f:
-            old_data = json.load(f)
-    except:
-        old_data = []
-
-    existing_urls = set(item["url"] for item in old_data if "url" in item)
-    new_data = [item for item in all_data if item["url"] not in existing_urls]
+        with open(get_output_file(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
 
-    combined_data = old_data + new_data
-    for idx, item in enumerate(combined_data, 1):
-        item["id"] = idx
+# Mở kho dữ liệu thô, lần đầu thì chuyển dữ liệu từ file JSON cũ sang
+def open_raw_store():
+    first_time = not RawStore.exists()
+    store = RawStore()
+    if first_time:
+        imported = store.import_legacy(load_legacy_data())
+        print(f"📦 Đã chuyển {imported} bài từ '{get_output_file()}' sang kho '{store.root}'")
+    return store
 
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(combined_data, f, ensure_ascii=False, indent=2)
+# Lưu dữ liệu: chỉ ghi thêm các bài mới vào kho JSONL, id được cấp cố định khi thêm
+def save_all_data(all_data):
+    store = open_raw_store()
+    try:
+        new_data = store.append(all_data)
+        print(f"\n✅ Đã lưu {len(new_data)} bài báo mới (tổng cộng {store.count()}) vào '{store.root}'")
+        return new_data
+    finally:
+        store.close()
 
-    print(f"\n✅ Đã lưu {len(new_data)} bài báo mới (tổng cộng {len(combined_data)}) vào '{output_file}'")
 
+# Mở frontier, lần đầu thì đánh dấu các bài đã lưu là đã tải
+def open_frontier():
+    frontier = Frontier()
+    if frontier.is_empty():
+        store = open_raw_store()
+        try:
+            frontier.seed(store.urls())
+        finally:
+            store.close()
+    return frontier
 
 # Làm sạch url để loại bỏ các url trùng
 def clean_url(url):
@@ -110,339 +261,350 @@ def clean_url(url):
     parsed = urlparse(url)
     return urlunparse(parsed._replace(fragment=""))
 
-# Crawl VNexpress
-def crawl_vnexpress(driver, limit):
-    url = "https://vnexpress.vn/"
-    if not visit_with_retry(driver, url):
-        return []
-    
-    scroll_down(driver, times=2)
-    WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, 'article')))
-
-    selector = 'article.item-news h3.title-news a, article.article-list a.title-news'
-    links = scroll_until_enough_links(driver, selector, limit=limit, max_scrolls=15, delay=2)
-    links = list(set([clean_url(link) for link in links]))
-    print(f"🔍 VNExpress: Thu thập {len(links)} link")
-
+# Mở bài viết bằng trình duyệt khi HTML tĩnh thiếu tiêu đề hoặc nội dung.
+# Chỉ lấy page_source một lần rồi trích xuất bằng lxml, thay vì gọi
+# find_element/.text/get_attribute cho từng trường (mỗi lần là một round-trip WebDriver)
+# recorder: WarcWriter để ghi lại DOM đã render; replay: ReplayServer để mở bản ghi thay vì trang thật;
+# archive: HtmlArchive để lưu DOM đã render cho lần trích xuất lại; telemetry: Telemetry ghi số liệu trang;
+# budget: CrawlBudget giới hạn thời gian tải trang theo hạn chót của lượt crawl;
+# stats: dict nhận số lần thử lại, lỗi và "loaded" (trình duyệt mở được trang, kể cả khi không trích xuất được bài)
+def extract_with_driver(driver, link, site, recorder=None, replay=None, archive=None, telemetry=None, budget=None,
+                        stats=None):
+    print(f"🌐 HTML tĩnh thiếu dữ liệu, mở bằng trình duyệt: {link}")
+    target = replay.rewrite(link, SOURCE_BROWSER) if replay is not None else link
+    stats = stats if stats is not None else {}
+    stats["loaded"] = False
+    start = time.monotonic()
+    if not visit_with_retry(driver, target, stats=stats, budget=budget):
+        if telemetry is not None:
+            telemetry.record(site, link, "browser", "failed", phases={"fetch": time.monotonic() - start},
+                             retries=stats.get("retries", 0), error=stats.get("error"))
+        return None
+    stats["loaded"] = True
+    fetch_seconds = time.monotonic() - start
+    wait_start = time.monotonic()
+    if replay is None:
+        time.sleep(1.5)
+    wait_seconds = time.monotonic() - wait_start
+
+    extract_start = time.monotonic()
+    page_source = driver.page_source
+    if recorder is not None:
+        recorder.write(link, page_source, source=SOURCE_BROWSER)
+    if archive is not None:
+        archive.put(site, link, page_source)
+    article = extract_article(site, page_source, link)
+    if telemetry is not None:
+        telemetry.record(
+            site, link, "browser", "ok" if article else "failed",
+            phases={"fetch": fetch_seconds, "wait": wait_seconds, "extract": time.monotonic() - extract_start},
+            retries=stats.get("retries", 0), bytes=len(page_source.encode("utf-8")),
+            error=None if article else "missing title/content",
+        )
+    return article
+
+# Tải bài viết qua HTTP trước, chỉ mở trình duyệt khi cần
+def crawl_articles(driver, session, site, links, frontier=None):
     results = []
 
-    # Truy cập từng bài viết
     for idx, link in enumerate(links, start=1):
         try:
-            if not visit_with_retry(driver, link):
+            stats = {}
+            page_source = fetch_html(session, link, stats=stats)
+            if page_source is None:
+                # Tải lỗi (404, timeout, ...): không mở bằng trình duyệt, lượt sau thử lại
+                if frontier is not None:
+                    frontier.mark_fetched(site, link, False, stats.get("error", "fetch failed"))
                 continue
-            time.sleep(1.5)
-
-            # Tiêu đề
-            try:
-                title = driver.find_element(By.CSS_SELECTOR, 'h1.title-detail').text.strip()
-            except:
-                title = ""
-
-            # Mô tả (thường là đoạn đầu nội dung)
-            try:
-                description = driver.find_element(By.CSS_SELECTOR, 'p.description').text.strip()
-            except:
-                try:
-                    description = driver.find_element(By.CSS_SELECTOR, 'article.fck_detail p').text.strip()
-                except:
-                    description = ""
-
-            # Nội dung bài viết
-            try:
-                content_elements = driver.find_elements(By.CSS_SELECTOR, 'article.fck_detail p')
-                content = '\n'.join([el.text.strip() for el in content_elements if el.text.strip() != ""])
-            except:
-                content = ""
-
-            # Tags (chuyên mục)
-            try:
-                WebDriverWait(driver, 10).until(
-                    EC.presence_of_all_elements_located((By.CSS_SELECTOR, 'ul.breadcrumb li a'))
-                )
-                tag_elements = driver.find_elements(By.CSS_SELECTOR, 'ul.breadcrumb li a')
-
-                tag_texts = []
-                for el in tag_elements:
-                    text = el.text.strip()
-                    if not text:
-                        # Thử lấy text trong thẻ con nếu có
-                        text = el.get_attribute("innerText").strip()
-                    if text.lower() != "trang chủ" and text != "":
-                        tag_texts.append(text)
-
-                tags = tag_texts
-                if not tags:
-                    print(f"⚠️ Breadcrumb chỉ chứa 'Trang chủ' hoặc không có thẻ hợp lệ: {driver.current_url}")
-            except Exception as e:
-                tags = []
-                print(f"❌ Lỗi khi lấy breadcrumb/tags: {e}")
-
-            # Thời gian đăng
-            try:
-                time_posted = driver.find_element(By.CSS_SELECTOR, 'span.date').text.strip()
-            except:
-                time_posted = "Không có thời gian"
-                    
-            # Tác giả
-            try:
-                author = driver.find_element(By.CSS_SELECTOR, 'p.Normal[style*="text-align:right"] strong').text.strip()
-            except:
-                author = ""
-
-            # Lấy ảnh
-            image_url = ""
-            try:
-                image = driver.find_element(By.CSS_SELECTOR, 'img[itemprop="contentUrl"]')
-                image_url = image.get_attribute('data-src') or image.get_attribute('src')
-            except:
-                pass
-
-            if not title or not content:
+            article = extract_article(site, page_source, link)
+            if article is None:
+                article = extract_with_driver(driver, link, site)
+            if article is None:
+                # Bài tải được sẽ được đánh dấu đã tải sau khi lưu vào kho (xem crawl_vnexpress_only, ...)
+                if frontier is not None:
+                    frontier.mark_fetched(site, link, False, "missing title/content")
                 continue
 
             # Ghi lại kết quả
-            print(f"{idx}. {title}")
-            results.append({
-                "id": idx,
-                "title": title,
-                "url": link,
-                "description": description,
-                "content": content,
-                "tags": tags,
-                "time_posted": time_posted,
-                "author": author,
-                "image": image_url
-            })
+            print(f"{idx}. {article['title']}")
+            results.append({"id": idx, **article})
 
         except Exception as e:
             print(f"⚠️ Lỗi khi xử lý {link}: {e}")
 
     return results
 
-# Crawl dantri
-def crawl_dantri(driver, limit):
-    url = "https://dantri.com.vn/"
-    if not visit_with_retry(driver, url):
-        return []
-
-    scroll_down(driver, times=2)
-    WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, 'article')))
-
-    selector = 'article.article-item h3.article-title a'
-    links = scroll_until_enough_links(driver, selector, limit=limit, max_scrolls=15, delay=2)
-    links = list(set([clean_url(link) for link in links]))
-    print(f"🔍 Dân trí: Thu thập {len(links)} link")
-
-    results = []
-
-    for idx, link in enumerate(links, start=1):
-        try: 
-            if not visit_with_retry(driver, link):
-                continue
-            time.sleep(1.5)
-
-            # Tiêu đề
-            try:
-                title = driver.find_element(By.CSS_SELECTOR, 'h1.title-page.detail').text.strip()
-            except:
-                title = ""
-
-            # Mô tả (thường là đoạn đầu nội dung)
-            try:
-                description = driver.find_element(By.CSS_SELECTOR, 'h2.singular-sapo').text.strip()
-            except:
-                try:
-                    description = driver.find_element(By.CSS_SELECTOR, 'article.fck_detail p').text.strip()
-                except:
-                    description = ""
-
-            # Nội dung bài viết
-            try:
-                content_elements = driver.find_elements(By.CSS_SELECTOR, 'div.singular-content')
-                content = '\n'.join([el.text.strip() for el in content_elements if el.text.strip() != ""])
-            except:
-                content = ""
-
-            # Tags (chuyên mục)
-            try:
-                tag_elements = driver.find_elements(By.CSS_SELECTOR, 'ul.dt-list-none li a')
-                tags = [tag.text.strip().title() for tag in tag_elements if tag.text.strip()]
-            except:
-                tags = []
-
-            # Thời gian đăng
-            try:
-                time_posted = driver.find_element(By.CSS_SELECTOR, 'time.author-time').text.strip()
-            except:
-                time_posted = "Không có thời gian"
-            
-            # Tác giả
-            try:
-                author_elements = driver.find_elements(By.CSS_SELECTOR, 'div.author-name a b')
-                authors = [author.text.strip() for author in author_elements if author.text.strip()]
-            except:
-                authors = []
-
-            # Lấy ảnh
-            try:
-                image_element = driver.find_element(By.CSS_SELECTOR, 'figure.image.align-center img')
-                image_url = image_element.get_attribute('data-src') or image_element.get_attribute('src')
-            except:
-                image_url = ""
-
-            if not title or not content:
-                continue
-
-            # Ghi lại kết quả
-            print(f"{idx}. {title}")
-            results.append({
-                "id": idx,
-                "title": title,
-                "url": link,
-                "description": description,
-                "content": content,
-                "tags": tags,
-                "time_posted": time_posted,
-                "author": authors,
-                "image": image_url
-            })
+# Thu thập link từ trang danh sách của một trang báo (cấu hình trong SITE_SPECS)
+# Lấy link từ RSS / sitemap, mới nhất trước. Trả về None nếu không dùng được feed
+def discover_feed_links(session, site, limit, frontier=None):
+    candidates = discover_links(session, SITE_SPECS[site])
+    if candidates is None:
+        return None
 
-        except Exception as e:
-            print(f"⚠️ Lỗi khi xử lý {link}: {e}")
-    return results
+    links = []
+    for url, _ in candidates:
+        url = clean_url(url)
+        if url in links or (frontier is not None and not frontier.is_new(url)):
+            continue
+        links.append(url)
+        if len(links) >= limit:
+            break
+    return links
 
-# Crawl Vietnamnet
-def crawl_vietnamnet(driver, limit):
-    url = "https://vietnamnet.vn/"
-    if not visit_with_retry(driver, url):
+# Cuộn trang danh sách bằng trình duyệt để lấy link
+# Nếu có frontier thì bỏ qua các bài đã tải, limit chỉ tính bài mới
+def scroll_listing_links(driver, site, limit, frontier=None):
+    spec = SITE_SPECS[site]
+    if not visit_with_retry(driver, spec["listing_url"]):
         return []
-    
-    scroll_down(driver, times=2)
-    WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, 'a[href*=".html"]')))
 
-    selector = 'a[href*=".html"]'
-    links = scroll_until_enough_links(driver, selector, limit=limit, max_scrolls=15, delay=2)
-    links = list(set([clean_url(link) for link in links]))
-
-    print(f"🔍 Vietnamnet: Thu thập {len(links)} link")
-    results = []
-
-    for idx, link in enumerate(links, start=1):
-        try:
-            if not visit_with_retry(driver, link):
-                continue
-            time.sleep(1.5)
-
-            # Tiêu đề
-            try:
-                title = driver.find_element(By.CSS_SELECTOR, 'h1.content-detail-title').text.strip()
-            except:
-                title = ""
+    # scroll_until_enough_links tự cuộn trang, không cần cuộn trước bằng scroll_down
+    WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, spec["listing_wait"])))
+
+    is_new = frontier.is_new if frontier is not None else None
+    # Link trả về đã được làm sạch và bỏ trùng, giữ thứ tự xuất hiện trên trang
+    return scroll_until_enough_links(driver, spec["link_selector"], limit=limit, max_scrolls=15, delay=2, is_new=is_new)
+
+# Thu thập link bài viết: ưu tiên RSS / sitemap qua HTTP, chỉ cuộn trang bằng trình duyệt khi feed lỗi
+def collect_links(driver, site, limit, frontier=None, session=None):
+    links = None
+    if session is not None:
+        links = discover_feed_links(session, site, limit, frontier)
+        if links is None:
+            print(f"⚠️ Không đọc được RSS/sitemap của {site}, chuyển sang cuộn trang")
+    if links is None:
+        links = scroll_listing_links(driver, site, limit, frontier)
+    print(f"🔍 {SITE_SPECS[site]['name']}: Thu thập {len(links)} link")
+
+    if frontier is not None:
+        frontier.mark_discovered(site, links)
+    return links
 
-            # Mô tả (thường là đoạn đầu nội dung)
-            try:
-                description = driver.find_element(By.CSS_SELECTOR, 'h2.content-detail-sapo.sm-sapo-mb-0').text.strip()
-            except:
-                try:
-                    description = driver.find_element(By.CSS_SELECTOR, 'article.fck_detail p').text.strip()
-                except:
-                    description = ""
-
-            # Nội dung bài viết
-            try:
-                content_elements = driver.find_elements(By.CSS_SELECTOR, 'div.maincontent')
-                content = '\n'.join([el.text.strip() for el in content_elements if el.text.strip() != ""])
-            except:
-                content = ""
+# Crawl một trang báo bất kỳ có trong SITE_SPECS
+def crawl_site(driver, site, limit, session=None, frontier=None):
+    session = session or create_session()
+    links = collect_links(driver, site, limit, frontier, session)
+    return crawl_articles(driver, session, site, links, frontier)
 
-            # Tags (chuyên mục)
-            try:
-                tag_elements = driver.find_elements(By.CSS_SELECTOR, 'div.bread-crumb-detail a[title]')
-                tags = [a.text.strip() for a in tag_elements if a.text.strip()]
-            except Exception as e:
-                print(f"⚠️ Không lấy được tags: {e}")
-                tags = []
-
-            # Thời gian đăng
-            try:
-                time_posted = driver.find_element(By.CSS_SELECTOR, 'div.bread-crumb-detail__time').text.strip()
-            except:
-                time_posted = "Không có thời gian"
-            
-            # Tác giả
-            try:
-                author_elements = driver.find_elements(By.CSS_SELECTOR, 'div.article-author-multiple__slide div.name a')
-                if not author_elements:
-                    # Nếu không phải layout nhiều tác giả thì fallback sang layout 1 tác giả
-                    author_elements = driver.find_elements(By.CSS_SELECTOR, 'div.article-detail-author-wrapper span.name a')
-                
-                authors = [author.text.strip() for author in author_elements if author.text.strip()]
-            except:
-                authors = []
+# Crawl VNexpress
+def crawl_vnexpress(driver, limit, session=None, frontier=None):
+    return crawl_site(driver, "vnexpress", limit, session, frontier)
 
-            # Lấy ảnh
-            try:
-                image_element = driver.find_element(By.CSS_SELECTOR, 'figure.image.vnn-content-image img')
-                image_url = image_element.get_attribute('data-original') or image_element.get_attribute('src')
-            except:
-                image_url = ""
+# Crawl dantri
+def crawl_dantri(driver, limit, session=None, frontier=None):
+    return crawl_site(driver, "dantri", limit, session, frontier)
 
-            if not title or not content:
-                continue
+# Crawl Vietnamnet
+def crawl_vietnamnet(driver, limit, session=None, frontier=None):
+    return crawl_site(driver, "vietnamnet", limit, session, frontier)
+
+# Thu thập link của nhiều trang: từ RSS / sitemap, trang nào lỗi feed thì cuộn trang chủ bằng trình duyệt
+# (song song trên BrowserPool). Trả về ({site: [link]}, {site: lỗi})
+def collect_all_links(session, pool, frontier, site_limits, use_feeds=True, replay=None, budget=None):
+    site_links = {}
+    errors = {}
+    scroll_sites = []
+    for site, site_limit in site_limits.items():
+        print(f"🚀 Bắt đầu crawl: {site.upper()}")
+        links = discover_feed_links(session, site, site_limit, frontier) if use_feeds else None
+        if links is None and replay is not None:
+            # Trang danh sách cuộn bằng trình duyệt không phát lại được
+            print(f"⚠️ Không có RSS/sitemap của {site} trong bản ghi, bỏ qua")
+            site_links[site] = []
+        elif links is None:
+            scroll_sites.append(site)
+        else:
+            site_links[site] = links
 
-            # Ghi lại kết quả
-            print(f"{idx}. {title}")
-            results.append({
-                "id": idx,
-                "title": title,
-                "url": link,
-                "description": description,
-                "content": content,
-                "tags": tags,
-                "time_posted": time_posted,
-                "author": authors,
-                "image": image_url
-            })
+    def scroll_site(driver, site):
+        if budget is not None and not budget.allow(site, SITE_SPECS[site]["listing_url"]):
+            return None
+        return scroll_listing_links(driver, site, site_limits[site], frontier)
 
-        except Exception as e:
-            print(f"⚠️ Lỗi khi xử lý {link}: {e}")
+    scrolled = pool.map(scroll_site, scroll_sites)
+    for site, links in zip(scroll_sites, scrolled):
+        if links is None:
+            errors[site] = "Không thu thập được link từ trang chủ"
+        else:
+            site_links[site] = links
 
-    return results
+    for site, links in site_links.items():
+        print(f"🔍 {SITE_SPECS[site]['name']}: Thu thập {len(links)} link")
+        frontier.mark_discovered(site, links)
+    return site_links, errors
 
 # Crawl tất cả các trang - chức năng chính để gọi từ Airflow
-def crawl_all_sites(limit=50):
+def crawl_all_sites(limit=50, concurrency_per_domain=4, requests_per_second=4.0, max_in_flight=12, use_feeds=True,
+                    browser_workers=2, recycle_after=50, record_to=None, replay_from=None,
+                    on_article=None, archive_html=True, site_limits=None, deadline_seconds=None, reserve_seconds=30,
+                    site_links=None, output_file=None, persistent_profile=False, profile_cache_mb=512, replay=None):
     """
     Hàm chính để crawl tất cả các trang báo
     Args:
         limit (int): Số lượng bài báo tối đa cần crawl từ mỗi trang
+        concurrency_per_domain (int): Số request đồng thời tối đa cho mỗi trang
+        requests_per_second (float): Số request mỗi giây tối đa cho mỗi trang
+        max_in_flight (int): Số request đồng thời tối đa trên tất cả các trang
+        use_feeds (bool): Lấy link từ RSS / sitemap thay vì cuộn trang chủ bằng trình duyệt
+        browser_workers (int): Số Chrome headless chạy song song cho các trang cần trình duyệt
+        recycle_after (int): Khởi động lại mỗi Chrome sau số trang này để giới hạn bộ nhớ
+        record_to (str): Ghi mọi trang đã tải (feed, HTML, DOM từ trình duyệt) vào file .warc.gz này
+        replay_from (str): Chạy offline, phát lại các trang từ file .warc.gz đã ghi thay vì tải từ Internet
+        on_article (callable): Gọi on_article(site, record) ngay khi mỗi bài được trích xuất,
+            để xử lý tiếp (tiền xử lý, NER) song song với việc crawl
+        archive_html (bool): Lưu HTML gốc của các bài vào kho nén (data/html) để chạy lại trích xuất
+        site_limits (dict): {site: limit} từ crawl_data.scheduler, chỉ crawl các trang này theo đúng thứ tự
+            (trang đứng trước được ưu tiên trình duyệt). Mặc định crawl mọi trang với cùng limit
+        deadline_seconds (float): Thời gian tối đa cho cả lượt crawl. Số link mỗi trang được cắt theo chi phí
+            ước tính từ các lần chạy trước; hết giờ thì dừng tải và lưu những bài đã có
+        reserve_seconds (float): Thời gian chừa lại trước hạn chót để lưu kết quả
+        site_links (dict): {site: [link]} đã thu thập sẵn (vd. một shard của crawl_data.sharding), bỏ qua bước 1
+        output_file (str): Ghi bài viết ra file JSONL này thay vì vào kho bài (để gộp sau)
+        persistent_profile (bool): Giữ profile Chrome (cache CSS/JS) giữa các lượt crawl trong data/browser,
+            mỗi worker một thư mục, thay vì mở Chrome với profile tạm mới mỗi lần
+        profile_cache_mb (int): Dung lượng tối đa của các profile giữ lại, vượt thì xoá cache cũ nhất
+        replay (ReplayServer): Server phát lại đã chạy sẵn, thay cho replay_from (vd. benchmark nạp WARC trước
+            khi bấm giờ); không bị dừng khi crawl xong
     Returns:
-        dict: Kết quả crawl từ tất cả các trang
+        dict: Kết quả crawl từ tất cả các trang (kèm số link và thời gian từng bước)
     """
     output_dir = get_output_file()
-    driver = setup_driver(headless=True)
-    
-    try:
-        crawlers = {
-            "vnexpress": crawl_vnexpress,
-            "dantri": crawl_dantri,
-            "vietnamnet": crawl_vietnamnet,
-        }
+    # Chrome chỉ được mở khi thực sự có trang cần trình duyệt
+    profiles = BrowserProfiles(max_mb=profile_cache_mb, slots=browser_workers) if persistent_profile else None
+    pool = BrowserPool(make_driver_factory(headless=True, profiles=profiles), size=browser_workers,
+                       recycle_after=recycle_after)
+    session = create_session(pool_size=max_in_flight)
+    frontier = open_frontier()
+    archive = HtmlArchive() if archive_html else None
+    budget = CrawlBudget(deadline_seconds, reserve_seconds=reserve_seconds)
+    telemetry = Telemetry()
+
+    recorder = None
+    if record_to:
+        recorder = WarcWriter(record_to)
+        session.hooks["response"].append(recorder.record_response)
+        print(f"🔴 Ghi lại các trang đã tải vào {record_to}")
+    owns_replay = replay is None and bool(replay_from)
+    if owns_replay:
+        replay = ReplayServer([replay_from]).start()
+    if replay is not None:
+        mount_replay(session, replay)
+
+    phase_seconds = {}
+    phase_start = time.perf_counter()
+
+    def end_phase(name):
+        nonlocal phase_start
+        now = time.perf_counter()
+        phase_seconds[name] = round(now - phase_start, 3)
+        phase_start = now
+
+    if site_limits is None and site_links is not None:
+        site_limits = {site: len(links) for site, links in site_links.items()}
+    elif site_limits is None:
+        site_limits = {site: limit for site in SITE_SPECS}
 
+    try:
         results = {}
-        for site, func in crawlers.items():
-            print(f"🚀 Bắt đầu crawl: {site.upper()}")
+
+        # Bước 1: thu thập link (bỏ qua nếu đã có sẵn, vd. từng shard khi crawl phân tán)
+        if site_links is None:
+            site_links, errors = collect_all_links(session, pool, frontier, site_limits, use_feeds, replay, budget)
+            for site, error in errors.items():
+                results[site] = {"success": False, "error": error}
+        end_phase("discover")
+
+        # Bước 2: tải bài viết của tất cả các trang song song qua HTTP
+        # Có hạn chót thì chỉ giữ số link ước tính kịp tải
+        fitted_links = budget.fit_links(site_links, max_in_flight, browser_workers)
+        crawled, failed = crawl_links_concurrently(
+            fitted_links,
+            session=session,
+            concurrency_per_domain=concurrency_per_domain,
+            requests_per_second=requests_per_second,
+            max_in_flight=max_in_flight,
+            on_article=on_article,
+            archive=archive,
+            budget=budget,
+            telemetry=telemetry,
+        )
+        http_counts = {site: len(data) for site, data in crawled.items()}
+        end_phase("http")
+
+        # Trang tải lỗi (404, timeout, ...) không mở lại bằng trình duyệt: ghi một lần thử vào frontier,
+        # lượt sau thử lại tới khi quá số lần thử. Hết giờ thì để lại cho lượt sau, không tính là một lần thử
+        for site, entries in failed.items():
+            for idx, link, error in entries:
+                if error is not None and error != "deadline":
+                    frontier.mark_fetched(site, link, False, error)
+
+        # Bước 3: mở bằng trình duyệt (song song trên các worker) những bài HTML tĩnh tải được nhưng không đủ dữ liệu
+        # Theo thứ tự site_limits: trang đăng bài nhanh nhất được trình duyệt xử lý trước
+        fallback_tasks = [
+            (site, idx, link) for site in site_limits if site in failed for idx, link, error in failed[site] if error is None
+        ]
+
+        skipped_links = set()
+
+        def extract_fallback(driver, task):
+            site, idx, link = task
+            if not budget.allow(site, link):
+                skipped_links.add(link)
+                telemetry.record(site, link, "browser", "skipped", error="deadline / circuit breaker")
+                return None
+            start = time.monotonic()
+            stats = {}
+            article = extract_with_driver(driver, link, site, recorder, replay, archive, telemetry, budget, stats)
+            # Ngắt mạch chỉ tính lỗi tải trang: trang mở được nhưng không có bài (video, ảnh, thiếu trường)
+            # không phải lỗi của domain
+            budget.record(site, link, "browser", time.monotonic() - start, stats.get("loaded", False))
+            if article is not None and on_article is not None:
+                on_article(site, {"id": idx, **article})
+            return article
+
+        fallback_articles = pool.map(extract_fallback, fallback_tasks)
+        for (site, idx, link), article in zip(fallback_tasks, fallback_articles):
+            if article is not None:
+                crawled[site].append({"id": idx, **article})
+            elif link in skipped_links:
+                # Hết giờ hoặc domain bị ngắt mạch: để lại cho lượt sau, không tính là một lần thử
+                continue
+            else:
+                frontier.mark_fetched(site, link, False, "missing title/content")
+        pool.report()
+        end_phase("browser")
+
+        # Bước 4: lưu kết quả từng trang
+        for site in site_links:
             try:
-                data = func(driver, limit=limit)
-                if len(data) < limit:
-                    print(f"⚠️ Chỉ lấy được {len(data)}/{limit} bài từ {site}")
+                data = crawled[site]
+                data.sort(key=lambda item: item["id"])
+
+                for item in data:
+                    print(f"{item['id']}. {item['title']}")
+                if len(data) < site_limits[site]:
+                    print(f"⚠️ Chỉ lấy được {len(data)}/{site_limits[site]} bài từ {site}")
                 
-                output_path = os.path.join(output_dir, f"{site}.json")
-                save_all_data(data)
+                output_path = output_file or os.path.join(output_dir, f"{site}.json")
+                save_start = time.monotonic()
+                if output_file:
+                    with open(output_file, "a", encoding="utf-8") as f:
+                        for item in data:
+                            f.write(json.dumps({"site": site, **item}, ensure_ascii=False) + "\n")
+                else:
+                    save_all_data(data)
+                    # Chỉ đánh dấu đã tải khi bài đã nằm trong kho: lưu lỗi thì link vẫn là "discovered",
+                    # lượt sau tải lại. Khi ghi ra file của shard, bước gộp (merge_shards) mới đánh dấu
+                    frontier.mark_done(site, [item["url"] for item in data])
+                telemetry.record_save(site, time.monotonic() - save_start, len(data))
                 results[site] = {
                     "success": True,
                     "count": len(data),
-                    "file_path": output_path
+                    "file_path": output_path,
+                    "links": len(site_links[site]),
+                    "http_count": http_counts.get(site, 0),
+                    "browser_count": len(data) - http_counts.get(site, 0),
+                    "skipped": budget.skipped.get(site, 0),
                 }
                 
             except Exception as e:
@@ -453,11 +615,26 @@ def crawl_all_sites(limit=50):
                 }
                 import traceback
                 traceback.print_exc()
-                
+        end_phase("save")
+
+        summary = telemetry.print_summary()
+        for site, result in results.items():
+            result["phase_seconds"] = phase_seconds
+            result["telemetry"] = summary.get(site)
+            result["telemetry_file"] = telemetry.path
         return results
         
     finally:
-        driver.quit()
+        frontier.close()
+        session.close()
+        budget.close()
+        telemetry.close()
+        if archive is not None:
+            archive.close()
+        if recorder is not None:
+            recorder.close()
+        if owns_replay:
+            replay.stop()
         print("\n✅ Đã đóng trình duyệt.")
 
 # Hàm riêng biệt để crawl từng trang (để có thể gọi độc lập trong Airflow)
@@ -465,42 +642,51 @@ def crawl_vnexpress_only(limit=50):
     """Crawl chỉ VNExpress"""
     output_dir = get_output_file()
     driver = setup_driver(headless=True)
+    frontier = open_frontier()
     try:
-        data = crawl_vnexpress(driver, limit)
+        data = crawl_vnexpress(driver, limit, frontier=frontier)
         output_path = os.path.join(output_dir, "vnexpress.json")
         save_all_data(data)
+        frontier.mark_done("vnexpress", [item["url"] for item in data])
         return {"success": True, "count": len(data), "file_path": output_path}
     except Exception as e:
         return {"success": False, "error": str(e)}
     finally:
+        frontier.close()
         driver.quit()
 
 def crawl_dantri_only(limit=50):
     """Crawl chỉ Dân trí"""
     output_dir = get_output_file()
     driver = setup_driver(headless=True)
+    frontier = open_frontier()
     try:
-        data = crawl_dantri(driver, limit)
+        data = crawl_dantri(driver, limit, frontier=frontier)
         output_path = os.path.join(output_dir, "dantri.json")
         save_all_data(data)
+        frontier.mark_done("dantri", [item["url"] for item in data])
         return {"success": True, "count": len(data), "file_path": output_path}
     except Exception as e:
         return {"success": False, "error": str(e)}
     finally:
+        frontier.close()
         driver.quit()
 
 def crawl_vietnamnet_only(limit=50):
     """Crawl chỉ Vietnamnet"""
     output_dir = get_output_file()
     driver = setup_driver(headless=True)
+    frontier = open_frontier()
     try:
-        data = crawl_vietnamnet(driver, limit)
+        data = crawl_vietnamnet(driver, limit, frontier=frontier)
         output_path = os.path.join(output_dir, "vietnamnet.json")
         save_all_data(data)
+        frontier.mark_done("vietnamnet", [item["url"] for item in data])
         return {"success": True, "count": len(data), "file_path": output_path}
     except Exception as e:
         return {"success": False, "error": str(e)}
     finally:
+        frontier.close()
         driver.quit()
 
 if __name__ == "__main__":
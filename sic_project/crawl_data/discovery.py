@@ -0,0 +1,183 @@
+import json
+import sqlite3
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from lxml import etree
+
+from crawl_data.frontier import get_frontier_file
+
+
+# Lưu ETag/Last-Modified và danh sách bài của lần tải feed gần nhất (cho conditional GET)
+# read_only: chỉ đọc cache đã lưu, kết quả tải mới giữ trong bộ nhớ (xem trước lịch crawl không làm thay đổi
+# ETag của lượt crawl thật, để lượt đó không nhận 304 và bỏ sót bài mới)
+class FeedCache:
+    def __init__(self, db_path=None, read_only=False):
+        self.read_only = read_only
+        self.pending = {}
+        self.conn = sqlite3.connect(db_path or get_frontier_file())
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS feeds (
+                feed_url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                items TEXT,
+                fetched_at TEXT
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, feed_url):
+        if feed_url in self.pending:
+            return self.pending[feed_url]
+        row = self.conn.execute(
+            "SELECT etag, last_modified, items FROM feeds WHERE feed_url = ?", (feed_url,)
+        ).fetchone()
+        if row is None:
+            return None, None, []
+        etag, last_modified, items = row
+        return etag, last_modified, [tuple(item) for item in json.loads(items or "[]")]
+
+    def put(self, feed_url, etag, last_modified, items):
+        if self.read_only:
+            self.pending[feed_url] = (etag, last_modified, [tuple(item) for item in items])
+            return
+        self.conn.execute(
+            "INSERT OR REPLACE INTO feeds (feed_url, etag, last_modified, items, fetched_at) VALUES (?, ?, ?, ?, ?)",
+            (feed_url, etag, last_modified, json.dumps(items), datetime.now().isoformat()),
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            dt = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    # Quy về UTC để sắp xếp theo chuỗi ISO là đúng thứ tự thời gian
+    return dt.astimezone(timezone.utc).isoformat()
+
+
+def _local_name(el):
+    return etree.QName(el).localname if isinstance(el.tag, str) else ""
+
+
+def _child_text(el, *names):
+    for child in el:
+        if _local_name(child) in names and child.text:
+            return child.text.strip()
+    return None
+
+
+# Đọc RSS (<item>) hoặc news sitemap (<url>), trả về [(url, thời gian đăng ISO)]
+def parse_feed(content):
+    parser = etree.XMLParser(recover=True, resolve_entities=False)
+    root = etree.fromstring(content, parser=parser)
+    if root is None:
+        return []
+
+    items = []
+    for el in root.iter():
+        name = _local_name(el)
+        if name == "item":
+            url = _child_text(el, "link")
+            published = _child_text(el, "pubDate", "date")
+        elif name == "url":
+            url = _child_text(el, "loc")
+            published = None
+            for child in el.iter():
+                if _local_name(child) in ("publication_date", "lastmod") and child.text:
+                    published = child.text
+                    break
+        else:
+            continue
+        if url:
+            items.append((url, _parse_date(published)))
+    return items
+
+
+def fetch_feed(session, feed_url, cache, timeout=15):
+    """
+    Tải một feed với conditional GET.
+    Returns:
+        list | None: [(url, published)], None nếu tải lỗi
+    """
+    etag, last_modified, cached_items = cache.get(feed_url)
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    try:
+        response = session.get(feed_url, headers=headers, timeout=timeout)
+    except requests.RequestException as e:
+        print(f"⚠️ Lỗi khi tải feed {feed_url}: {e}")
+        return None
+
+    if response.status_code == 304:
+        # Feed không đổi: dùng lại danh sách cũ, frontier sẽ lọc các bài đã tải
+        return cached_items
+    if response.status_code != 200:
+        print(f"⚠️ HTTP {response.status_code} khi tải feed {feed_url}")
+        return None
+
+    try:
+        items = parse_feed(response.content)
+    except Exception as e:
+        print(f"⚠️ Không đọc được feed {feed_url}: {e}")
+        return None
+    cache.put(feed_url, response.headers.get("ETag"), response.headers.get("Last-Modified"), items)
+    return items
+
+
+def discover_links(session, spec, cache=None):
+    """
+    Lấy link bài viết từ RSS / sitemap của một trang báo.
+    Args:
+        session: requests.Session dùng chung
+        spec (dict): Cấu hình trang trong SITE_SPECS (cần khoá "feeds")
+        cache (FeedCache): Nơi lưu ETag/Last-Modified (mặc định dùng file frontier)
+    Returns:
+        list | None: [(url, published)] mới nhất trước, None nếu không feed nào có dữ liệu
+    """
+    feeds = spec.get("feeds", [])
+    if not feeds:
+        return None
+
+    owns_cache = cache is None
+    if owns_cache:
+        cache = FeedCache()
+    try:
+        found = {}
+        any_success = False
+        for feed_url in feeds:
+            items = fetch_feed(session, feed_url, cache)
+            if not items:
+                continue
+            any_success = True
+            for url, published in items:
+                if "video" in url:
+                    continue
+                if url not in found or (published and not found[url]):
+                    found[url] = published
+    finally:
+        if owns_cache:
+            cache.close()
+
+    if not any_success:
+        return None
+    # Bài mới nhất trước, bài không có thời gian đăng xếp cuối
+    return sorted(found.items(), key=lambda item: item[1] or "", reverse=True)
@@ -0,0 +1,230 @@
+import re
+import json
+from datetime import datetime
+from lxml import html as lxml_html
+from lxml.cssselect import CSSSelector
+
+from crawl_data.sites import SITE_SPECS
+
+# Các thẻ block: Selenium `.text` xuống dòng giữa các thẻ này, ta làm tương tự
+BLOCK_TAGS = {
+    "p", "div", "section", "article", "figure", "figcaption", "table", "tr",
+    "ul", "ol", "li", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "header", "footer",
+}
+SKIP_TAGS = {"script", "style", "noscript", "template", "iframe"}
+
+# Các @type JSON-LD được coi là bài viết
+ARTICLE_TYPES = {"NewsArticle", "Article", "ReportageNewsArticle", "AnalysisNewsArticle", "BlogPosting"}
+_JSON_LD = CSSSelector('script[type="application/ld+json"]')
+_META = CSSSelector("meta[property], meta[name], meta[itemprop]")
+
+
+# Parse HTML thành cây lxml
+def parse_html(page_source, url=None):
+    if not page_source:
+        return None
+    try:
+        return lxml_html.fromstring(page_source, base_url=url)
+    except Exception as e:
+        print(f"⚠️ Không parse được HTML {url}: {e}")
+        return None
+
+
+# Lấy text hiển thị của phần tử, gần giống `WebElement.text` của Selenium
+def element_text(el):
+    parts = []
+
+    def walk(node):
+        tag = node.tag if isinstance(node.tag, str) else ""
+        if tag in SKIP_TAGS:
+            return
+        if tag == "br":
+            parts.append("\n")
+        elif tag in BLOCK_TAGS:
+            parts.append("\n")
+        if node.text and tag:
+            parts.append(node.text)
+        for child in node:
+            walk(child)
+            if child.tail:
+                parts.append(child.tail)
+        if tag in BLOCK_TAGS:
+            parts.append("\n")
+
+    walk(el)
+    lines = [re.sub(r"\s+", " ", line).strip() for line in "".join(parts).split("\n")]
+    return "\n".join(line for line in lines if line)
+
+
+def _iso_time(value):
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value.strip().replace("Z", "+00:00")).isoformat()
+    except ValueError:
+        return None
+
+
+def _ld_objects(data):
+    if isinstance(data, list):
+        for item in data:
+            yield from _ld_objects(item)
+    elif isinstance(data, dict):
+        yield data
+        yield from _ld_objects(data.get("@graph", []))
+
+
+def _ld_types(obj):
+    types = obj.get("@type", [])
+    return set(types) if isinstance(types, list) else {types}
+
+
+def _ld_image(image):
+    if isinstance(image, list):
+        image = image[0] if image else None
+    if isinstance(image, dict):
+        image = image.get("url") or image.get("contentUrl")
+    return image if isinstance(image, str) else None
+
+
+def _ld_authors(author):
+    authors = author if isinstance(author, list) else [author]
+    names = []
+    for item in authors:
+        if isinstance(item, dict):
+            # Bỏ qua tác giả là tổ chức (tên toà soạn)
+            if "Organization" in _ld_types(item):
+                continue
+            item = item.get("name")
+        if isinstance(item, str) and item.strip() and item.strip() not in names:
+            names.append(item.strip())
+    return names
+
+
+def extract_metadata(tree):
+    """
+    Đọc metadata có cấu trúc của bài viết: JSON-LD (NewsArticle) trước, sau đó OpenGraph / meta.
+    Returns:
+        dict: Các trường tìm được trong title, description, time_posted (ISO 8601), author (list), image
+    """
+    metadata = {}
+    for script in _JSON_LD(tree):
+        try:
+            data = json.loads(script.text or "", strict=False)
+        except ValueError:
+            continue
+        for obj in _ld_objects(data):
+            if not _ld_types(obj) & ARTICLE_TYPES:
+                continue
+            candidates = {
+                "title": obj.get("headline"),
+                "description": obj.get("description"),
+                "time_posted": _iso_time(obj.get("datePublished")),
+                "author": _ld_authors(obj.get("author")),
+                "image": _ld_image(obj.get("image")),
+            }
+            for field, value in candidates.items():
+                if value and field not in metadata:
+                    metadata[field] = value.strip() if isinstance(value, str) else value
+
+    meta = {}
+    for el in _META(tree):
+        key = el.get("property") or el.get("name") or el.get("itemprop")
+        content = (el.get("content") or "").strip()
+        if content:
+            meta.setdefault(key, []).append(content)
+    fallbacks = {
+        "title": (meta.get("og:title") or [None])[0],
+        "description": (meta.get("og:description") or meta.get("description") or [None])[0],
+        "time_posted": _iso_time((meta.get("article:published_time") or meta.get("datePublished") or [None])[0]),
+        "author": [name for name in meta.get("article:author", []) if not name.startswith("http")],
+        "image": (meta.get("og:image") or [None])[0],
+    }
+    for field, value in fallbacks.items():
+        if value and field not in metadata:
+            metadata[field] = value
+    return metadata
+
+
+# Bộ trích xuất của một trang: biên dịch selector một lần, dùng lại cho mọi bài viết
+class SiteExtractor:
+    def __init__(self, spec):
+        self.required = spec.get("required", [])
+        # Các trường lấy từ JSON-LD / OpenGraph trước, chỉ scrape DOM khi metadata thiếu
+        self.metadata_fields = set(spec.get("metadata", []))
+        self.fields = []
+        for field, field_spec in spec["fields"].items():
+            compiled = [CSSSelector(selector) for selector in field_spec["selectors"]]
+            self.fields.append((field, compiled, field_spec))
+
+    @staticmethod
+    def _values(elements, field_spec):
+        if not field_spec.get("many"):
+            elements = elements[:1]
+        values = []
+        for el in elements:
+            if "attrs" in field_spec:
+                value = next((el.get(attr) for attr in field_spec["attrs"] if el.get(attr)), "")
+            else:
+                value = element_text(el)
+            if not value or value.lower() in field_spec.get("exclude", ()):
+                continue
+            if field_spec.get("transform") == "title":
+                value = value.title()
+            values.append(value)
+        return values
+
+    def _extract_field(self, tree, compiled, field_spec):
+        values = []
+        # Thử lần lượt các selector cho tới khi có kết quả
+        for selector in compiled:
+            values = self._values(selector(tree), field_spec)
+            if values:
+                break
+
+        if "join" in field_spec:
+            return field_spec["join"].join(values)
+        if field_spec.get("many"):
+            return values
+        return values[0] if values else field_spec.get("default", "")
+
+    def extract(self, tree, url):
+        metadata = extract_metadata(tree) if self.metadata_fields else {}
+        article = {}
+        for field, compiled, field_spec in self.fields:
+            if field in self.metadata_fields and metadata.get(field):
+                article[field] = metadata[field]
+            else:
+                article[field] = self._extract_field(tree, compiled, field_spec)
+            # Giữ thứ tự trường giống bản ghi cũ: url đứng sau title
+            if field == "title":
+                article["url"] = url
+        return article
+
+    def is_complete(self, article):
+        return all(article.get(field) for field in self.required)
+
+
+_extractors = {}
+
+
+def get_extractor(site):
+    if site not in _extractors:
+        _extractors[site] = SiteExtractor(SITE_SPECS[site])
+    return _extractors[site]
+
+
+# Trích xuất bài viết từ HTML, trả về None nếu thiếu tiêu đề hoặc nội dung
+def extract_article(site, page_source, url):
+    tree = parse_html(page_source, url)
+    if tree is None:
+        return None
+    extractor = get_extractor(site)
+    try:
+        article = extractor.extract(tree, url)
+    except Exception as e:
+        print(f"⚠️ Lỗi khi trích xuất {url}: {e}")
+        return None
+    if not extractor.is_complete(article):
+        return None
+    return article
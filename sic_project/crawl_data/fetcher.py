@@ -0,0 +1,58 @@
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from crawl_data.budget import backoff_delay
+
+# Header giống trình duyệt để các trang báo trả về HTML đầy đủ
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "vi-VN,vi;q=0.9,en;q=0.8",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+
+# Khởi tạo session dùng chung (connection pool + keep-alive + gzip)
+def create_session(pool_size=10):
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Tải HTML của một trang qua HTTP, trả về None nếu thất bại
+# stats (dict): nếu có thì ghi số lần thử lại (retries), số byte tải về (bytes) và lỗi (error)
+# budget (CrawlBudget): timeout mỗi lần thử không vượt quá hạn chót, hết giờ thì không thử lại nữa
+def fetch_html(session, url, timeout=15, retries=2, stats=None, budget=None):
+    stats = stats if stats is not None else {}
+    for attempt in range(retries + 1):
+        if budget is not None and attempt > 0 and budget.expired():
+            print(f"⏰ Hết giờ, không thử lại {url}")
+            stats["error"] = "deadline"
+            return None
+        stats["retries"] = attempt
+        try:
+            response = session.get(url, timeout=budget.timeout(timeout) if budget is not None else timeout)
+            stats["bytes"] = len(response.content)
+            if response.status_code != 200:
+                print(f"⚠️ HTTP {response.status_code} khi tải {url}")
+                stats["error"] = f"HTTP {response.status_code}"
+                return None
+            # requests đoán sai encoding với một số trang, ưu tiên encoding trong nội dung
+            if response.encoding is None or response.encoding.lower() == "iso-8859-1":
+                response.encoding = response.apparent_encoding
+            return response.text
+        except requests.RequestException as e:
+            stats["error"] = type(e).__name__
+            if attempt == retries:
+                print(f"🔁 Lỗi HTTP khi tải {url}: {e}")
+            else:
+                # Không chờ quá hạn chót: lần thử sau sẽ bị bỏ nếu đã hết giờ
+                delay = backoff_delay(attempt)
+                time.sleep(min(delay, max(0.0, budget.remaining())) if budget is not None else delay)
+    return None
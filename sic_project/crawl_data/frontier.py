@@ -0,0 +1,122 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from crawl_data.paths import get_data_dir
+
+STATUS_DISCOVERED = "discovered"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+def get_frontier_file():
+    return os.path.join(get_data_dir(), "frontier.sqlite3")
+
+
+class Frontier:
+    """
+    Danh sách URL đã biết, lưu bằng SQLite giữa các lần crawl.
+    Khoá là URL đã làm sạch bằng clean_url, kèm trạng thái và thời điểm tải.
+    Args:
+        db_path (str): Đường dẫn file SQLite (mặc định data/frontier.sqlite3)
+        max_attempts (int): Số lần tải thất bại tối đa trước khi bỏ qua URL
+    """
+
+    def __init__(self, db_path=None, max_attempts=3):
+        self.db_path = db_path or get_frontier_file()
+        self.max_attempts = max_attempts
+        # Có thể được gọi từ nhiều thread (BrowserPool), mọi truy cập đi qua lock
+        # timeout: nhiều shard (process) có thể ghi cùng lúc khi crawl phân tán
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self.lock = threading.Lock()
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                site TEXT,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                first_seen TEXT NOT NULL,
+                last_fetched TEXT,
+                error TEXT
+            )
+        """)
+        self.conn.commit()
+
+    def is_empty(self):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM urls LIMIT 1").fetchone() is None
+
+    # Đánh dấu các URL đã có trong dữ liệu cũ là đã tải
+    def seed(self, urls, site=None):
+        now = datetime.now().isoformat()
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO urls (url, site, status, first_seen, last_fetched) VALUES (?, ?, ?, ?, ?)",
+                [(url, site, STATUS_DONE, now, now) for url in urls],
+            )
+            self.conn.commit()
+
+    # URL chưa tải thành công và chưa vượt quá số lần thử
+    def is_new(self, url):
+        with self.lock:
+            row = self.conn.execute("SELECT status, attempts FROM urls WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return True
+        status, attempts = row
+        return status != STATUS_DONE and attempts < self.max_attempts
+
+    def filter_new(self, urls):
+        return [url for url in urls if self.is_new(url)]
+
+    def mark_discovered(self, site, urls):
+        now = datetime.now().isoformat()
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO urls (url, site, status, first_seen) VALUES (?, ?, ?, ?)",
+                [(url, site, STATUS_DISCOVERED, now) for url in urls],
+            )
+            self.conn.commit()
+
+    def mark_fetched(self, site, url, success, error=None):
+        now = datetime.now().isoformat()
+        status = STATUS_DONE if success else STATUS_FAILED
+        with self.lock:
+            self.conn.execute(
+                """
+                INSERT INTO urls (url, site, status, attempts, first_seen, last_fetched, error)
+                VALUES (?, ?, ?, 1, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    status = excluded.status,
+                    attempts = urls.attempts + 1,
+                    last_fetched = excluded.last_fetched,
+                    error = excluded.error
+                """,
+                (url, site, status, now, now, error),
+            )
+            self.conn.commit()
+
+    # Đánh dấu các bài đã được lưu vào kho là đã tải (chỉ gọi sau khi lưu thành công)
+    def mark_done(self, site, urls):
+        now = datetime.now().isoformat()
+        with self.lock:
+            self.conn.executemany(
+                """
+                INSERT INTO urls (url, site, status, attempts, first_seen, last_fetched)
+                VALUES (?, ?, ?, 1, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    status = excluded.status,
+                    attempts = urls.attempts + 1,
+                    last_fetched = excluded.last_fetched,
+                    error = NULL
+                """,
+                [(url, site, STATUS_DONE, now, now) for url in urls],
+            )
+            self.conn.commit()
+
+    def stats(self):
+        with self.lock:
+            return dict(self.conn.execute("SELECT status, COUNT(*) FROM urls GROUP BY status").fetchall())
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,131 @@
+import os
+import gzip
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime
+
+from crawl_data.paths import get_data_dir
+
+# zstandard là tuỳ chọn: không có thì nén bằng gzip (chậm hơn, file lớn hơn)
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+ZSTD_LEVEL = 10
+
+
+def get_html_archive_dir():
+    return os.path.join(get_data_dir(), "html")
+
+
+def _compress(data):
+    if ZSTD_AVAILABLE:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data), ".zst"
+    return gzip.compress(data), ".gz"
+
+
+def _decompress(data, path):
+    if path.endswith(".zst"):
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError(f"Cần cài zstandard để đọc {path}")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def read_blob(path):
+    with open(path, "rb") as f:
+        return _decompress(f.read(), path).decode("utf-8")
+
+
+class HtmlArchive:
+    """
+    Lưu HTML gốc của mọi bài đã tải, để chạy lại trích xuất mà không phải crawl lại.
+    Mỗi HTML được lưu một lần theo sha256 nội dung (content-addressed), nén zstd, chia thư mục theo ngày:
+        html/2025-07-14/ab/ab12....zst
+    Index SQLite (html/index.sqlite3) ghi URL nào ứng với bản HTML nào (bản mới nhất).
+    Dùng được từ nhiều thread cùng lúc.
+    Args:
+        root (str): Thư mục chứa kho (mặc định data/html)
+    """
+
+    def __init__(self, root=None):
+        self.root = root or get_html_archive_dir()
+        os.makedirs(self.root, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(self.root, "index.sqlite3"), check_same_thread=False, timeout=30)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha256 TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                size INTEGER,
+                stored_size INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                site TEXT,
+                sha256 TEXT NOT NULL,
+                fetched_at TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_pages_site ON pages (site);
+        """)
+        self.conn.commit()
+
+    def put(self, site, url, page_source):
+        if not page_source:
+            return None
+        data = page_source.encode("utf-8")
+        sha256 = hashlib.sha256(data).hexdigest()
+        with self.lock:
+            exists = self.conn.execute("SELECT 1 FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            if exists is None:
+                compressed, ext = _compress(data)
+                relative = os.path.join(datetime.now().strftime("%Y-%m-%d"), sha256[:2], sha256 + ext)
+                path = os.path.join(self.root, relative)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(compressed)
+                self.conn.execute(
+                    "INSERT INTO blobs (sha256, path, size, stored_size) VALUES (?, ?, ?, ?)",
+                    (sha256, relative, len(data), len(compressed)),
+                )
+            self.conn.execute(
+                "INSERT OR REPLACE INTO pages (url, site, sha256, fetched_at) VALUES (?, ?, ?, ?)",
+                (url, site, sha256, datetime.now().isoformat()),
+            )
+            self.conn.commit()
+        return sha256
+
+    def get(self, url):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT b.path FROM pages p JOIN blobs b ON p.sha256 = b.sha256 WHERE p.url = ?", (url,)
+            ).fetchone()
+        return read_blob(os.path.join(self.root, row[0])) if row else None
+
+    def entries(self, site=None):
+        """
+        Returns:
+            list: [(site, url, đường dẫn file nén)] của các trang trong kho
+        """
+        query = "SELECT p.site, p.url, b.path FROM pages p JOIN blobs b ON p.sha256 = b.sha256"
+        params = ()
+        if site:
+            query += " WHERE p.site = ?"
+            params = (site,)
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [(row_site, url, os.path.join(self.root, path)) for row_site, url, path in rows]
+
+    def stats(self):
+        with self.lock:
+            pages = self.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            blobs, size, stored = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM blobs"
+            ).fetchone()
+        return {"pages": pages, "blobs": blobs, "size": size, "stored_size": stored}
+
+    def close(self):
+        self.conn.close()
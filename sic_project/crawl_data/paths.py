@@ -0,0 +1,14 @@
+import os
+
+
+# Thư mục data dùng chung của dự án (sic_project/data).
+# Đặt biến môi trường SIC_DATA_DIR để dùng thư mục khác (vd. khi chạy benchmark phát lại,
+# tránh ghi vào frontier / kho bài thật)
+def get_data_dir():
+    data_dir = os.environ.get("SIC_DATA_DIR")
+    if not data_dir:
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        parent_dir = os.path.dirname(current_dir)
+        data_dir = os.path.join(parent_dir, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    return data_dir
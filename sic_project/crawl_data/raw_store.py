@@ -0,0 +1,162 @@
+import os
+import json
+import heapq
+import sqlite3
+from datetime import datetime
+
+from crawl_data.paths import get_data_dir
+
+LEGACY_PARTITION = "legacy"
+REVISION_PREFIX = "revision-"
+
+
+def get_raw_store_dir():
+    return os.path.join(get_data_dir(), "raw")
+
+
+class RawStore:
+    """
+    Kho dữ liệu thô dạng JSONL chỉ ghi thêm (append-only), chia file theo ngày crawl:
+        raw/2025-07-14.jsonl, raw/2025-07-15.jsonl, ...
+    Kèm một index SQLite nhỏ (raw/index.sqlite3) để tra URL và cấp id ổn định khi thêm.
+    Ghi bài mới chỉ tốn O(số bài mới), không phải đọc/ghi lại toàn bộ lịch sử.
+    Args:
+        root (str): Thư mục chứa kho (mặc định data/raw)
+    """
+
+    def __init__(self, root=None):
+        self.root = root or get_raw_store_dir()
+        os.makedirs(self.root, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(self.root, "index.sqlite3"))
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY,
+                url TEXT UNIQUE NOT NULL,
+                partition TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    @staticmethod
+    def exists(root=None):
+        return os.path.exists(os.path.join(root or get_raw_store_dir(), "index.sqlite3"))
+
+    def _partition_path(self, partition):
+        return os.path.join(self.root, f"{partition}.jsonl")
+
+    def _write(self, partition, records, replace=False):
+        rows = []
+        with open(self._partition_path(partition), "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                rows.append((record["id"], record["url"], partition))
+        verb = "INSERT OR REPLACE" if replace else "INSERT"
+        self.conn.executemany(f"{verb} INTO articles (id, url, partition) VALUES (?, ?, ?)", rows)
+        self.conn.commit()
+
+    def count(self, since_id=0):
+        return self.conn.execute("SELECT COUNT(*) FROM articles WHERE id > ?", (since_id,)).fetchone()[0]
+
+    def contains(self, url):
+        return self.conn.execute("SELECT 1 FROM articles WHERE url = ?", (url,)).fetchone() is not None
+
+    def urls(self):
+        return [row[0] for row in self.conn.execute("SELECT url FROM articles")]
+
+    def ids(self, since_id=0):
+        return [row[0] for row in self.conn.execute("SELECT id FROM articles WHERE id > ? ORDER BY id", (since_id,))]
+
+    def ids_by_url(self, urls):
+        ids = {}
+        for url in urls:
+            row = self.conn.execute("SELECT id FROM articles WHERE url = ?", (url,)).fetchone()
+            if row is not None:
+                ids[url] = row[0]
+        return ids
+
+    # Chuyển file JSON cũ (all_news_combined.json) vào kho, giữ nguyên id.
+    # File cũ có thể chứa cùng một URL nhiều lần: chỉ giữ bản đầu tiên, trước khi ghi file để index
+    # không lỗi UNIQUE giữa chừng (để lại các dòng JSONL không có trong index)
+    def import_legacy(self, records):
+        seen_urls, seen_ids = set(), set()
+        new_records = []
+        for record in records:
+            url, record_id = record.get("url"), record.get("id")
+            if not url or record_id is None or url in seen_urls or record_id in seen_ids or self.contains(url):
+                continue
+            seen_urls.add(url)
+            seen_ids.add(record_id)
+            new_records.append(record)
+        if new_records:
+            self._write(LEGACY_PARTITION, new_records)
+        return len(new_records)
+
+    def append(self, records):
+        """
+        Thêm các bài chưa có trong kho, cấp id tăng dần tiếp theo id lớn nhất hiện có.
+        Returns:
+            list: Các bài thực sự được thêm (đã gán id)
+        """
+        next_id = (self.conn.execute("SELECT MAX(id) FROM articles").fetchone()[0] or 0) + 1
+        seen = set()
+        new_records = []
+        for record in records:
+            url = record.get("url")
+            if not url or url in seen or self.contains(url):
+                continue
+            seen.add(url)
+            new_records.append({**record, "id": next_id})
+            next_id += 1
+
+        if new_records:
+            self._write(datetime.now().strftime("%Y-%m-%d"), new_records)
+        return new_records
+
+    def replace(self, records):
+        """
+        Ghi bản mới của các bài đã có (giữ nguyên id), vd. sau khi trích xuất lại từ kho HTML.
+        Bản mới được ghi vào một partition riêng cho mỗi lần gọi (mỗi bài chỉ xuất hiện một lần trong
+        một file), index trỏ sang bản mới, bản cũ vẫn nằm trong file nhưng không còn được đọc.
+        """
+        records = [r for r in records if r.get("id") is not None and r.get("url")]
+        if records:
+            partition = f"{REVISION_PREFIX}{datetime.now().strftime('%Y-%m-%d-%H%M%S-%f')}"
+            self._write(partition, records, replace=True)
+        return len(records)
+
+    def _iter_partition(self, partition, since_id):
+        # Chỉ đọc bản mới nhất của mỗi bài (bản cũ đã bị replace() thay bằng bản ở partition khác)
+        current = {row[0] for row in self.conn.execute("SELECT id FROM articles WHERE partition = ?", (partition,))}
+        with open(self._partition_path(partition), "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get("id", 0) > since_id and record.get("id") in current:
+                    current.discard(record["id"])
+                    yield record
+
+    def iter_records(self, since_id=0):
+        """
+        Đọc tuần tự các bài theo thứ tự id tăng dần (kể cả khi bản mới của bài cũ nằm ở partition revision-*),
+        không nạp toàn bộ vào bộ nhớ. Mốc xử lý của processdt dựa vào thứ tự này.
+        Args:
+            since_id (int): Chỉ trả về bài có id lớn hơn giá trị này
+        """
+        partitions = self.conn.execute(
+            "SELECT partition FROM articles GROUP BY partition HAVING MAX(id) > ? ORDER BY MIN(id)",
+            (since_id,),
+        ).fetchall()
+        streams = []
+        for (partition,) in partitions:
+            stream = self._iter_partition(partition, since_id)
+            if partition == LEGACY_PARTITION or partition.startswith(REVISION_PREFIX):
+                # Partition theo ngày được ghi theo id tăng dần (append), còn file JSON cũ và các bản trích xuất
+                # lại thì không chắc: sắp xếp trong bộ nhớ (chỉ chứa các bài được nhập / trích xuất lại)
+                stream = iter(sorted(stream, key=lambda record: record["id"]))
+            streams.append(stream)
+        # Gộp các partition (mỗi partition đã theo thứ tự id) thành một dãy id tăng dần
+        yield from heapq.merge(*streams, key=lambda record: record["id"])
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,108 @@
+# Chạy lại trích xuất trên kho HTML đã lưu (data/html) và cập nhật kho bài (data/raw), không cần crawl lại.
+# Dùng khi sửa selector hoặc thêm trường mới trong SITE_SPECS. Ví dụ (chạy từ thư mục sic_project):
+#   python -m crawl_data.reextract --fields author image
+#   python -m crawl_data.reextract --site dantri --overwrite --workers 8
+#   python -m crawl_data.reextract --dry-run
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from crawl_data.html_archive import HtmlArchive, read_blob
+from crawl_data.extractor import extract_article
+from crawl_data.raw_store import RawStore
+from crawl_data.sites import SITE_SPECS
+
+
+def _reextract_one(entry):
+    site, url, path = entry
+    try:
+        return url, extract_article(site, read_blob(path), url)
+    except Exception as e:
+        print(f"⚠️ Lỗi khi trích xuất lại {url}: {e}")
+        return url, None
+
+
+def _is_empty(value):
+    return value is None or value == "" or value == [] or value == "Không có thời gian"
+
+
+def merge_fields(record, article, fields=None, overwrite=False):
+    """
+    Ghép kết quả trích xuất mới vào bài đã lưu.
+    Args:
+        fields (list): Chỉ cập nhật các trường này (mặc định tất cả các trường trích xuất được)
+        overwrite (bool): Ghi đè cả trường đã có giá trị, mặc định chỉ điền các trường còn trống
+    Returns:
+        dict | None: Bài đã cập nhật, None nếu không có gì thay đổi
+    """
+    updated = dict(record)
+    for field, value in article.items():
+        if field in ("id", "url") or (fields and field not in fields) or _is_empty(value):
+            continue
+        if overwrite or _is_empty(record.get(field)):
+            updated[field] = value
+    return updated if updated != record else None
+
+
+def reextract(site=None, fields=None, overwrite=False, workers=None, dry_run=False):
+    """
+    Trích xuất lại song song trên nhiều core từ kho HTML và cập nhật kho bài.
+    Returns:
+        dict: Số trang đã đọc, số trích xuất thành công và số bài được cập nhật
+    """
+    archive = HtmlArchive()
+    try:
+        entries = [entry for entry in archive.entries(site) if entry[0] in SITE_SPECS]
+    finally:
+        archive.close()
+    if not entries:
+        print("❌ Kho HTML trống")
+        return {"pages": 0, "extracted": 0, "updated": 0}
+
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        articles = {
+            url: article
+            for url, article in executor.map(_reextract_one, entries, chunksize=max(1, len(entries) // (workers * 4)))
+            if article is not None
+        }
+    elapsed = time.perf_counter() - start
+    print(f"🔁 Trích xuất lại {len(articles)}/{len(entries)} trang trong {elapsed:.2f}s "
+          f"({len(entries) / elapsed:.1f} trang/giây, {workers} process)")
+
+    store = RawStore()
+    try:
+        updated = []
+        for record in store.iter_records():
+            article = articles.get(record.get("url"))
+            if article is None:
+                continue
+            merged = merge_fields(record, article, fields, overwrite)
+            if merged is not None:
+                updated.append(merged)
+
+        if dry_run:
+            print(f"ℹ️ Sẽ cập nhật {len(updated)} bài (dry-run, không ghi)")
+        else:
+            store.replace(updated)
+            print(f"✅ Đã cập nhật {len(updated)} bài trong '{store.root}'")
+    finally:
+        store.close()
+    return {"pages": len(entries), "extracted": len(articles), "updated": len(updated)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trích xuất lại bài viết từ kho HTML đã lưu")
+    parser.add_argument("--site", choices=sorted(SITE_SPECS), help="Chỉ trích xuất lại một trang báo")
+    parser.add_argument("--fields", nargs="+", help="Chỉ cập nhật các trường này")
+    parser.add_argument("--overwrite", action="store_true", help="Ghi đè cả trường đã có giá trị")
+    parser.add_argument("--workers", type=int, help="Số process (mặc định bằng số core)")
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ thống kê, không ghi vào kho bài")
+    args = parser.parse_args()
+    reextract(site=args.site, fields=args.fields, overwrite=args.overwrite, workers=args.workers, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import gzip
+import io
+import threading
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urljoin
+
+from requests.adapters import HTTPAdapter
+from requests.utils import requote_uri
+
+# Nguồn của trang trong file ghi: tải qua HTTP hay DOM lấy từ trình duyệt (page_source)
+SOURCE_HTTP = "http"
+SOURCE_BROWSER = "browser"
+
+
+class WarcWriter:
+    """
+    Ghi các trang đã tải vào file WARC/1.0 (mỗi record là một gzip member, đọc được bằng warcio).
+    Dùng được từ nhiều thread cùng lúc.
+    Args:
+        path (str): File .warc.gz cần ghi (ghi nối tiếp nếu đã tồn tại)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.redirects = {}
+        self.file = open(path, "ab")
+
+    def write(self, url, body, status=200, content_type="text/html; charset=utf-8", source=SOURCE_HTTP):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        http_block = (
+            f"HTTP/1.1 {status} OK\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n"
+        ).encode("utf-8") + body
+        headers = (
+            "WARC/1.0\r\n"
+            "WARC-Type: response\r\n"
+            f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>\r\n"
+            f"WARC-Date: {datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}\r\n"
+            f"WARC-Target-URI: {url}\r\n"
+            f"WARC-Crawl-Source: {source}\r\n"
+            "Content-Type: application/http; msgtype=response\r\n"
+            f"Content-Length: {len(http_block)}\r\n\r\n"
+        ).encode("utf-8")
+        record = gzip.compress(headers + http_block + b"\r\n\r\n")
+        with self.lock:
+            self.file.write(record)
+            self.file.flush()
+
+    # Hook cho requests.Session: ghi lại mọi response tải qua HTTP.
+    # Trang bị chuyển hướng (http -> https, thêm dấu /, bản mobile) được ghi theo cả URL đã yêu cầu, vì khi phát lại
+    # crawler tìm trang theo URL ban đầu. Hook chạy cho từng bước chuyển hướng (lúc đó response.history còn trống)
+    # nên ghi nhớ đích của mỗi response 3xx -> URL ban đầu
+    def record_response(self, response, *args, **kwargs):
+        if response.is_redirect:
+            target = urljoin(response.url, requote_uri(response.headers["Location"]))
+            with self.lock:
+                self.redirects[target] = self.redirects.pop(response.url, response.url)
+        elif response.status_code == 200:
+            with self.lock:
+                original = self.redirects.pop(response.url, None)
+            content_type = response.headers.get("Content-Type", "text/html")
+            self.write(response.url, response.content, content_type=content_type)
+            if original is not None and original != response.url:
+                self.write(original, response.content, content_type=content_type)
+        return response
+
+    def close(self):
+        self.file.close()
+
+
+def iter_warc(path):
+    """
+    Đọc lần lượt các record response trong file WARC.
+    Yields:
+        tuple: (url, source, status, content_type, body)
+    """
+    with gzip.open(path, "rb") as f:
+        stream = io.BufferedReader(f)
+        while True:
+            line = stream.readline()
+            if not line:
+                break
+            if not line.startswith(b"WARC/"):
+                continue
+            headers = {}
+            while True:
+                line = stream.readline().rstrip(b"\r\n")
+                if not line:
+                    break
+                key, _, value = line.decode("utf-8").partition(":")
+                headers[key.strip().lower()] = value.strip()
+            block = stream.read(int(headers.get("content-length", 0)))
+            if headers.get("warc-type") != "response":
+                continue
+
+            http_head, _, body = block.partition(b"\r\n\r\n")
+            head_lines = http_head.decode("utf-8", errors="replace").split("\r\n")
+            status = int(head_lines[0].split()[1])
+            content_type = "text/html"
+            for head_line in head_lines[1:]:
+                key, _, value = head_line.partition(":")
+                if key.strip().lower() == "content-type":
+                    content_type = value.strip()
+            yield headers.get("warc-target-uri"), headers.get("warc-crawl-source", SOURCE_HTTP), status, content_type, body
+
+
+class ReplayServer:
+    """
+    Server HTTP cục bộ phát lại các trang đã ghi, để crawler chạy hoàn toàn offline.
+    Trang được phục vụ tại http://127.0.0.1:<port>/<source>/<url đã mã hoá>.
+    Args:
+        warc_paths (list): Các file .warc.gz đã ghi
+    """
+
+    def __init__(self, warc_paths, port=0):
+        self.pages = {}
+        for path in warc_paths:
+            for url, source, status, content_type, body in iter_warc(path):
+                self.pages[(source, url)] = (status, content_type, body)
+
+        pages = self.pages
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                source, _, encoded_url = self.path.lstrip("/").partition("/")
+                page = pages.get((source, unquote(encoded_url)))
+                # Trang trình duyệt chưa được ghi thì dùng bản HTTP
+                if page is None and source == SOURCE_BROWSER:
+                    page = pages.get((SOURCE_HTTP, unquote(encoded_url)))
+                if page is None:
+                    self.send_error(404)
+                    return
+                status, content_type, body = page
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def rewrite(self, url, source=SOURCE_HTTP):
+        return f"{self.base_url}/{source}/{quote(url, safe='')}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        print(f"📼 Phát lại {len(self.pages)} trang tại {self.base_url}")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# Adapter cho requests.Session: chuyển mọi request sang ReplayServer thay vì ra Internet
+class ReplayAdapter(HTTPAdapter):
+    def __init__(self, replay_server, **kwargs):
+        self.replay_server = replay_server
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        original_url = request.url
+        request.url = self.replay_server.rewrite(original_url)
+        response = super().send(request, **kwargs)
+        response.url = original_url
+        return response
+
+
+def mount_replay(session, replay_server):
+    adapter = ReplayAdapter(replay_server)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
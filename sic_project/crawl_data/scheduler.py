@@ -0,0 +1,193 @@
+# Lập lịch crawl theo mức độ thay đổi của từng trang báo.
+# Xem trước lịch mà không crawl, không lưu thống kê / cache feed (chạy từ thư mục sic_project):
+#   python -m crawl_data.scheduler
+import argparse
+import hashlib
+import sqlite3
+from datetime import datetime
+
+from crawl_data.crawl_data import clean_url, open_frontier
+from crawl_data.discovery import FeedCache, discover_links
+from crawl_data.fetcher import create_session
+from crawl_data.frontier import get_frontier_file
+from crawl_data.sites import SITE_SPECS
+
+TOP_N = 20
+EWMA_ALPHA = 0.5
+
+
+# Vân tay của trang danh sách: hash của tập top-N link mới nhất
+def listing_fingerprint(urls, top_n=TOP_N):
+    return hashlib.sha1("\n".join(sorted(urls[:top_n])).encode("utf-8")).hexdigest()
+
+
+class CrawlScheduler:
+    """
+    Quyết định crawl trang nào, sâu bao nhiêu, dựa trên vân tay trang danh sách (RSS / sitemap)
+    và tốc độ đăng bài trung bình của từng trang. Thống kê được lưu trong file frontier.
+    Args:
+        db_path (str): File SQLite (mặc định dùng file frontier)
+        min_limit (int): Số bài tối thiểu mỗi lần crawl một trang
+        max_limit (int): Số bài tối đa mỗi lần crawl một trang
+        target_batch (int): Số bài mới nên có trước khi crawl lại một trang đăng chậm
+        max_interval_hours (float): Quá thời gian này thì crawl lại dù trang không đổi
+    """
+
+    def __init__(self, db_path=None, min_limit=5, max_limit=100, target_batch=10, max_interval_hours=24):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_batch = target_batch
+        self.max_interval_hours = max_interval_hours
+        self.conn = sqlite3.connect(db_path or get_frontier_file())
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS site_stats (
+                site TEXT PRIMARY KEY,
+                fingerprint TEXT,
+                last_crawled TEXT,
+                new_per_hour REAL
+            )
+        """)
+        self.conn.commit()
+
+    def _stats(self, site):
+        row = self.conn.execute(
+            "SELECT fingerprint, last_crawled, new_per_hour FROM site_stats WHERE site = ?", (site,)
+        ).fetchone()
+        if row is None:
+            return None, None, None
+        fingerprint, last_crawled, rate = row
+        return fingerprint, datetime.fromisoformat(last_crawled) if last_crawled else None, rate
+
+    def plan_site(self, site, candidates, frontier, default_limit, now=None):
+        """
+        Args:
+            candidates (list | None): [(url, published)] từ discover_links, None nếu trang không có feed
+        Returns:
+            dict: Kế hoạch của trang (action "crawl" hoặc "skip", limit, lý do, tốc độ đăng bài)
+        """
+        now = now or datetime.now()
+        fingerprint, last_crawled, rate = self._stats(site)
+        hours = (now - last_crawled).total_seconds() / 3600 if last_crawled else None
+        entry = {"site": site, "action": "crawl", "limit": default_limit, "new_links": None,
+                 "rate_per_hour": rate, "hours_since_crawl": hours, "fingerprint": None, "reason": ""}
+
+        if candidates is None:
+            # Không có feed thì không biết trang có đổi không: crawl như cũ
+            entry["reason"] = "không có RSS/sitemap"
+            return entry
+
+        urls = [clean_url(url) for url, _ in candidates]
+        entry["fingerprint"] = listing_fingerprint(urls)
+        new_links = len(frontier.filter_new(urls))
+        entry["new_links"] = new_links
+
+        # Ước lượng tốc độ đăng bài (EWMA) từ số bài mới kể từ lần crawl trước
+        if hours:
+            observed = new_links / hours
+            entry["rate_per_hour"] = observed if rate is None else EWMA_ALPHA * observed + (1 - EWMA_ALPHA) * rate
+
+        overdue = hours is None or hours >= self.max_interval_hours
+        # Trang danh sách không đổi nhưng vẫn còn link chưa tải (bị cắt vì hết giờ, lỗi chưa quá số lần thử):
+        # crawl tiếp ngay thay vì chờ tới max_interval_hours
+        unchanged = entry["fingerprint"] == fingerprint
+        if new_links == 0 and not overdue:
+            entry.update(action="skip", limit=0, reason="trang danh sách không đổi" if unchanged else "không có bài mới")
+        elif new_links < self.target_batch and not unchanged and not overdue and entry["rate_per_hour"]:
+            # Trang đăng chậm: đợi tới khi dự kiến đủ target_batch bài mới
+            interval = self.target_batch / entry["rate_per_hour"]
+            if hours < interval:
+                entry.update(action="skip", limit=0, reason=f"chờ đủ bài, crawl lại sau {interval - hours:.1f} giờ")
+        if entry["action"] == "crawl":
+            entry["limit"] = max(self.min_limit, min(self.max_limit, new_links))
+            if hours is not None and hours >= self.max_interval_hours:
+                entry["reason"] = f"{hours:.0f} giờ chưa crawl, {new_links} bài mới"
+            elif unchanged:
+                entry["reason"] = f"trang danh sách không đổi, còn {new_links} bài chưa tải từ lượt trước"
+            else:
+                entry["reason"] = f"{new_links} bài mới"
+        return entry
+
+    def plan(self, session, frontier, default_limit=50, sites=None, now=None, cache=None):
+        """
+        Lập lịch cho các trang, trang đăng bài nhanh nhất đứng trước (được ưu tiên trình duyệt).
+        Args:
+            cache (FeedCache): Cache feed (mặc định dùng file frontier)
+        Returns:
+            list: Kế hoạch của từng trang, xem plan_site
+        """
+        owns_cache = cache is None
+        cache = cache or FeedCache()
+        try:
+            entries = [
+                self.plan_site(site, discover_links(session, SITE_SPECS[site], cache), frontier, default_limit, now)
+                for site in (sites or SITE_SPECS)
+            ]
+        finally:
+            if owns_cache:
+                cache.close()
+        return sorted(entries, key=lambda entry: entry["rate_per_hour"] or 0.0, reverse=True)
+
+    def record(self, entries, now=None):
+        # Chỉ lưu vân tay / thời điểm crawl sau khi crawl xong, crawl lỗi thì lần sau thử lại
+        now = (now or datetime.now()).isoformat()
+        for entry in entries:
+            if entry["action"] != "crawl":
+                continue
+            self.conn.execute(
+                "INSERT OR REPLACE INTO site_stats (site, fingerprint, last_crawled, new_per_hour) VALUES (?, ?, ?, ?)",
+                (entry["site"], entry["fingerprint"], now, entry["rate_per_hour"]),
+            )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def print_schedule(entries):
+    print("\n🗓️ Lịch crawl:")
+    for entry in entries:
+        rate = f"{entry['rate_per_hour']:.1f} bài/giờ" if entry["rate_per_hour"] is not None else "chưa có thống kê"
+        if entry["action"] == "crawl":
+            print(f"✅ {entry['site']}: crawl {entry['limit']} bài ({entry['reason']}, {rate})")
+        else:
+            print(f"⏭️ {entry['site']}: bỏ qua ({entry['reason']}, {rate})")
+
+
+def plan_crawl(default_limit=50, session=None, dry_run=False, **scheduler_kwargs):
+    """
+    Lập lịch cho lượt crawl tiếp theo.
+    Args:
+        dry_run (bool): Chỉ xem lịch: không trả về scheduler để ghi nhận, không lưu ETag/Last-Modified của feed
+    Returns:
+        tuple: (CrawlScheduler, kế hoạch, {site: limit} theo thứ tự ưu tiên để truyền cho crawl_all_sites)
+    """
+    owns_session = session is None
+    session = session or create_session()
+    scheduler = CrawlScheduler(**scheduler_kwargs)
+    frontier = open_frontier()
+    cache = FeedCache(read_only=dry_run)
+    try:
+        entries = scheduler.plan(session, frontier, default_limit, cache=cache)
+    finally:
+        cache.close()
+        frontier.close()
+        if owns_session:
+            session.close()
+    print_schedule(entries)
+    if dry_run:
+        scheduler.close()
+        scheduler = None
+    site_limits = {entry["site"]: entry["limit"] for entry in entries if entry["action"] == "crawl"}
+    return scheduler, entries, site_limits
+
+
+def main():
+    # Chỉ in lịch crawl: thống kê chỉ được ghi nhận sau khi crawl xong (DAG / crawl_all_sites)
+    parser = argparse.ArgumentParser(description="Xem lịch crawl theo mức độ thay đổi của từng trang")
+    parser.add_argument("--limit", type=int, default=50, help="Số bài mặc định cho trang không có feed")
+    args = parser.parse_args()
+    plan_crawl(default_limit=args.limit, dry_run=True)
+
+
+if __name__ == "__main__":
+    main()
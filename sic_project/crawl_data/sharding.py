@@ -0,0 +1,274 @@
+# Crawl phân tán: một bước thu thập link, N shard tải bài (chia theo hash của URL mod N) chạy trên
+# các worker khác nhau (Celery trong docker-compose), rồi gộp kết quả vào kho bài.
+# Các bước trao đổi qua file trong data/shards/<run_id> (thư mục data dùng chung giữa các worker).
+# Chạy thử trên máy (các shard chạy trong các process riêng), từ thư mục sic_project:
+#   python -m crawl_data.sharding --shards 4 --limit 20
+#   python -m crawl_data.sharding --shards 2 --replay-from data/bench/crawl.warc.gz
+#   python -m crawl_data.sharding --shards 2 --in-process   (các shard chạy bằng thread trong cùng process)
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+from crawl_data.paths import get_data_dir
+from crawl_data.fetcher import create_session
+from crawl_data.browser_pool import BrowserPool
+from crawl_data.browser_profile import BrowserProfiles
+from crawl_data.crawl_data import make_driver_factory, open_frontier, collect_all_links, crawl_all_sites, save_all_data, get_output_file
+from crawl_data.replay import ReplayServer, mount_replay
+from crawl_data.telemetry import load_events, summarize
+from crawl_data.sites import SITE_SPECS
+
+
+def get_shard_dir(run_id):
+    return os.path.join(get_data_dir(), "shards", run_id)
+
+
+# Shard của một URL: hash ổn định (không dùng hash() của Python vì thay đổi giữa các process)
+def shard_of(url, shards):
+    return int(hashlib.sha1(url.encode("utf-8")).hexdigest(), 16) % shards
+
+
+def _manifest_file(run_id):
+    return os.path.join(get_shard_dir(run_id), "manifest.json")
+
+
+def _links_file(run_id, shard):
+    return os.path.join(get_shard_dir(run_id), f"shard-{shard}.links.json")
+
+
+def _output_file(run_id, shard):
+    return os.path.join(get_shard_dir(run_id), f"shard-{shard}.jsonl")
+
+
+def _result_file(run_id, shard):
+    return os.path.join(get_shard_dir(run_id), f"shard-{shard}.result.json")
+
+
+def _write_json(path, data):
+    # Ghi ra file tạm rồi đổi tên, worker khác không bao giờ đọc phải file ghi dở
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _read_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def discover_shards(run_id, shards, limit=50, site_limits=None, use_feeds=True, browser_workers=2,
+                    replay_from=None, schedule=None, persistent_profile=False, profile_cache_mb=512):
+    """
+    Bước 1 của crawl phân tán: thu thập link mới của các trang rồi chia thành `shards` phần theo hash của URL.
+    Args:
+        run_id (str): Tên lượt crawl (vd. run_id của Airflow), các file nằm trong data/shards/<run_id>
+        shards (int): Số shard tải bài
+        site_limits (dict): {site: limit} từ crawl_data.scheduler, mặc định mọi trang với cùng limit
+        schedule (list): Kế hoạch từ plan_crawl, lưu lại để bước gộp ghi nhận các trang crawl thành công
+        persistent_profile (bool): Dùng lại profile Chrome giữa các lượt crawl (xem crawl_all_sites)
+    Returns:
+        dict: Manifest của lượt crawl (link của từng trang, số link mỗi shard, lỗi thu thập link)
+    """
+    site_limits = site_limits if site_limits is not None else {site: limit for site in SITE_SPECS}
+    os.makedirs(get_shard_dir(run_id), exist_ok=True)
+    profiles = BrowserProfiles(max_mb=profile_cache_mb, slots=browser_workers) if persistent_profile else None
+    pool = BrowserPool(make_driver_factory(headless=True, profiles=profiles), size=browser_workers)
+    session = create_session()
+    frontier = open_frontier()
+    replay = None
+    if replay_from:
+        replay = ReplayServer([replay_from]).start()
+        mount_replay(session, replay)
+    try:
+        site_links, errors = collect_all_links(session, pool, frontier, site_limits, use_feeds, replay)
+    finally:
+        frontier.close()
+        session.close()
+        if replay is not None:
+            replay.stop()
+
+    shard_links = [{site: [] for site in site_links} for _ in range(shards)]
+    for site, links in site_links.items():
+        for link in links:
+            shard_links[shard_of(link, shards)][site].append(link)
+    for shard, links in enumerate(shard_links):
+        _write_json(_links_file(run_id, shard), links)
+
+    manifest = {
+        "run_id": run_id,
+        "shards": shards,
+        "created": datetime.now().isoformat(),
+        "site_limits": site_limits,
+        "site_links": site_links,
+        "errors": errors,
+        "schedule": schedule or [],
+        "shard_sizes": [sum(len(links) for links in shard.values()) for shard in shard_links],
+    }
+    _write_json(_manifest_file(run_id), manifest)
+    print(f"🧩 Chia {sum(manifest['shard_sizes'])} link thành {shards} shard: {manifest['shard_sizes']}")
+    return manifest
+
+
+def run_shard(run_id, shard, **crawl_kwargs):
+    """
+    Tải các bài của một shard (gọi được trên bất kỳ worker nào dùng chung thư mục data).
+    Bài viết được ghi ra data/shards/<run_id>/shard-<k>.jsonl, bước gộp mới ghi vào kho bài.
+    Args:
+        crawl_kwargs: Tham số cho crawl_all_sites (browser_workers, deadline_seconds, replay_from, ...)
+    Returns:
+        dict: Kết quả của shard theo từng trang (như crawl_all_sites)
+    """
+    site_links = _read_json(_links_file(run_id, shard))
+    output_file = _output_file(run_id, shard)
+    if os.path.exists(output_file):
+        # Task được chạy lại (retry): bỏ kết quả ghi dở của lần trước
+        os.remove(output_file)
+    print(f"🧩 Shard {shard}: {sum(len(links) for links in site_links.values())} link")
+    start = time.monotonic()
+    results = crawl_all_sites(site_links=site_links, output_file=output_file, **crawl_kwargs)
+    _write_json(_result_file(run_id, shard), {"elapsed": time.monotonic() - start, "results": results})
+    return results
+
+
+def merge_shards(run_id, cleanup=True):
+    """
+    Bước cuối của crawl phân tán: gộp bài của các shard vào kho bài (theo thứ tự link của từng trang).
+    Args:
+        cleanup (bool): Xoá thư mục data/shards/<run_id> sau khi gộp xong
+    Returns:
+        dict: Kết quả theo từng trang, cùng dạng với crawl_all_sites
+    """
+    manifest = _read_json(_manifest_file(run_id))
+    site_links = manifest["site_links"]
+    results = {site: {"success": False, "error": error} for site, error in manifest["errors"].items()}
+
+    crawled = {site: [] for site in site_links}
+    shard_results = []
+    for shard in range(manifest["shards"]):
+        output_file = _output_file(run_id, shard)
+        result_file = _result_file(run_id, shard)
+        if not os.path.exists(result_file):
+            print(f"⚠️ Shard {shard} chưa chạy xong, bỏ qua")
+            continue
+        shard_results.append(_read_json(result_file))
+        if os.path.exists(output_file):
+            with open(output_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    item = json.loads(line)
+                    crawled[item.pop("site")].append(item)
+
+    # Telemetry: gộp sự kiện của mọi shard, các shard chạy song song nên tính theo shard lâu nhất
+    telemetry_files = {
+        result["telemetry_file"]
+        for shard in shard_results for result in shard["results"].values() if result.get("telemetry_file")
+    }
+    events = [event for path in sorted(telemetry_files) if os.path.exists(path) for event in load_events(path)]
+    elapsed = max((shard["elapsed"] for shard in shard_results), default=0.0)
+    telemetry = summarize(events, elapsed)
+
+    output_dir = get_output_file()
+    frontier = open_frontier()
+    try:
+        for site, links in site_links.items():
+            shard_site_results = [shard["results"][site] for shard in shard_results if site in shard["results"]]
+            failed = [result["error"] for result in shard_site_results if not result["success"]]
+
+            order = {link: position for position, link in enumerate(links)}
+            data = sorted(crawled[site], key=lambda item: order.get(item["url"], len(order)))
+            for position, item in enumerate(data):
+                item["id"] = position
+            save_all_data(data)
+            # Các shard không đánh dấu bài đã tải: chỉ đánh dấu khi bài đã được gộp vào kho
+            frontier.mark_done(site, [item["url"] for item in data])
+            results[site] = {
+                "success": True,
+                "count": len(data),
+                "file_path": os.path.join(output_dir, f"{site}.json"),
+                "links": len(links),
+                "http_count": sum(result["http_count"] for result in shard_site_results),
+                "browser_count": sum(result["browser_count"] for result in shard_site_results),
+                "skipped": sum(result["skipped"] for result in shard_site_results),
+                "shards": len(shard_site_results),
+                "phase_seconds": [result["phase_seconds"] for result in shard_site_results],
+                "telemetry": telemetry.get(site),
+                "telemetry_file": sorted(telemetry_files),
+            }
+            if failed:
+                # Bài của các shard chạy được vẫn được lưu, nhưng trang không tính là crawl thành công
+                results[site] = {"success": False, "error": "; ".join(failed), "count": len(data)}
+            print(f"🧩 {site}: gộp {len(data)} bài từ {len(shard_site_results)} shard")
+    finally:
+        frontier.close()
+
+    if cleanup:
+        shutil.rmtree(get_shard_dir(run_id), ignore_errors=True)
+    return results
+
+
+def crawl_sharded(shards=4, limit=50, site_limits=None, use_feeds=True, browser_workers=2, replay_from=None,
+                  executor=None, run_id=None, **crawl_kwargs):
+    """
+    Chạy cả ba bước của crawl phân tán trên một máy, để thử trước khi chạy trên nhiều worker Celery.
+    Args:
+        executor (Executor): Nơi chạy các shard, mặc định một ProcessPoolExecutor với `shards` process
+        crawl_kwargs: Tham số thêm cho crawl_all_sites của từng shard (deadline_seconds, ...)
+    Returns:
+        tuple: (kết quả theo từng trang như crawl_all_sites, manifest)
+    """
+    run_id = run_id or f"local-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+    manifest = discover_shards(run_id, shards, limit, site_limits, use_feeds, browser_workers, replay_from,
+                               persistent_profile=crawl_kwargs.get("persistent_profile", False),
+                               profile_cache_mb=crawl_kwargs.get("profile_cache_mb", 512))
+    owns_executor = executor is None
+    executor = executor or ProcessPoolExecutor(max_workers=shards)
+    try:
+        futures = [
+            executor.submit(run_shard, run_id, shard, browser_workers=browser_workers, replay_from=replay_from,
+                            **crawl_kwargs)
+            for shard in range(shards)
+        ]
+        for shard, future in enumerate(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"❌ Shard {shard} lỗi: {e}")
+    finally:
+        if owns_executor:
+            executor.shutdown()
+    return merge_shards(run_id), manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl phân tán theo shard, chạy thử trên một máy")
+    parser.add_argument("--shards", type=int, default=4, help="Số shard tải bài (mỗi shard một process)")
+    parser.add_argument("--limit", type=int, default=50, help="Số bài tối đa mỗi trang")
+    parser.add_argument("--browser-workers", type=int, default=1, help="Số Chrome mỗi shard")
+    parser.add_argument("--replay-from", help="Chạy offline từ file .warc.gz đã ghi")
+    parser.add_argument("--in-process", action="store_true", help="Chạy các shard bằng thread thay vì process")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=args.shards) if args.in_process else None
+    try:
+        results, manifest = crawl_sharded(shards=args.shards, limit=args.limit, browser_workers=args.browser_workers,
+                                          replay_from=args.replay_from, executor=executor)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    elapsed = time.perf_counter() - start
+    total = sum(result.get("count", 0) for result in results.values())
+    print(f"\n📊 {total} bài từ {args.shards} shard (link mỗi shard: {manifest['shard_sizes']}) trong {elapsed:.2f}s")
+    for site, result in results.items():
+        if result["success"]:
+            print(f"✅ {site}: {result['count']}/{result['links']} bài")
+        else:
+            print(f"❌ {site}: {result['error']}")
+
+
+if __name__ == "__main__":
+    main()
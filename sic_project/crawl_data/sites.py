@@ -0,0 +1,91 @@
+# Cấu hình khai báo cho từng trang báo.
+# Thêm một trang mới chỉ cần thêm một mục vào SITE_SPECS, không cần viết thêm hàm crawl.
+#
+# Mỗi trang gồm:
+#   name          : Tên hiển thị trong log
+#   listing_url   : Trang chủ / trang danh sách để thu thập link
+#   listing_wait  : CSS selector cần xuất hiện trước khi cuộn trang danh sách
+#   link_selector : CSS selector của các thẻ <a> dẫn tới bài viết
+#   feeds         : RSS / news sitemap để lấy link qua HTTP, không cần cuộn trang bằng trình duyệt
+#   fields        : Cách lấy từng trường của bài viết, mỗi trường gồm:
+#       selectors : Danh sách CSS selector, thử lần lượt cho tới khi có kết quả
+#       many      : True nếu lấy tất cả phần tử (trả về list), mặc định chỉ lấy phần tử đầu
+#       join      : Nối list thành chuỗi bằng ký tự này (dùng cho nội dung)
+#       attrs     : Lấy thuộc tính thay vì text, thử lần lượt (vd. data-src trước src)
+#       exclude   : Các giá trị (viết thường) cần bỏ qua
+#       transform : "title" để viết hoa chữ cái đầu mỗi từ
+#       default   : Giá trị khi không tìm thấy
+#   metadata      : Các trường lấy từ metadata có cấu trúc (JSON-LD NewsArticle, OpenGraph) trước,
+#                   chỉ dùng selector trong fields khi metadata thiếu. time_posted khi đó là chuỗi ISO 8601,
+#                   author là list tên tác giả
+#   required      : Các trường bắt buộc, thiếu thì coi như trích xuất thất bại
+
+SITE_SPECS = {
+    "vnexpress": {
+        "name": "VNExpress",
+        "listing_url": "https://vnexpress.vn/",
+        "listing_wait": "article",
+        "link_selector": 'article.item-news h3.title-news a, article.article-list a.title-news',
+        "feeds": [
+            "https://vnexpress.net/rss/tin-moi-nhat.rss",
+            "https://vnexpress.net/google-news-sitemap.xml",
+        ],
+        "fields": {
+            "title": {"selectors": ['h1.title-detail']},
+            "description": {"selectors": ['p.description', 'article.fck_detail p']},
+            "content": {"selectors": ['article.fck_detail p'], "many": True, "join": "\n"},
+            "tags": {"selectors": ['ul.breadcrumb li a'], "many": True, "exclude": ["trang chủ"]},
+            "time_posted": {"selectors": ['span.date'], "default": "Không có thời gian"},
+            "author": {"selectors": ['p.Normal[style*="text-align:right"] strong']},
+            "image": {"selectors": ['img[itemprop="contentUrl"]'], "attrs": ["data-src", "src"]},
+        },
+        "metadata": ["description", "time_posted", "author", "image"],
+        "required": ["title", "content"],
+    },
+    "dantri": {
+        "name": "Dân trí",
+        "listing_url": "https://dantri.com.vn/",
+        "listing_wait": "article",
+        "link_selector": 'article.article-item h3.article-title a',
+        "feeds": [
+            "https://dantri.com.vn/rss/home.rss",
+            "https://dantri.com.vn/sitemaps/news.xml",
+        ],
+        "fields": {
+            "title": {"selectors": ['h1.title-page.detail']},
+            "description": {"selectors": ['h2.singular-sapo', 'article.fck_detail p']},
+            "content": {"selectors": ['div.singular-content'], "many": True, "join": "\n"},
+            "tags": {"selectors": ['ul.dt-list-none li a'], "many": True, "transform": "title"},
+            "time_posted": {"selectors": ['time.author-time'], "default": "Không có thời gian"},
+            "author": {"selectors": ['div.author-name a b'], "many": True},
+            "image": {"selectors": ['figure.image.align-center img'], "attrs": ["data-src", "src"]},
+        },
+        "metadata": ["description", "time_posted", "author", "image"],
+        "required": ["title", "content"],
+    },
+    "vietnamnet": {
+        "name": "Vietnamnet",
+        "listing_url": "https://vietnamnet.vn/",
+        "listing_wait": 'a[href*=".html"]',
+        "link_selector": 'a[href*=".html"]',
+        "feeds": [
+            "https://vietnamnet.vn/rss/tin-moi-nhat.rss",
+            "https://vietnamnet.vn/sitemap/news.xml",
+        ],
+        "fields": {
+            "title": {"selectors": ['h1.content-detail-title']},
+            "description": {"selectors": ['h2.content-detail-sapo.sm-sapo-mb-0', 'article.fck_detail p']},
+            "content": {"selectors": ['div.maincontent'], "many": True, "join": "\n"},
+            "tags": {"selectors": ['div.bread-crumb-detail a[title]'], "many": True},
+            "time_posted": {"selectors": ['div.bread-crumb-detail__time'], "default": "Không có thời gian"},
+            # Layout nhiều tác giả trước, sau đó fallback sang layout 1 tác giả
+            "author": {
+                "selectors": ['div.article-author-multiple__slide div.name a', 'div.article-detail-author-wrapper span.name a'],
+                "many": True,
+            },
+            "image": {"selectors": ['figure.image.vnn-content-image img'], "attrs": ["data-original", "src"]},
+        },
+        "metadata": ["description", "time_posted", "author", "image"],
+        "required": ["title", "content"],
+    },
+}
@@ -0,0 +1,149 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime
+
+from crawl_data.paths import get_data_dir
+
+PHASES = ("fetch", "wait", "extract", "save")
+
+
+def get_telemetry_dir():
+    return os.path.join(get_data_dir(), "telemetry")
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def summarize(events, elapsed):
+    """
+    Tổng hợp các sự kiện của từng trang thành báo cáo theo site.
+    Args:
+        events (list): Các dòng do Telemetry.record ghi (có thể gộp từ nhiều file, vd. nhiều shard)
+        elapsed (float): Thời gian (giây) của lượt crawl, dùng để tính trang/giây
+    Returns:
+        dict: {site: {pages, ok, failed, skipped, retries, bytes, pages_per_second, errors, phases: {phase: {p50, p95}}}}
+    """
+    report = {}
+    for event in events:
+        site = report.setdefault(event["site"], {
+            "pages": 0, "ok": 0, "failed": 0, "skipped": 0, "retries": 0, "bytes": 0,
+            "errors": {}, "timings": {phase: [] for phase in PHASES},
+        })
+        site["pages"] += 1
+        site[event["status"]] += 1
+        site["retries"] += event["retries"]
+        site["bytes"] += event["bytes"]
+        if event["error"]:
+            site["errors"][event["error"]] = site["errors"].get(event["error"], 0) + 1
+        for phase, seconds in event["phases"].items():
+            site["timings"][phase].append(seconds)
+
+    for site in report.values():
+        timings = site.pop("timings")
+        site["phases"] = {
+            phase: {"p50": percentile(values, 50), "p95": percentile(values, 95)}
+            for phase, values in timings.items() if values
+        }
+        site["pages_per_second"] = round(site["ok"] / elapsed, 3) if elapsed else 0.0
+    return report
+
+
+def load_events(path):
+    """Đọc lại các sự kiện từ một file telemetry, thời gian lưu theo lô được chia đều cho các bài ok như khi ghi"""
+    events = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            event = json.loads(line)
+            if event["mode"] != "save":
+                events.append(event)
+                continue
+            for page in events:
+                if page["site"] == event["site"] and page["status"] == "ok":
+                    page["phases"]["save"] = round(event["phases"]["save"] / event["pages"], 4)
+    return events
+
+
+class Telemetry:
+    """
+    Ghi số liệu của từng trang (thời gian từng bước, số lần thử lại, lý do lỗi, số byte) thành JSON lines
+    và tổng hợp báo cáo cuối lượt crawl. Dùng được từ nhiều thread cùng lúc.
+    Mỗi dòng gồm: site, url, mode (http / browser), status (ok / failed / skipped), error,
+    retries, bytes và phases {fetch, wait, extract, save} tính bằng giây.
+    Args:
+        path (str): File .jsonl (mặc định data/telemetry/crawl-<thời điểm>.jsonl)
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            os.makedirs(get_telemetry_dir(), exist_ok=True)
+            path = os.path.join(get_telemetry_dir(), f"crawl-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jsonl")
+        self.path = path
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.events = []
+        self.file = open(path, "a", encoding="utf-8")
+
+    def record(self, site, url, mode, status, phases=None, retries=0, bytes=0, error=None):
+        event = {
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "site": site,
+            "url": url,
+            "mode": mode,
+            "status": status,
+            "error": error,
+            "retries": retries,
+            "bytes": bytes,
+            "phases": {phase: round(seconds, 4) for phase, seconds in (phases or {}).items()},
+        }
+        with self.lock:
+            self.events.append(event)
+            self.file.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+    def record_save(self, site, seconds, pages):
+        # Lưu theo lô cho cả trang: chia đều thời gian lưu cho các bài trong lô
+        if not pages:
+            return
+        with self.lock:
+            for event in self.events:
+                if event["site"] == site and event["status"] == "ok":
+                    event["phases"]["save"] = round(seconds / pages, 4)
+            self.file.write(json.dumps({
+                "ts": datetime.now().isoformat(timespec="milliseconds"), "site": site, "mode": "save",
+                "pages": pages, "phases": {"save": round(seconds, 4)},
+            }, ensure_ascii=False) + "\n")
+
+    def summary(self):
+        """
+        Returns:
+            dict: {site: {pages, ok, failed, skipped, retries, bytes, pages_per_second, errors, phases: {phase: {p50, p95}}}}
+        """
+        elapsed = time.monotonic() - self.started
+        with self.lock:
+            events = list(self.events)
+        return summarize(events, elapsed)
+
+    def print_summary(self, report=None):
+        report = report or self.summary()
+        print(f"\n📈 Telemetry ({self.path}):")
+        for site, stats in report.items():
+            phases = ", ".join(
+                f"{phase} p50 {values['p50']:.2f}s / p95 {values['p95']:.2f}s" for phase, values in stats["phases"].items()
+            )
+            print(f"📊 {site}: {stats['ok']}/{stats['pages']} trang, {stats['pages_per_second']:.2f} trang/giây, "
+                  f"{stats['retries']} lần thử lại, {stats['bytes'] / 1024:.0f} KB")
+            if phases:
+                print(f"   {phases}")
+            for error, count in stats["errors"].items():
+                print(f"   ⚠️ {error}: {count}")
+        return report
+
+    def close(self):
+        with self.lock:
+            self.file.close()
@@ -4,6 +4,7 @@ import sys
 from pathlib import Path
 import torch
 from transformers import AutoTokenizer, AutoConfig
+import hashlib
 import logging
 import traceback
 
@@ -65,11 +66,15 @@ except Exception as e:
     traceback.print_exc()
     sys.exit(1)
 
+# Chia văn bản dài thành các cửa sổ chồng nhau (module riêng, không cần torch)
+from model.VPhoBertTaggermaster.windows import WINDOW_STRIDE, split_windows, merge_window_labels
+
 # Global variables
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 model = None
 tokenizer = None
 id2label = None
+checkpoint_id = None
 
 def load_model():
     """Load model và tokenizer một lần duy nhất"""
@@ -171,8 +176,34 @@ def load_model():
         traceback.print_exc()
         return False
 
-def predict_ner(sentence):
-    """Dự đoán NER cho một câu"""
+def set_num_threads(threads):
+    """Số thread torch dùng cho mỗi phép tính (intra-op), đặt riêng cho từng process khi chạy nhiều process"""
+    torch.set_num_threads(max(1, threads))
+
+def get_checkpoint_id(max_length=256, stride=WINDOW_STRIDE):
+    """
+    Mã nhận diện model đang dùng: hash kích thước + 1 MB đầu và cuối của checkpoint, kèm cấu hình cửa sổ.
+    Đổi checkpoint (hoặc cách chia cửa sổ) thì kết quả NER đã cache theo mã cũ không còn được dùng.
+    """
+    global checkpoint_id
+    if checkpoint_id is not None:
+        return f"{checkpoint_id}:{max_length}:{stride}"
+    model_path = current_dir / "outputs" / "best_model.pt"
+    digest = hashlib.sha256()
+    size = model_path.stat().st_size
+    digest.update(str(size).encode())
+    with open(model_path, "rb") as f:
+        digest.update(f.read(1 << 20))
+        f.seek(max(0, size - (1 << 20)))
+        digest.update(f.read(1 << 20))
+    checkpoint_id = digest.hexdigest()[:16]
+    return f"{checkpoint_id}:{max_length}:{stride}"
+
+def predict_ner(sentence, max_length=256, stride=WINDOW_STRIDE, truncate=False):
+    """
+    Dự đoán NER cho một văn bản, phủ toàn bộ độ dài bằng các cửa sổ trượt (xem predict_ner_windows).
+    truncate=True: chỉ dự đoán max_length subword đầu như trước
+    """
     if not load_model():
         logger.error(f"❌ Không thể load model trong {current_file}")
         return [], []
@@ -183,75 +214,7 @@ def predict_ner(sentence):
     
     try:
         logger.debug(f"🔄 Đang predict cho: {sentence[:50]}...")
-        
-        # Normalize text
-        sentence = normalize_text(sentence)
-        
-        # ✅ FIX: Tokenize với max_length phù hợp
-        encoding = tokenizer.encode_plus(
-            sentence,
-            return_tensors='pt',
-            truncation=True,
-            max_length=256,  # ✅ Giảm từ 512 xuống 256
-            padding=True,  # ✅ Thêm padding cố định
-            is_split_into_words=False
-        )
-        
-        input_ids = encoding['input_ids'].to(device)
-        attention_mask = encoding['attention_mask'].to(device)
-        
-        # ✅ FIX: Tạo valid_ids và label_masks đúng cách
-        batch_size, seq_len = input_ids.shape
-        valid_ids = torch.ones((batch_size, seq_len), dtype=torch.long).to(device)
-        label_masks = attention_mask.clone().to(device)
-        
-        # ✅ DEBUG: Log kích thước tensor
-        logger.debug(f"Input shape: {input_ids.shape}")
-        logger.debug(f"Attention mask shape: {attention_mask.shape}")
-        logger.debug(f"Valid ids shape: {valid_ids.shape}")
-        logger.debug(f"Label masks shape: {label_masks.shape}")
-        
-        # Predict
-        with torch.no_grad():
-            output = model(
-                input_ids=input_ids,
-                attention_mask=attention_mask,
-                valid_ids=valid_ids,
-                label_masks=label_masks
-            )
-            
-            if not hasattr(output, 'tags'):
-                logger.error(f"❌ MODEL OUTPUT ERROR trong {current_file}:")
-                logger.error(f"   Output không có 'tags' attribute")
-                logger.error(f"   Các attributes: {dir(output)}")
-                return [], []
-            
-            tag_ids = output.tags
-        
-        # ✅ FIX: Chỉ lấy tokens không phải special tokens
-        tokens = tokenizer.convert_ids_to_tokens(input_ids[0])
-        
-        # ✅ FIX: Kiểm tra length mismatch
-        if len(tag_ids) != len(tokens):
-            logger.error(f"❌ LENGTH MISMATCH ERROR trong {current_file}:")
-            logger.error(f"   Tokens length: {len(tokens)}")
-            logger.error(f"   Tag_ids length: {len(tag_ids)}")
-            # Cắt cho bằng nhau
-            min_len = min(len(tokens), len(tag_ids))
-            tokens = tokens[:min_len]
-            tag_ids = tag_ids[:min_len]
-        
-        # ✅ FIX: Kiểm tra tag_ids có nằm trong phạm vi không
-        valid_tag_ids = []
-        for tag_id in tag_ids:
-            if tag_id in id2label:
-                valid_tag_ids.append(tag_id)
-            else:
-                logger.warning(f"⚠️ Tag ID {tag_id} không có trong id2label")
-                valid_tag_ids.append(0)  # Mặc định là 'O'
-        
-        labels = [id2label[tag] for tag in valid_tag_ids]
-        
+        tokens, labels = predict_ner_windows([sentence], max_length=max_length, stride=stride, truncate=truncate)[0]
         logger.debug(f"✅ Predict thành công: {len(tokens)} tokens")
         return tokens, labels
         
@@ -344,6 +307,120 @@ def extract_entities(tokens, labels):
         traceback.print_exc()
         return []
 
+def _split_tags(tags, lengths):
+    # output.tags: danh sách theo từng dòng, hoặc một danh sách phẳng các vị trí có label_masks của cả batch
+    if tags and isinstance(tags[0], list):
+        return [row[:length] for row, length in zip(tags, lengths)]
+    rows = []
+    offset = 0
+    for length in lengths:
+        rows.append(tags[offset:offset + length])
+        offset += length
+    return rows
+
+
+def predict_ner_batch(windows, batch_size=16):
+    """
+    Dự đoán NER cho nhiều cửa sổ subword: sắp theo độ dài rồi chạy theo batch,
+    mỗi batch chỉ padding tới cửa sổ dài nhất trong batch.
+    Args:
+        windows (list): Các cửa sổ từ split_windows
+        batch_size (int): Số cửa sổ mỗi lần forward
+    Returns:
+        list: (tokens, labels) của từng cửa sổ, theo đúng thứ tự windows
+    """
+    results = [([], [])] * len(windows)
+    if not windows:
+        return results
+
+    order = sorted(range(len(windows)), key=lambda index: len(windows[index]), reverse=True)
+    for start in range(0, len(order), batch_size):
+        indices = order[start:start + batch_size]
+        rows = [
+            [tokenizer.cls_token_id] + tokenizer.convert_tokens_to_ids(windows[index]) + [tokenizer.sep_token_id]
+            for index in indices
+        ]
+        lengths = [len(row) for row in rows]
+        width = max(lengths)
+        input_ids = torch.full((len(rows), width), tokenizer.pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(rows), width), dtype=torch.long)
+        for row_index, row in enumerate(rows):
+            input_ids[row_index, :len(row)] = torch.tensor(row, dtype=torch.long)
+            attention_mask[row_index, :len(row)] = 1
+        input_ids = input_ids.to(device)
+        attention_mask = attention_mask.to(device)
+
+        with torch.no_grad():
+            output = model(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                valid_ids=torch.ones_like(input_ids),
+                label_masks=attention_mask.clone(),
+            )
+
+        for index, row, tag_ids in zip(indices, rows, _split_tags(output.tags, lengths)):
+            tokens = tokenizer.convert_ids_to_tokens(row)[:len(tag_ids)]
+            labels = [id2label[tag] if tag in id2label else id2label[0] for tag in tag_ids]
+            results[index] = (tokens, labels)
+    return results
+
+
+def predict_ner_windows(texts, batch_size=16, max_length=256, stride=WINDOW_STRIDE, truncate=False):
+    """
+    NER cho nhiều văn bản: cửa sổ trượt của mọi văn bản được chạy chung các batch (predict_ner_batch),
+    nhãn của các cửa sổ chồng nhau được gộp lại theo từng văn bản.
+    Args:
+        stride (int): Bước trượt giữa hai cửa sổ, nhỏ hơn thì chồng nhiều hơn (chính xác hơn, chậm hơn)
+        truncate (bool): Chỉ dùng cửa sổ đầu tiên (max_length subword đầu) như cách cũ, để so sánh
+    Returns:
+        list: (tokens, labels) trên toàn bộ độ dài của từng văn bản, theo đúng thứ tự texts
+    """
+    sequences = [tokenizer.tokenize(normalize_text(text)) if text and text.strip() else [] for text in texts]
+    windows = []
+    owners = []
+    for text_index, subwords in enumerate(sequences):
+        if not subwords:
+            continue
+        text_windows = split_windows(subwords, max_length, stride)
+        for start, window in text_windows[:1] if truncate else text_windows:
+            windows.append(window)
+            owners.append((text_index, start))
+
+    window_labels = [[] for _ in texts]
+    for (text_index, start), window, (_, labels) in zip(owners, windows, predict_ner_batch(windows, batch_size)):
+        # Bỏ nhãn của <s> ở đầu và </s> ở cuối
+        window_labels[text_index].append((start, labels[1:1 + len(window)]))
+
+    results = []
+    for subwords, labels in zip(sequences, window_labels):
+        if truncate:
+            subwords = subwords[:max_length - 2]
+        results.append((subwords, merge_window_labels(len(subwords), labels)))
+    return results
+
+
+def extract_entities_batch(texts, batch_size=16, max_length=256, stride=WINDOW_STRIDE):
+    """
+    NER cho nhiều văn bản cùng lúc trên toàn bộ độ dài (cửa sổ trượt), chạy theo batch
+    rồi trả entities về văn bản gốc.
+    Returns:
+        list: Danh sách entities (entity, label) của từng văn bản, theo đúng thứ tự texts
+    """
+    if not load_model():
+        logger.error(f"❌ Không thể load model trong {current_file}")
+        return [[] for _ in texts]
+
+    try:
+        predictions = predict_ner_windows(texts, batch_size, max_length, stride)
+    except RuntimeError as e:
+        logger.error(f"❌ TORCH/CUDA ERROR trong {current_file} - extract_entities_batch():")
+        logger.error(f"   Chi tiết: {str(e)}")
+        return [[] for _ in texts]
+
+    logger.info(f"✅ NER theo batch: {len(texts)} văn bản, {sum(len(tokens) for tokens, _ in predictions)} subword")
+    return [extract_entities(tokens, labels) if tokens else [] for tokens, labels in predictions]
+
+
 def test_ner(text):
     """Test function để kiểm tra NER"""
     print(f"🔄 Testing trong file: {current_file}")
@@ -0,0 +1,121 @@
+# So sánh NER cắt ở 256 subword đầu (cách cũ) với NER cửa sổ trượt trên toàn bộ văn bản:
+# tốc độ (subword/giây) và tỉ lệ entity tìm được (recall) trên tập test VLSP 2018.
+# Các câu liên tiếp được ghép thành "bài" dài như bài báo để thấy phần bị cắt.
+# Chạy từ thư mục VPhoBertTaggermaster (cần outputs/best_model.pt):
+#   python tools/bench_ner.py --data_path datasets/vlsp2018/test_syllables.txt --sentences_per_doc 30
+import sys
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).absolute().parents[3]))
+
+from model.VPhoBertTaggermaster import test as ner  # noqa: E402
+
+
+def read_conll(path):
+    """
+    Returns:
+        list: Các câu, mỗi câu là danh sách (từ, nhãn NER mức 1)
+    """
+    sentences = []
+    current = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            columns = line.rstrip('\n').split('\t')
+            if len(columns) < 2 or not columns[0]:
+                if current:
+                    sentences.append(current)
+                current = []
+                continue
+            current.append((columns[0], columns[1]))
+    if current:
+        sentences.append(current)
+    return sentences
+
+
+def gold_entities(sentence):
+    entities = []
+    words = []
+    label = None
+    for word, tag in sentence + [('', 'O')]:
+        if tag.startswith('I-') and label == tag[2:]:
+            words.append(word)
+            continue
+        if words:
+            entities.append((' '.join(words), label))
+        words, label = ([word], tag[2:]) if tag != 'O' else ([], None)
+    return entities
+
+
+# So khớp theo chữ, bỏ khoảng trắng / dấu gạch dưới và chữ hoa (subword được ghép lại khác với từ gốc)
+def _key(text):
+    return ''.join(text.replace('_', ' ').split()).lower()
+
+
+def make_docs(sentences, sentences_per_doc):
+    docs = []
+    for start in range(0, len(sentences), sentences_per_doc):
+        group = sentences[start:start + sentences_per_doc]
+        text = ' '.join(word.replace('_', ' ') for sentence in group for word, _ in sentence)
+        gold = {_key(entity) for sentence in group for entity, _ in gold_entities(sentence)}
+        docs.append((text, gold))
+    return docs
+
+
+def run_mode(docs, batch_size, max_length, stride, truncate):
+    texts = [text for text, _ in docs]
+    start = time.perf_counter()
+    predictions = ner.predict_ner_windows(texts, batch_size, max_length, stride, truncate=truncate)
+    elapsed = time.perf_counter() - start
+
+    found = 0
+    total = 0
+    for (tokens, labels), (_, gold) in zip(predictions, docs):
+        predicted = {_key(entity) for entity, _ in ner.extract_entities(tokens, labels)} if tokens else set()
+        found += len(gold & predicted)
+        total += len(gold)
+    # Số subword được gán nhãn: cắt thì tối đa max_length - 2 mỗi bài, cửa sổ trượt thì cả bài
+    tokens = sum(len(doc_tokens) for doc_tokens, _ in predictions)
+    return {
+        'seconds': elapsed,
+        'tokens_per_second': tokens / elapsed if elapsed else 0.0,
+        'recall': found / total if total else 0.0,
+        'tokens': tokens,
+    }
+
+
+def run():
+    parser = ArgumentParser()
+    parser.add_argument("--data_path", default='datasets/vlsp2018/test_syllables.txt', type=str,
+                        help="File CoNLL (từ <tab> nhãn ...), mặc định tập test VLSP 2018 theo âm tiết")
+    parser.add_argument("--sentences_per_doc", default=30, type=int,
+                        help="Số câu liên tiếp ghép thành một bài")
+    parser.add_argument("--max_docs", default=0, type=int, help="Chỉ dùng N bài đầu (0 = tất cả)")
+    parser.add_argument("--batch_size", default=16, type=int)
+    parser.add_argument("--max_length", default=256, type=int)
+    parser.add_argument("--stride", default=ner.WINDOW_STRIDE, type=int)
+    args = parser.parse_args()
+
+    if not ner.load_model():
+        print("❌ Không load được model")
+        return
+
+    docs = make_docs(read_conll(args.data_path), args.sentences_per_doc)
+    if args.max_docs:
+        docs = docs[:args.max_docs]
+    print(f"📚 {len(docs)} bài từ {args.data_path} ({args.sentences_per_doc} câu/bài)")
+
+    stats = {}
+    for mode, truncate in (('truncate', True), ('windows', False)):
+        stats[mode] = run_mode(docs, args.batch_size, args.max_length, args.stride, truncate)
+        print(f"{mode:>9}: {stats[mode]['seconds']:.1f}s, {stats[mode]['tokens_per_second']:.0f} subword/giây, "
+              f"recall {stats[mode]['recall']:.1%}")
+
+    overhead = stats['windows']['seconds'] / stats['truncate']['seconds'] - 1 if stats['truncate']['seconds'] else 0.0
+    print(f"📈 Recall +{stats['windows']['recall'] - stats['truncate']['recall']:.1%} "
+          f"với thời gian +{overhead:.0%} (stride {args.stride})")
+
+
+if __name__ == "__main__":
+    run()
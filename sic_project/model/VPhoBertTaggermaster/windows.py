@@ -0,0 +1,62 @@
+# Chia văn bản dài (quá 256 subword của PhoBERT) thành các cửa sổ chồng nhau và gộp lại nhãn NER của các cửa sổ.
+# Tách riêng khỏi test.py (không cần torch / transformers) để kiểm thử được độc lập.
+
+# Bước trượt (subword) giữa hai cửa sổ NER liên tiếp: cửa sổ 254 subword, chồng lên nhau 62 subword
+WINDOW_STRIDE = 192
+
+
+def split_windows(subwords, max_length=256, stride=WINDOW_STRIDE):
+    """
+    Chia chuỗi subword thành các cửa sổ trượt dài tối đa max_length (kể cả <s> và </s>), cửa sổ sau bắt đầu
+    cách cửa sổ trước `stride` subword, để NER phủ toàn bộ bài thay vì chỉ 256 subword đầu.
+    Cửa sổ không bắt đầu giữa một từ (sau subword kết thúc bằng "@@"): lùi điểm bắt đầu tối đa nửa stride để tìm
+    ranh giới từ, không có thì bắt đầu đúng `stride` subword sau (mỗi cửa sổ luôn tiến ít nhất nửa stride).
+    Returns:
+        list: (vị trí bắt đầu, các subword) của từng cửa sổ
+    """
+    limit = max_length - 2
+    stride = max(1, min(stride or limit, limit))
+    windows = []
+    start = 0
+    while True:
+        windows.append((start, subwords[start:start + limit]))
+        if start + limit >= len(subwords):
+            return windows
+        next_start = start + stride
+        while next_start > start + stride // 2 + 1 and subwords[next_start - 1].endswith("@@"):
+            next_start -= 1
+        if subwords[next_start - 1].endswith("@@"):
+            # Chuỗi "@@" dài (URL, chuỗi ký tự lạ): không có ranh giới từ gần đó, chấp nhận cắt giữa từ
+            next_start = start + stride
+        start = next_start
+
+
+def merge_window_labels(length, window_labels):
+    """
+    Gộp nhãn của các cửa sổ chồng nhau: mỗi subword lấy nhãn từ cửa sổ mà nó nằm gần giữa nhất
+    (xa hai mép nhất, nơi model có đủ ngữ cảnh hai bên), rồi sửa lại BIO ở chỗ nối giữa các cửa sổ.
+    Args:
+        length (int): Số subword của cả văn bản
+        window_labels (list): (vị trí bắt đầu, nhãn) của từng cửa sổ
+    Returns:
+        list: Nhãn của từng subword
+    """
+    labels = ["O"] * length
+    best = [-1] * length
+    for start, window in window_labels:
+        for offset, label in enumerate(window):
+            position = start + offset
+            if position >= length:
+                break
+            score = min(offset, len(window) - 1 - offset)
+            if score > best[position]:
+                best[position] = score
+                labels[position] = label
+
+    # I-X đứng sau O hoặc sau nhãn khác loại (thường ở chỗ nối hai cửa sổ) thành B-X
+    for position, label in enumerate(labels):
+        if label.startswith("I-"):
+            previous = labels[position - 1] if position else "O"
+            if previous == "O" or previous[2:] != label[2:]:
+                labels[position] = "B-" + label[2:]
+    return labels
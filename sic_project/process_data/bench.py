@@ -0,0 +1,94 @@
+# Đo tốc độ tiền xử lý + NER (processdt) theo số process trên cùng một tập bài của kho bài thô (data/raw).
+# Mỗi lần chạy dùng một chỉ mục trùng lặp mới và không dùng cache NER, để mọi bài đều được chạy qua PhoBERT.
+# Ví dụ (chạy từ thư mục sic_project):
+#   python -m process_data.bench --workers 1 2 4 8 --limit 2000
+#   python -m process_data.bench --workers 1 4 --input data/all_news_combined.json
+import argparse
+import json
+import os
+import tempfile
+import time
+from itertools import islice
+
+from crawl_data.raw_store import RawStore
+from process_data.processdt import ArticleProcessor, NER_BATCH_SIZE, PROCESS_CHUNK_SIZE
+
+
+def load_articles(input_path=None, limit=0):
+    if input_path:
+        with open(input_path, "r", encoding="utf-8") as f:
+            articles = json.load(f)
+        return articles[:limit] if limit else articles
+    store = RawStore()
+    try:
+        records = store.iter_records()
+        return list(islice(records, limit) if limit else records)
+    finally:
+        store.close()
+
+
+def bench_workers(articles, workers, batch_size=NER_BATCH_SIZE, chunk_size=PROCESS_CHUNK_SIZE):
+    """
+    Returns:
+        dict: Thời gian (gồm cả thời gian nạp model của các worker), số bài/giây, bộ đếm và kết quả xử lý
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        processor = ArticleProcessor(os.path.join(tmp, "dedup.sqlite3"), defer_ner=True, workers=workers)
+        start = time.perf_counter()
+        processor.process_all(articles, batch_size=batch_size, chunk_size=chunk_size)
+        elapsed = time.perf_counter() - start
+        processor.close()
+    return {
+        "workers": workers,
+        "seconds": elapsed,
+        "articles_per_second": len(articles) / elapsed if elapsed else 0.0,
+        "processed": processor.processed_count,
+        "skipped": processor.skipped_count,
+        "duplicates": processor.duplicate_count,
+        "cleaned_data": processor.cleaned_data,
+    }
+
+
+# extract_entities trả về list(set(...)): thứ tự entity khác nhau giữa các process (hash randomization),
+# nên so sánh popular_tags như tập hợp
+def comparable(cleaned_data):
+    return [
+        {**item, "popular_tags": sorted(tuple(entity) for entity in item["popular_tags"])} if "popular_tags" in item else item
+        for item in cleaned_data
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Đo tốc độ tiền xử lý + NER theo số process")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="Các số process cần đo")
+    parser.add_argument("--limit", type=int, default=1000, help="Số bài đầu tiên của kho (0 = tất cả)")
+    parser.add_argument("--input", help="File JSON bài thô thay cho kho data/raw")
+    parser.add_argument("--batch-size", type=int, default=NER_BATCH_SIZE)
+    parser.add_argument("--chunk-size", type=int, default=PROCESS_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    articles = load_articles(args.input, args.limit)
+    if not articles:
+        print("❌ Không có bài nào để đo")
+        return
+    print(f"📚 {len(articles)} bài, {os.cpu_count()} core")
+
+    baseline = None
+    for workers in args.workers:
+        stats = bench_workers(articles, workers, args.batch_size, args.chunk_size)
+        if baseline is None:
+            baseline = stats
+        # Tăng tốc và hiệu suất so với lần chạy đầu tiên (thường là 1 process)
+        speedup = baseline["seconds"] / stats["seconds"] if stats["seconds"] else 0.0
+        efficiency = speedup * baseline["workers"] / workers
+        # Kết quả phải giống hệt lần chạy đầu tiên: cùng thứ tự bài, cùng bộ đếm
+        same = comparable(stats["cleaned_data"]) == comparable(baseline["cleaned_data"]) and \
+            (stats["processed"], stats["skipped"]) == (baseline["processed"], baseline["skipped"])
+        print(f"{workers:>2} process: {stats['seconds']:.1f}s, {stats['articles_per_second']:.1f} bài/giây, "
+              f"tăng tốc x{speedup:.2f} (hiệu suất {efficiency:.0%}), "
+              f"{stats['processed']} xử lý / {stats['skipped']} bỏ qua, "
+              f"{'✅ kết quả giống' if same else '❌ kết quả KHÁC'} lần {baseline['workers']} process")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 import os
 import json
 import pandas as pd
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
 from datetime import datetime
 import logging
 
@@ -107,14 +107,42 @@ def upload_articles_to_mongodb(
         client.admin.command('ping')
         logger.info("Kết nối MongoDB thành công.")
 
-        # Thêm trường timestamp vào mỗi document trước khi insert
+        # Bài trùng lặp (duplicate_of) không tạo document mới, chỉ thêm nguồn vào document của cụm tin
+        duplicates = [article for article in articles_data if article.get('duplicate_of')]
+        articles_data = [article for article in articles_data if not article.get('duplicate_of')]
+
+        # Thêm trường timestamp vào mỗi document trước khi upload
         timestamp = datetime.now()
         for article in articles_data:
             article['upload_timestamp'] = timestamp
         
-        # Insert nhiều documents cùng lúc
-        insert_result = collection.insert_many(articles_data, ordered=False) # ordered=False để tiếp tục insert nếu có lỗi 1 document
-        logger.info(f"Đã insert {len(insert_result.inserted_ids)} bài viết mới vào collection '{collection_name}'.")
+        # Index cho upsert theo url và cập nhật nguồn theo cụm tin (không tạo lại nếu đã có)
+        collection.create_index("url")
+        collection.create_index("cluster_id")
+
+        # Upsert theo url thay vì insert: upload lại cùng một bài (processdt --full, task chạy lại) không tạo document trùng.
+        # Nguồn được gộp ($addToSet) để giữ các nguồn đã thêm từ bài trùng lặp của những lần upload trước
+        if articles_data:
+            upsert_result = collection.bulk_write([
+                UpdateOne(
+                    {"url": article["url"]},
+                    {
+                        "$set": {key: value for key, value in article.items() if key != "sources"},
+                        "$addToSet": {"sources": {"$each": article.get("sources") or [article["url"]]}},
+                    },
+                    upsert=True,
+                )
+                for article in articles_data
+            ], ordered=False) # ordered=False để tiếp tục nếu có lỗi 1 document
+            logger.info(f"Đã thêm {upsert_result.upserted_count} bài viết mới, cập nhật {upsert_result.matched_count} bài "
+                        f"đã có trong collection '{collection_name}'.")
+
+        if duplicates:
+            update_result = collection.bulk_write([
+                UpdateOne({"cluster_id": article["duplicate_of"]}, {"$addToSet": {"sources": article["url"]}})
+                for article in duplicates
+            ], ordered=False)
+            logger.info(f"Đã thêm nguồn cho {update_result.modified_count} cụm tin từ {len(duplicates)} bài trùng lặp.")
         
         # Có thể thêm logic tạo index tại đây nếu cần
         # Ví dụ: collection.create_index("id", unique=True)
@@ -0,0 +1,136 @@
+import re
+import json
+import random
+import sqlite3
+import hashlib
+
+# Tham số MinHash-LSH: 64 hàm băm chia thành 16 band x 4 dòng.
+# Hai bài có Jaccard ~0.5 trở lên gần như chắc chắn rơi chung ít nhất một bucket.
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+_rng = random.Random(20250714)
+_PERMUTATIONS = [(_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+
+
+# Băm cố định giữa các lần chạy (hash() của Python thay đổi theo tiến trình)
+def _stable_hash(text):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    words = re.findall(r"\w+", (text or "").lower())
+    if len(words) < size:
+        return {_stable_hash(" ".join(words))} if words else set()
+    return {_stable_hash(" ".join(words[i:i + size])) for i in range(len(words) - size + 1)}
+
+
+def minhash(shingle_set):
+    if not shingle_set:
+        return None
+    return [
+        min(((a * x + b) % MERSENNE_PRIME) & MAX_HASH for x in shingle_set)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def estimate_similarity(sig_a, sig_b):
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def _band_keys(signature):
+    for band in range(BANDS):
+        chunk = signature[band * ROWS:(band + 1) * ROWS]
+        yield band, hashlib.md5(",".join(map(str, chunk)).encode()).hexdigest()
+
+
+class DuplicateIndex:
+    """
+    Phát hiện bài trùng lặp gần đúng (cùng một tin đăng trên nhiều báo) bằng MinHash-LSH.
+    Chữ ký và bucket được lưu trong SQLite nên các lần chạy sau vẫn gom đúng cụm.
+    Args:
+        db_path (str): Đường dẫn file SQLite
+        threshold (float): Độ tương đồng Jaccard ước lượng tối thiểu để coi là trùng
+    """
+
+    def __init__(self, db_path, threshold=0.6):
+        self.threshold = threshold
+        # Có thể dùng từ nhiều thread (pipeline streaming), việc truy cập được ArticleProcessor khoá tuần tự
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS signatures (
+                url TEXT PRIMARY KEY,
+                cluster_id TEXT NOT NULL,
+                signature TEXT
+            );
+            CREATE TABLE IF NOT EXISTS bands (
+                band INTEGER NOT NULL,
+                bucket TEXT NOT NULL,
+                url TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_bands ON bands (band, bucket);
+            CREATE TABLE IF NOT EXISTS clusters (
+                cluster_id TEXT PRIMARY KEY,
+                representative_url TEXT NOT NULL
+            );
+        """)
+        self.conn.commit()
+
+    def _find_similar(self, signature):
+        candidates = set()
+        for band, bucket in _band_keys(signature):
+            rows = self.conn.execute("SELECT url FROM bands WHERE band = ? AND bucket = ?", (band, bucket))
+            candidates.update(row[0] for row in rows)
+
+        best_cluster, best_score = None, 0.0
+        for url in candidates:
+            cluster_id, stored = self.conn.execute(
+                "SELECT cluster_id, signature FROM signatures WHERE url = ?", (url,)
+            ).fetchone()
+            score = estimate_similarity(signature, json.loads(stored))
+            if score >= self.threshold and score > best_score:
+                best_cluster, best_score = cluster_id, score
+        return best_cluster
+
+    def assign(self, url, text):
+        """
+        Gán bài viết vào một cụm tin.
+        Returns:
+            tuple: (cluster_id, is_representative) - is_representative là True nếu bài này
+                   là bài đầu tiên (đại diện) của cụm
+        """
+        row = self.conn.execute("SELECT cluster_id FROM signatures WHERE url = ?", (url,)).fetchone()
+        if row is not None:
+            cluster_id = row[0]
+            representative = self.conn.execute(
+                "SELECT representative_url FROM clusters WHERE cluster_id = ?", (cluster_id,)
+            ).fetchone()
+            return cluster_id, representative is not None and representative[0] == url
+
+        signature = minhash(shingles(text))
+        cluster_id = self._find_similar(signature) if signature else None
+        is_representative = cluster_id is None
+        if is_representative:
+            cluster_id = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+            self.conn.execute(
+                "INSERT OR IGNORE INTO clusters (cluster_id, representative_url) VALUES (?, ?)", (cluster_id, url)
+            )
+
+        self.conn.execute(
+            "INSERT INTO signatures (url, cluster_id, signature) VALUES (?, ?, ?)",
+            (url, cluster_id, json.dumps(signature) if signature else None),
+        )
+        if signature:
+            self.conn.executemany(
+                "INSERT INTO bands (band, bucket, url) VALUES (?, ?, ?)",
+                [(band, bucket, url) for band, bucket in _band_keys(signature)],
+            )
+        self.conn.commit()
+        return cluster_id, is_representative
+
+    def close(self):
+        self.conn.close()
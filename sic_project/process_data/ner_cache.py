@@ -0,0 +1,88 @@
+import json
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from datetime import datetime
+
+
+# Chuẩn hoá nội dung trước khi băm: cùng một bài crawl lại (khác khoảng trắng / dạng Unicode) vẫn trúng cache
+def normalize_content(content):
+    return " ".join(unicodedata.normalize("NFC", content or "").split())
+
+
+class NerCache:
+    """
+    Cache kết quả NER theo nội dung bài: key là sha256 của (mã checkpoint, nội dung đã chuẩn hoá),
+    giá trị là danh sách entities. Các lần chạy sau chỉ chạy PhoBERT cho nội dung mới.
+    Dùng được từ nhiều thread (pipeline streaming) và nhiều process, mỗi process mở kết nối riêng.
+    Args:
+        db_path (str): Đường dẫn file SQLite
+        checkpoint_id (str): Mã của model đang dùng (test.get_checkpoint_id), đổi model thì cache cũ không trúng
+    """
+
+    def __init__(self, db_path, checkpoint_id):
+        self.checkpoint_id = checkpoint_id
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # timeout: nhiều process (processdt chạy song song) cùng ghi vào một file
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS ner_cache (
+                key TEXT PRIMARY KEY,
+                entities TEXT NOT NULL,
+                created TEXT
+            )
+        """)
+        self.conn.commit()
+
+    def key(self, content):
+        return hashlib.sha256(f"{self.checkpoint_id}\n{normalize_content(content)}".encode("utf-8")).hexdigest()
+
+    def get_many(self, contents):
+        """
+        Returns:
+            list: Entities của từng nội dung, None nếu chưa có trong cache
+        """
+        keys = [self.key(content) for content in contents]
+        found = {}
+        with self.lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self.conn.execute(
+                    f"SELECT key, entities FROM ner_cache WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                )
+                found.update((key, [tuple(entity) for entity in json.loads(entities)]) for key, entities in rows)
+            results = [found.get(key) for key in keys]
+            hits = sum(1 for result in results if result is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+        return results
+
+    def get(self, content):
+        return self.get_many([content])[0]
+
+    def put_many(self, contents, entities_list):
+        now = datetime.now().isoformat()
+        rows = [
+            (self.key(content), json.dumps(entities, ensure_ascii=False), now)
+            # Kết quả rỗng không được lưu: predict_ner trả về rỗng cả khi model lỗi
+            for content, entities in zip(contents, entities_list) if entities
+        ]
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO ner_cache (key, entities, created) VALUES (?, ?, ?)", rows)
+            self.conn.commit()
+
+    def put(self, content, entities):
+        self.put_many([content], [entities])
+
+    def report(self):
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        print(f"🗃️ NER cache: {self.hits} hit, {self.misses} miss ({rate:.0%} trúng cache)")
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
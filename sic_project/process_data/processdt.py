@@ -10,7 +10,13 @@ import os
 # sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
 import json
+import argparse
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from datetime import datetime
 from typing import Optional, Dict
 import re
 import dateparser
@@ -20,11 +26,22 @@ import dateparser
 # Nếu không, nó sẽ tìm từ thư mục dags/sic_project/model...
 # Với cấu hình docker-compose và sys.path.append trong DAG, import này là chính xác.
 # from model.VPhoBertTaggermaster.vphoberttagger.predictor import extract
-from model.VPhoBertTaggermaster.test import extract_entities, predict_ner
+from model.VPhoBertTaggermaster.test import extract_entities, predict_ner, extract_entities_batch, load_model, get_checkpoint_id, set_num_threads
+from crawl_data.raw_store import RawStore
+from process_data.dedup import DuplicateIndex
+from process_data.ner_cache import NerCache
 
 
 # ==== Chuẩn hóa thời gian ====
 def normalize_time(raw_time: str) -> Optional[str]:
+    # Crawler lấy time_posted từ JSON-LD / OpenGraph dưới dạng ISO 8601: không cần dateparser
+    try:
+        dt = datetime.fromisoformat(raw_time.strip().replace("Z", "+00:00"))
+        if dt.tzinfo is not None:
+            return dt.isoformat()
+    except (AttributeError, ValueError):
+        pass
+
     try:
         dt = dateparser.parse(
             raw_time,
@@ -82,21 +99,65 @@ def clean_tags(tags):
 
 
 # ==== Lấy NER tags ====
-def get_ner_tag(content):
+# ner_cache: NerCache, bài có nội dung đã gặp (cùng model) lấy kết quả từ cache thay vì chạy lại PhoBERT
+def get_ner_tag(content, ner_cache=None):
     try:
         if not content or not content.strip():
             return []
 
+        if ner_cache is not None:
+            cached = ner_cache.get(content)
+            if cached is not None:
+                return cached
+
         tokens, labels = predict_ner(content)
         entities = extract_entities(tokens, labels)
+        if ner_cache is not None:
+            ner_cache.put(content, entities)
         return entities
     except Exception as e:
         print(f"⚠️ Lỗi khi trích xuất NER: {e}")
         return []
 
 
+# ==== Lấy NER tags cho nhiều bài cùng lúc (chạy theo batch) ====
+NER_BATCH_SIZE = 16
+
+
+def get_ner_tags_batch(contents, batch_size=NER_BATCH_SIZE, ner_cache=None):
+    try:
+        if ner_cache is None:
+            return extract_entities_batch(contents, batch_size=batch_size)
+
+        # Chỉ chạy model cho các nội dung chưa có trong cache
+        results = ner_cache.get_many(contents)
+        missing = [index for index, result in enumerate(results) if result is None]
+        if missing:
+            missing_contents = [contents[index] for index in missing]
+            entities_list = extract_entities_batch(missing_contents, batch_size=batch_size)
+            ner_cache.put_many(missing_contents, entities_list)
+            for index, entities in zip(missing, entities_list):
+                results[index] = entities
+        return results
+    except Exception as e:
+        print(f"⚠️ Lỗi khi trích xuất NER theo batch: {e}")
+        return [[] for _ in contents]
+
+
+# Mở cache NER cho model hiện tại, None nếu không load được model (không có mã checkpoint)
+def open_ner_cache(db_path):
+    if not load_model():
+        return None
+    try:
+        return NerCache(db_path, get_checkpoint_id())
+    except Exception as e:
+        print(f"⚠️ Không mở được cache NER '{db_path}': {e}")
+        return None
+
+
 # ==== Tiền xử lý 1 bài ====
-def preprocess_article(article: Dict) -> Dict:
+# with_ner=False: để trống popular_tags, NER được chạy sau cho cả lô (xem ArticleProcessor.run_pending_ner)
+def preprocess_article(article: Dict, with_ner: bool = True, ner_cache: Optional[NerCache] = None) -> Dict:
     try:
         author = safe_author(article.get("author"))
         cleaned_content = clean_content(article.get("content", ""), author)
@@ -111,61 +172,357 @@ def preprocess_article(article: Dict) -> Dict:
             "content": cleaned_content,
             "description": article.get("description", "").strip(),
             "image": article.get("image"),
-            "popular_tags": get_ner_tag(cleaned_content)
+            "popular_tags": get_ner_tag(cleaned_content, ner_cache) if with_ner else []
         }
     except Exception as e:
         print(f"⚠️ Lỗi khi xử lý bài viết ID {article.get('id', 'Unknown')}: {e}")
         return None
 
 
+# ==== Tiền xử lý trên nhiều process (ArticleProcessor với workers > 1) ====
+# Số bài đại diện gửi cho worker mỗi lần
+PROCESS_CHUNK_SIZE = 64
+# Model và cache NER của process worker, được nạp một lần trong _init_worker
+_worker_ner_cache = None
+_worker_batch_size = NER_BATCH_SIZE
+
+
+def _init_worker(torch_threads, ner_cache_path, batch_size):
+    global _worker_ner_cache, _worker_batch_size
+    # Mỗi worker chỉ dùng phần core của mình: N process x (số core) thread torch sẽ tranh nhau CPU
+    set_num_threads(torch_threads)
+    load_model()
+    _worker_ner_cache = open_ner_cache(ner_cache_path) if ner_cache_path else None
+    _worker_batch_size = batch_size
+
+
+def _preprocess_chunk(articles):
+    """
+    Tiền xử lý + NER (theo batch) một chunk bài trong process worker.
+    Returns:
+        tuple: (bài đã xử lý theo thứ tự đầu vào, None nếu lỗi; số hit; số miss của cache NER)
+    """
+    cache = _worker_ner_cache
+    hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    processed = [preprocess_article(article, with_ner=False) for article in articles]
+    done = [item for item in processed if item]
+    if done:
+        tags = get_ner_tags_batch([item["content"] for item in done], _worker_batch_size, cache)
+        for item, entities in zip(done, tags):
+            item["popular_tags"] = entities
+    if cache is None:
+        return processed, 0, 0
+    return processed, cache.hits - hits, cache.misses - misses
+
+
+# ==== Tiền xử lý + gom cụm tin trùng, dùng chung cho main() và pipeline streaming ====
+class ArticleProcessor:
+    """
+    Xử lý từng bài: gán cụm tin (MinHash-LSH), chỉ chạy preprocess_article/NER cho bài đại diện.
+    Gọi process() được từ nhiều thread: phần gán cụm chạy tuần tự, phần NER chạy song song.
+    Args:
+        dedup_path (str): File SQLite của DuplicateIndex
+        defer_ner (bool): Không chạy NER trong process() mà gom lại, chạy theo batch bằng run_pending_ner()
+        ner_cache_path (str): File SQLite của NerCache, None nếu không dùng cache NER
+        workers (int): Số process của process_all(); > 1 thì model chỉ được nạp trong các process worker
+    """
+
+    def __init__(self, dedup_path, defer_ner=False, ner_cache_path=None, workers=1):
+        self.dedup = DuplicateIndex(dedup_path)
+        self.workers = max(1, workers)
+        self.ner_cache_path = ner_cache_path
+        self.ner_cache = open_ner_cache(ner_cache_path) if ner_cache_path and self.workers == 1 else None
+        # Số hit / miss cache NER cộng dồn từ các process worker
+        self.worker_cache_stats = {"hits": 0, "misses": 0}
+        self.defer_ner = defer_ner
+        self.pending_ner = []
+        self.lock = threading.Lock()
+        self.clusters = {}
+        self.cleaned_data = []
+        self.processed_count = 0
+        self.skipped_count = 0
+        self.duplicate_count = 0
+
+    def _has_content(self, article):
+        # Kiểm tra nội dung trước khi xử lý
+        if article.get("content") and article.get("content").strip():
+            return True
+        print(f"ℹ️ Bỏ qua bài viết ID {article.get('id', 'Unknown')} do không có nội dung.")
+        with self.lock:
+            self.skipped_count += 1
+        return False
+
+    def _assign(self, article):
+        url = article.get("url")
+        with self.lock:
+            cluster_id, is_representative = self.dedup.assign(url, f"{article.get('title', '')}\n{article['content']}")
+
+            if cluster_id in self.clusters:
+                # Bài trùng với một bài đã xử lý trong lần chạy này: chỉ ghi thêm nguồn
+                self.clusters[cluster_id].append(url)
+                self.duplicate_count += 1
+                return None
+            if not is_representative:
+                # Bài trùng với tin đã xử lý ở lần chạy trước: connect_mongo sẽ thêm nguồn vào bản ghi của cụm
+                self.cleaned_data.append({"id": article.get("id"), "url": url, "cluster_id": cluster_id, "duplicate_of": cluster_id})
+                self.duplicate_count += 1
+                return None
+
+            # Giữ chỗ cho cụm ngay để các bài trùng đến trong lúc chạy NER vẫn được ghi nguồn
+            self.clusters[cluster_id] = [url]
+            return cluster_id
+
+    def process(self, article):
+        if not self._has_content(article):
+            return None
+
+        cluster_id = self._assign(article)
+        if cluster_id is None:
+            return None
+
+        processed = preprocess_article(article, with_ner=not self.defer_ner, ner_cache=self.ner_cache)
+        with self.lock:
+            if processed:
+                processed["cluster_id"] = cluster_id
+                processed["sources"] = self.clusters[cluster_id]
+                self.cleaned_data.append(processed)
+                self.processed_count += 1
+                if self.defer_ner:
+                    self.pending_ner.append(processed)
+            else:
+                print(f"⚠️ Bỏ qua bài viết ID {article.get('id', 'Unknown')} do lỗi xử lý.")
+                self.skipped_count += 1
+        return processed
+
+    def run_pending_ner(self, batch_size=NER_BATCH_SIZE):
+        """Chạy NER theo batch cho mọi bài đang chờ (defer_ner=True) và điền popular_tags"""
+        with self.lock:
+            pending, self.pending_ner = self.pending_ner, []
+        if not pending:
+            return
+        print(f"🧠 Chạy NER theo batch cho {len(pending)} bài...")
+        tags = get_ner_tags_batch([processed["content"] for processed in pending], batch_size, self.ner_cache)
+        for processed, entities in zip(pending, tags):
+            processed["popular_tags"] = entities
+
+    def process_all(self, articles, batch_size=NER_BATCH_SIZE, chunk_size=PROCESS_CHUNK_SIZE):
+        """
+        Xử lý cả lô bài: tuần tự với workers=1, ngược lại trên `workers` process.
+        Gán cụm tin luôn chạy tuần tự ở process chính (kết quả phụ thuộc thứ tự bài), tiền xử lý + NER của
+        các bài đại diện được chia thành từng chunk cho các worker. Thứ tự bài trong cleaned_data và các bộ đếm
+        giống hệt khi chạy tuần tự.
+        Args:
+            articles (iterable): Các bài thô, được đọc dần
+            chunk_size (int): Số bài đại diện mỗi lần gửi cho worker
+        """
+        if self.workers == 1:
+            for article in articles:
+                self.process(article)
+            self.run_pending_ner(batch_size)
+            return
+
+        torch_threads = max(1, (os.cpu_count() or 1) // self.workers)
+        print(f"🧵 Tiền xử lý trên {self.workers} process, {torch_threads} thread torch mỗi process")
+        pending = deque()
+        chunk = []
+        # spawn thay vì fork: fork một process đã chạy torch (OpenMP) có thể bị treo
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker,
+                                 initargs=(torch_threads, self.ner_cache_path, batch_size)) as executor:
+            for article in articles:
+                if not self._has_content(article):
+                    continue
+                cluster_id = self._assign(article)
+                if cluster_id is None:
+                    continue
+                # Giữ chỗ trong cleaned_data: thứ tự bài không phụ thuộc worker nào xong trước
+                chunk.append((len(self.cleaned_data), cluster_id, article))
+                self.cleaned_data.append(None)
+                if len(chunk) >= chunk_size:
+                    pending.append((chunk, executor.submit(_preprocess_chunk, [item for _, _, item in chunk])))
+                    chunk = []
+                    # Giới hạn số chunk đang chờ để không phải nạp cả kho bài vào bộ nhớ
+                    while len(pending) > self.workers * 2:
+                        self._collect(*pending.popleft())
+            if chunk:
+                pending.append((chunk, executor.submit(_preprocess_chunk, [item for _, _, item in chunk])))
+            while pending:
+                self._collect(*pending.popleft())
+        self.cleaned_data = [item for item in self.cleaned_data if item is not None]
+
+    def _collect(self, chunk, future):
+        processed_list, hits, misses = future.result()
+        self.worker_cache_stats["hits"] += hits
+        self.worker_cache_stats["misses"] += misses
+        for (slot, cluster_id, article), processed in zip(chunk, processed_list):
+            if processed:
+                processed["cluster_id"] = cluster_id
+                processed["sources"] = self.clusters[cluster_id]
+                self.cleaned_data[slot] = processed
+                self.processed_count += 1
+            else:
+                print(f"⚠️ Bỏ qua bài viết ID {article.get('id', 'Unknown')} do lỗi xử lý.")
+                self.skipped_count += 1
+
+    def report(self):
+        print(f"✅ Đã xử lý thành công {self.processed_count} bài viết. Bỏ qua {self.skipped_count} bài.")
+        print(f"🔗 Gộp {self.duplicate_count} bài trùng lặp vào {len(self.clusters)} cụm tin.")
+        print(f"Tổng số bài viết sau xử lý: {len(self.cleaned_data)}")
+        if self.ner_cache is not None:
+            self.ner_cache.report()
+        elif self.workers > 1 and self.ner_cache_path:
+            total = self.worker_cache_stats["hits"] + self.worker_cache_stats["misses"]
+            rate = self.worker_cache_stats["hits"] / total if total else 0.0
+            print(f"🗃️ NER cache: {self.worker_cache_stats['hits']} hit, {self.worker_cache_stats['misses']} miss "
+                  f"({rate:.0%} trúng cache, {self.workers} process)")
+
+    def close(self):
+        self.dedup.close()
+        if self.ner_cache is not None:
+            self.ner_cache.close()
+
+
+# ==== Mốc xử lý tăng dần: id lớn nhất của kho bài thô đã được xử lý ====
+WATERMARK_FILENAME = "processdt_watermark.json"
+
+
+def load_watermark(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return int(json.load(f).get("last_id", 0))
+    except FileNotFoundError:
+        return 0
+    except (ValueError, TypeError, AttributeError, json.JSONDecodeError) as e:
+        print(f"⚠️ File mốc xử lý '{path}' không hợp lệ ({e}), xử lý lại từ đầu")
+        return 0
+
+
+def save_watermark(path, last_id):
+    # Ghi ra file tạm rồi đổi tên: dừng giữa chừng không làm hỏng mốc cũ
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"last_id": last_id, "updated": datetime.now().isoformat()}, f)
+    os.replace(path + ".tmp", path)
+
+
+# Mốc mới khi chỉ một phần các bài sau mốc cũ đã được xử lý (vd. pipeline streaming): dời mốc qua dãy id liên tiếp
+# đã xử lý, dừng ở bài đầu tiên chưa xử lý (của producer khác, của lô lỗi trước đó); task process_data của DAG
+# gọi processdt.main ngay sau đó để xử lý nốt các bài từ mốc này
+def contiguous_watermark(store, since_id, processed_ids):
+    last_id = since_id
+    for record_id in store.ids(since_id):
+        if record_id not in processed_ids:
+            break
+        last_id = record_id
+    return last_id
+
+
 # ==== Xử lý toàn bộ file (đây sẽ là hàm main cho Airflow) ====
-def main(input_filename: str = "all_news_combined.json", output_filename: str = "processed_all_news_combined.json"):
+def main(input_filename: str = "all_news_combined.json", output_filename: str = "processed_all_news_combined.json",
+         full: bool = False, workers: int = 1):
     """
     Hàm chính để tiền xử lý dữ liệu.
     Nhận tên file input và output, xử lý từ thư mục 'data' tương đối.
+    Mặc định chỉ xử lý các bài được thêm vào kho bài thô (data/raw) sau lần chạy trước (theo id, lưu trong
+    data/processdt_watermark.json) và file output chỉ chứa phần mới này cho connect_mongo upload.
+    Args:
+        full (bool): Xử lý lại toàn bộ kho và ghi đè file output, vd. sau khi trích xuất lại bài cũ từ kho HTML
+                     (bản mới giữ nguyên id nên không có trong phần mới). connect_mongo upsert theo url nên
+                     upload lại toàn bộ chỉ cập nhật các document đã có, không tạo bản trùng
+        workers (int): Số process tiền xử lý + NER (mỗi process nạp một bản PhoBERT)
     """
     # Đường dẫn data trong môi trường Docker của Airflow
     # /opt/airflow/dags/sic_project/data/
     base_data_path = "/opt/airflow/sic_project/data"
     input_path = os.path.join(base_data_path, input_filename)
     output_path = os.path.join(base_data_path, output_filename)
-
-    if not Path(input_path).exists():
-        print(f"❌ Không tìm thấy file input: {input_path}")
-        return False
-
-    try:
-        with open(input_path, "r", encoding="utf-8") as f:
-            raw_data = json.load(f)
-    except json.JSONDecodeError as e:
-        print(f"❌ Lỗi đọc file JSON '{input_path}': {e}")
-        return False
-    except Exception as e:
-        print(f"❌ Lỗi khi mở file '{input_path}': {e}")
+    raw_store_path = os.path.join(base_data_path, "raw")
+    watermark_path = os.path.join(base_data_path, WATERMARK_FILENAME)
+    store = None
+    since_id = 0
+
+    if RawStore.exists(raw_store_path):
+        # Đọc tuần tự từ kho JSONL của crawler, không nạp toàn bộ file vào bộ nhớ
+        store = RawStore(raw_store_path)
+        since_id = 0 if full else load_watermark(watermark_path)
+        total = store.count(since_id)
+        raw_data = store.iter_records(since_id=since_id)
+        input_path = raw_store_path if not since_id else f"{raw_store_path} (bài có id > {since_id})"
+    else:
+        # File JSON cũ không có id tăng dần: luôn xử lý toàn bộ
+        full = True
+        if not Path(input_path).exists():
+            print(f"❌ Không tìm thấy file input: {input_path}")
+            return False
+
+        try:
+            with open(input_path, "r", encoding="utf-8") as f:
+                raw_data = json.load(f)
+        except json.JSONDecodeError as e:
+            print(f"❌ Lỗi đọc file JSON '{input_path}': {e}")
+            return False
+        except Exception as e:
+            print(f"❌ Lỗi khi mở file '{input_path}': {e}")
+            return False
+        total = len(raw_data)
+
+    print(f"🔍 Đọc {total} bài viết từ {input_path}")
+
+    # Gom các bài cùng một tin (đăng trên nhiều báo) để NER và insert Mongo chỉ chạy một lần mỗi cụm
+    # NER chạy một lần cho cả lô sau khi tiền xử lý xong, theo batch thay vì từng bài một
+    processor = ArticleProcessor(os.path.join(base_data_path, "dedup.sqlite3"), defer_ner=True,
+                                 ner_cache_path=os.path.join(base_data_path, "ner_cache.sqlite3"), workers=workers)
+    last_id = since_id
+
+    def read_articles():
+        nonlocal last_id
+        for article in raw_data:
+            if store is not None:
+                last_id = max(last_id, article.get("id") or 0)
+            yield article
+
+    processor.process_all(read_articles())
+
+    processor.close()
+    if store is not None:
+        store.close()
+
+    processor.report()
+    return save_delta(processor.cleaned_data, output_path, watermark_path if store is not None else None,
+                      last_id, append=not full)
+
+
+# ==== Lưu phần mới và dời mốc xử lý ====
+def save_delta(cleaned_data, output_path, watermark_path=None, last_id=0, append=True):
+    """
+    Args:
+        watermark_path (str): File mốc xử lý, None nếu không ghi mốc
+        last_id (int): Id lớn nhất trong kho bài thô đã được xử lý
+        append (bool): Gộp vào file output nếu file còn đó (chưa được connect_mongo upload và xoá)
+    Returns:
+        bool: True nếu lưu thành công
+    """
+    if append and Path(output_path).exists():
+        # connect_mongo xoá file sau khi upload xong: file còn đó nghĩa là phần mới của lần trước chưa được upload,
+        # ghi nối vào thay vì ghi đè để không mất bài (mốc đã vượt qua các bài đó)
+        try:
+            with open(output_path, "r", encoding="utf-8") as f:
+                pending = json.load(f)
+            print(f"📎 {len(pending)} bài của lần chạy trước chưa được upload, gộp vào file output")
+            cleaned_data = pending + cleaned_data
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠️ Không đọc được file output cũ '{output_path}': {e}")
+
+    if not save_processed(cleaned_data, output_path):
         return False
+    if watermark_path:
+        # Chỉ dời mốc khi phần mới đã được ghi ra file
+        save_watermark(watermark_path, last_id)
+        print(f"📍 Mốc xử lý: id {last_id}")
+    return True
 
-    print(f"🔍 Đọc {len(raw_data)} bài viết từ {input_path}")
-
-    cleaned_data = []
-    processed_count = 0
-    skipped_count = 0
-    for article in raw_data:
-        # Kiểm tra nội dung trước khi xử lý
-        if article.get("content") and article.get("content").strip():
-            processed = preprocess_article(article)
-            if processed:
-                cleaned_data.append(processed)
-                processed_count += 1
-            else:
-                print(f"⚠️ Bỏ qua bài viết ID {article.get('id', 'Unknown')} do lỗi xử lý.")
-                skipped_count += 1
-        else:
-            print(f"ℹ️ Bỏ qua bài viết ID {article.get('id', 'Unknown')} do không có nội dung.")
-            skipped_count += 1
-
-    print(f"✅ Đã xử lý thành công {processed_count} bài viết. Bỏ qua {skipped_count} bài.")
-    print(f"Tổng số bài viết sau xử lý: {len(cleaned_data)}")
 
+# ==== Lưu kết quả tiền xử lý ====
+def save_processed(cleaned_data, output_path):
     try:
         # Tạo thư mục output nếu chưa tồn tại
         Path(output_path).parent.mkdir(parents=True, exist_ok=True)
@@ -200,8 +557,14 @@ if __name__ == "__main__":
 
     # Giữ nguyên như cũ nếu bạn chỉ chạy độc lập từ chính thư mục process_data và muốn nó tự tìm đường dẫn.
     # Tuy nhiên, để test hàm main() như nó sẽ được gọi từ Airflow, nên dùng:
+    parser = argparse.ArgumentParser(description="Tiền xử lý + NER các bài mới trong kho bài thô")
+    parser.add_argument("--full", action="store_true", help="Xử lý lại toàn bộ kho thay vì chỉ các bài mới")
+    parser.add_argument("--workers", type=int, default=1, help="Số process tiền xử lý + NER")
+    args = parser.parse_args()
+
     print("Running processdt.py in standalone mode (for testing)...")
-    success = main(input_filename="all_news_combined.json", output_filename="processed_all_news_combined.json")
+    success = main(input_filename="all_news_combined.json", output_filename="processed_all_news_combined.json",
+                   full=args.full, workers=args.workers)
 
     if success:
         print("✅ Xử lý thành công trong chế độ độc lập.")
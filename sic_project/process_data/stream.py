@@ -0,0 +1,115 @@
+import os
+import queue
+import threading
+import time
+
+from crawl_data.crawl_data import crawl_all_sites
+from crawl_data.paths import get_data_dir
+from crawl_data.raw_store import RawStore
+from model.VPhoBertTaggermaster.test import load_model
+from process_data.processdt import ArticleProcessor, WATERMARK_FILENAME, contiguous_watermark, load_watermark, save_delta
+
+_STOP = object()
+
+
+class StreamingPipeline:
+    """
+    Hàng đợi giới hạn giữa crawler (producer) và các worker tiền xử lý + NER (consumer).
+    Bài được xử lý ngay khi crawl xong thay vì chờ cả lượt crawl kết thúc; khi hàng đợi đầy,
+    put() sẽ chặn nên crawler tự chậm lại theo tốc độ NER.
+    Args:
+        processor (ArticleProcessor): Bộ xử lý dùng chung (gom cụm tin + NER)
+        workers (int): Số thread consumer
+        max_queue (int): Số bài tối đa chờ trong hàng đợi
+    """
+
+    def __init__(self, processor, workers=2, max_queue=100):
+        self.processor = processor
+        self.workers = max(1, workers)
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.threads = []
+        self.latencies = []
+        # URL của mọi bài đã đưa qua processor (kể cả bài bỏ qua, bài trùng), dùng để dời mốc xử lý
+        self.urls = []
+
+    def _consume(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                break
+            enqueued_at, article = item
+            try:
+                self.processor.process(article)
+            except Exception as e:
+                print(f"⚠️ Lỗi khi xử lý bài {article.get('url')}: {e}")
+            self.latencies.append(time.perf_counter() - enqueued_at)
+
+    def start(self):
+        self.threads = [threading.Thread(target=self._consume, daemon=True) for _ in range(self.workers)]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    # Dùng làm on_article của crawl_all_sites
+    def put(self, site, article):
+        self.urls.append(article.get("url"))
+        self.queue.put((time.perf_counter(), article))
+
+    def close(self):
+        for _ in self.threads:
+            self.queue.put(_STOP)
+        for thread in self.threads:
+            thread.join()
+        if self.latencies:
+            print(f"⏱️ Trung bình {sum(self.latencies) / len(self.latencies):.2f}s từ lúc crawl xong tới khi xử lý xong mỗi bài")
+
+
+def crawl_and_process(limit=50, browser_workers=2, consumers=2, max_queue=100,
+                      output_filename="processed_all_news_combined.json", **crawl_kwargs):
+    """
+    Crawl và tiền xử lý/NER cùng lúc: NER (CPU) chạy song song với việc tải trang (mạng).
+    Args:
+        limit (int): Số bài tối đa mỗi trang
+        browser_workers (int): Số Chrome headless chạy song song
+        consumers (int): Số worker tiền xử lý + NER
+        max_queue (int): Kích thước hàng đợi giữa crawler và worker
+        output_filename (str): File kết quả trong thư mục data (cùng định dạng processdt.main)
+    Returns:
+        tuple: (kết quả crawl_all_sites, True nếu lưu kết quả xử lý thành công)
+    """
+    data_dir = get_data_dir()
+    # Nạp model trước khi các consumer chạy để không bị nạp đồng thời nhiều lần
+    load_model()
+
+    processor = ArticleProcessor(os.path.join(data_dir, "dedup.sqlite3"),
+                                 ner_cache_path=os.path.join(data_dir, "ner_cache.sqlite3"))
+    pipeline = StreamingPipeline(processor, workers=consumers, max_queue=max_queue).start()
+    try:
+        results = crawl_all_sites(limit=limit, browser_workers=browser_workers, on_article=pipeline.put, **crawl_kwargs)
+    finally:
+        pipeline.close()
+        processor.close()
+    processor.report()
+
+    # Bài được đưa vào hàng đợi với id tạm theo từng trang, đổi sang id cố định trong kho sau khi lưu
+    watermark_path = os.path.join(data_dir, WATERMARK_FILENAME)
+    store = RawStore()
+    try:
+        ids = store.ids_by_url(pipeline.urls)
+        last_id = contiguous_watermark(store, load_watermark(watermark_path), set(ids.values()))
+    finally:
+        store.close()
+
+    cleaned_data = []
+    for item in processor.cleaned_data:
+        if item["url"] not in ids:
+            # Bài không có trong kho (lưu lỗi): không dùng id tạm vì có thể trùng id thật trong kho,
+            # bài vẫn chưa được đánh dấu đã tải nên sẽ được crawl và xử lý lại ở lượt sau
+            print(f"⚠️ Bỏ qua {item['url']}: không có trong kho bài thô")
+            continue
+        item["id"] = ids[item["url"]]
+        cleaned_data.append(item)
+    cleaned_data.sort(key=lambda item: item["id"])
+
+    # Dời mốc qua các bài đã xử lý ở đây để processdt.main lần sau không xử lý lại
+    return results, save_delta(cleaned_data, os.path.join(data_dir, output_filename), watermark_path, last_id)
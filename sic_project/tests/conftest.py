@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Các module được import theo gói tuyệt đối (from crawl_data.x import ...) như trong DAG: cần thư mục sic_project
+sys.path.insert(0, str(Path(__file__).absolute().parents[1]))
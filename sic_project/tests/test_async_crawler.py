@@ -0,0 +1,141 @@
+# Crawl song song trên một server HTTP cục bộ phục vụ các trang bài viết mẫu (theo cấu hình vnexpress)
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from crawl_data.async_crawler import RateLimiter, crawl_links_concurrently
+
+ARTICLE_PAGE = """<html><head><title>{title}</title></head><body>
+<ul class="breadcrumb"><li><a href="/">Trang chủ</a></li><li><a href="/thoi-su">Thời sự</a></li></ul>
+<span class="date">Thứ hai, 14/7/2025, 10:00 (GMT+7)</span>
+<h1 class="title-detail">{title}</h1>
+<p class="description">Tóm tắt {title}</p>
+<article class="fck_detail"><p>Đoạn một của {title}.</p><p>Đoạn hai của {title}.</p></article>
+</body></html>"""
+EMPTY_PAGE = "<html><body><h1>Trang không có bài viết</h1></body></html>"
+# Mỗi trang được giữ lâu một chút để các request chồng lên nhau
+RESPONSE_DELAY = 0.2
+
+
+class FixtureServer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.request_times = []
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with fixture.lock:
+                    fixture.request_times.append(time.monotonic())
+                    fixture.in_flight += 1
+                    fixture.max_in_flight = max(fixture.max_in_flight, fixture.in_flight)
+                try:
+                    time.sleep(RESPONSE_DELAY)
+                    if self.path == "/khong-ton-tai":
+                        self.send_error(404)
+                        return
+                    if self.path.startswith("/bai-"):
+                        page = ARTICLE_PAGE.format(title=f"Bài {self.path[5:]}")
+                    else:
+                        page = EMPTY_PAGE
+                    body = page.encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/html; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with fixture.lock:
+                        fixture.in_flight -= 1
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def server():
+    with FixtureServer() as fixture_server:
+        yield fixture_server
+
+
+def test_extracts_articles_and_reports_failures(server):
+    links = [f"{server.base_url}/bai-{i}" for i in range(1, 4)] + [f"{server.base_url}/khong-co-bai",
+                                                                   f"{server.base_url}/khong-ton-tai"]
+    results, failed = crawl_links_concurrently({"vnexpress": links}, requests_per_second=0)
+
+    records = sorted(results["vnexpress"], key=lambda record: record["id"])
+    assert [record["id"] for record in records] == [1, 2, 3]
+    assert [record["title"] for record in records] == ["Bài 1", "Bài 2", "Bài 3"]
+    assert records[0]["url"] == links[0]
+    assert records[0]["content"] == "Đoạn một của Bài 1.\nĐoạn hai của Bài 1."
+    assert records[0]["description"] == "Tóm tắt Bài 1"
+    assert records[0]["tags"] == ["Thời sự"]
+    # Trang tải được nhưng thiếu dữ liệu (mở lại bằng trình duyệt) khác với trang tải lỗi (không mở lại)
+    assert failed["vnexpress"] == [(4, links[3], None), (5, links[4], "HTTP 404")]
+
+
+def test_concurrency_per_domain_is_capped(server):
+    links = [f"{server.base_url}/bai-{i}" for i in range(1, 9)]
+    start = time.monotonic()
+    results, _ = crawl_links_concurrently({"vnexpress": links}, concurrency_per_domain=2, requests_per_second=0,
+                                          max_in_flight=8)
+    elapsed = time.monotonic() - start
+
+    assert len(results["vnexpress"]) == 8
+    assert server.max_in_flight == 2
+    # 8 trang, 2 trang cùng lúc: ít nhất 4 lượt chờ server
+    assert elapsed >= 4 * RESPONSE_DELAY
+
+
+def test_requests_are_spaced_by_rate_limit(server):
+    links = [f"{server.base_url}/bai-{i}" for i in range(1, 7)]
+    crawl_links_concurrently({"vnexpress": links}, concurrency_per_domain=6, requests_per_second=10, max_in_flight=6)
+
+    times = sorted(server.request_times)
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    assert len(times) == 6
+    # 10 request/giây: mỗi request bắt đầu cách request trước ít nhất ~0.1s (chừa sai số của bộ hẹn giờ)
+    assert min(gaps) >= 0.08
+
+
+def test_rate_limiter_spacing():
+    async def run():
+        limiter = RateLimiter(20)
+        times = []
+
+        async def request():
+            await limiter.wait()
+            times.append(time.monotonic())
+
+        await asyncio.gather(*(request() for _ in range(5)))
+        return times
+
+    times = sorted(asyncio.run(run()))
+    assert times[-1] - times[0] >= 4 * 0.05 - 0.01
+
+
+def test_rate_limiter_disabled():
+    async def run():
+        limiter = RateLimiter(0)
+        start = time.monotonic()
+        await asyncio.gather(*(limiter.wait() for _ in range(50)))
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) < 0.05
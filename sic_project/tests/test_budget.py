@@ -0,0 +1,92 @@
+# Timeout và số lần thử lại khi tải trang bị giới hạn bởi hạn chót của lượt crawl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from crawl_data.budget import CrawlBudget
+from crawl_data.crawl_data import PAGE_LOAD_TIMEOUT, extract_with_driver, visit_with_retry
+from crawl_data.fetcher import create_session, fetch_html
+
+
+class HangingHandler(BaseHTTPRequestHandler):
+    # Trang không bao giờ trả lời trong thời gian của test
+    def do_GET(self):
+        time.sleep(5)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeDriver:
+    def __init__(self):
+        self.timeouts = []
+        self.visits = 0
+
+    def set_page_load_timeout(self, seconds):
+        self.timeouts.append(seconds)
+
+    def get(self, url):
+        self.visits += 1
+        time.sleep(0.3)
+        raise TimeoutError("page load timeout")
+
+
+def make_budget(tmp_path, deadline_seconds):
+    return CrawlBudget(deadline_seconds, reserve_seconds=0, db_path=str(tmp_path / "budget.sqlite3"))
+
+
+def test_timeout_is_capped_by_remaining_time(tmp_path):
+    assert make_budget(tmp_path, None).timeout(15) == 15
+    assert make_budget(tmp_path, 3).timeout(15) <= 3
+    assert make_budget(tmp_path, 0).timeout(15) == 1.0
+
+
+def test_fetch_html_stops_at_deadline(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), HangingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    budget = make_budget(tmp_path, 1.5)
+    stats = {}
+    start = time.monotonic()
+    try:
+        html = fetch_html(create_session(), f"http://127.0.0.1:{server.server_address[1]}/", timeout=15, stats=stats,
+                          budget=budget)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert html is None
+    # Không có hạn chót: 3 lần x 15s. Có hạn chót 1.5s: lần thử đầu bị cắt, không thử lại sau khi hết giờ
+    assert time.monotonic() - start < 4
+    assert stats["error"] == "deadline"
+
+
+def test_visit_with_retry_uses_budget_timeout(tmp_path):
+    driver = FakeDriver()
+    budget = make_budget(tmp_path, 0.5)
+    stats = {}
+
+    assert not visit_with_retry(driver, "https://example.com", retries=3, delay=0.1, stats=stats, budget=budget)
+    assert driver.visits < 3
+    assert all(timeout <= PAGE_LOAD_TIMEOUT for timeout in driver.timeouts)
+    assert stats["error"] == "deadline"
+
+
+class PageDriver(FakeDriver):
+    # Trang mở được nhưng không có bài viết (vd. trang video)
+    page_source = "<html><body><h1>Video</h1></body></html>"
+
+    def get(self, url):
+        self.visits += 1
+
+
+def test_page_without_article_counts_as_loaded(tmp_path):
+    stats = {}
+    article = extract_with_driver(PageDriver(), "https://vnexpress.net/video-1.html", "vnexpress",
+                                  budget=make_budget(tmp_path, None), stats=stats)
+    assert article is None
+    assert stats["loaded"]
+
+    stats = {}
+    assert extract_with_driver(FakeDriver(), "https://vnexpress.net/bai-1.html", "vnexpress",
+                               budget=make_budget(tmp_path, 0.5), stats=stats) is None
+    assert not stats["loaded"]
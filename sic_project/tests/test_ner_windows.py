@@ -0,0 +1,51 @@
+# Chia cửa sổ NER cho văn bản dài: phủ toàn bộ văn bản, không bắt đầu giữa từ, không sinh quá nhiều cửa sổ
+import math
+
+from model.VPhoBertTaggermaster.windows import merge_window_labels, split_windows
+
+
+def covered(windows, length):
+    positions = set()
+    for start, window in windows:
+        positions.update(range(start, start + len(window)))
+    return positions == set(range(length))
+
+
+def test_short_text_is_one_window():
+    subwords = ["Hà", "Nội"]
+    assert split_windows(subwords) == [(0, subwords)]
+
+
+def test_windows_cover_text_and_start_on_word_boundary():
+    # Từ 3 subword: "a@@ b@@ c"
+    subwords = [piece for _ in range(200) for piece in ("a@@", "b@@", "c")]
+    windows = split_windows(subwords, max_length=256, stride=192)
+    assert covered(windows, len(subwords))
+    for start, _ in windows[1:]:
+        assert not subwords[start - 1].endswith("@@")
+
+
+def test_long_continuation_run_falls_back_to_stride():
+    # 500 subword "@@" liên tiếp (vd. URL dài): không có ranh giới từ, trước đây mỗi cửa sổ chỉ tiến 1 subword
+    subwords = ["x@@"] * 500 + ["y"]
+    windows = split_windows(subwords, max_length=256, stride=192)
+    assert covered(windows, len(subwords))
+    assert len(windows) <= math.ceil((len(subwords) - 254) / 192) + 1
+    assert [start for start, _ in windows] == [0, 192, 384]
+
+
+def test_word_boundary_early_in_stride_does_not_stall():
+    # Ranh giới từ ngay sau subword đầu tiên, phần còn lại là chuỗi "@@" dài
+    subwords = ["a"] + ["x@@"] * 1000 + ["y"]
+    windows = split_windows(subwords, max_length=256, stride=192)
+    assert covered(windows, len(subwords))
+    starts = [start for start, _ in windows]
+    assert all(later - earlier >= 96 for earlier, later in zip(starts, starts[1:]))
+
+
+def test_merge_prefers_central_window_and_repairs_bio():
+    window_labels = [(0, ["O", "B-LOC", "I-LOC", "O"]), (2, ["I-PER", "O", "O", "O"])]
+    labels = merge_window_labels(6, window_labels)
+    # Vị trí 2 nằm giữa cửa sổ đầu hơn cửa sổ sau (ở mép), giữ I-LOC
+    assert labels[:4] == ["O", "B-LOC", "I-LOC", "O"]
+    assert merge_window_labels(3, [(0, ["O", "I-PER", "I-PER"])]) == ["O", "B-PER", "I-PER"]
@@ -0,0 +1,40 @@
+# Kho bài thô: đọc theo thứ tự id kể cả sau khi replace() ghi bản mới vào partition revision-*
+from crawl_data.raw_store import RawStore
+
+
+def test_iter_records_in_id_order_after_replace(tmp_path):
+    store = RawStore(str(tmp_path / "raw"))
+    store.append([{"url": f"https://example.com/{i}", "title": f"v1-{i}"} for i in range(1, 7)])
+    # Trích xuất lại bài 2 và 5 (không theo thứ tự id): bản mới nằm ở partition sau
+    store.replace([{"id": 5, "url": "https://example.com/5", "title": "v2-5"},
+                   {"id": 2, "url": "https://example.com/2", "title": "v2-2"}])
+    store.append([{"url": "https://example.com/7", "title": "v1-7"}])
+
+    records = list(store.iter_records())
+    assert [record["id"] for record in records] == [1, 2, 3, 4, 5, 6, 7]
+    assert records[1]["title"] == "v2-2"
+    assert records[4]["title"] == "v2-5"
+
+    assert [record["id"] for record in store.iter_records(since_id=3)] == [4, 5, 6, 7]
+    assert store.ids(3) == [4, 5, 6, 7]
+    store.close()
+
+
+def test_legacy_records_are_sorted(tmp_path):
+    store = RawStore(str(tmp_path / "raw"))
+    store.import_legacy([{"id": 3, "url": "c"}, {"id": 1, "url": "a"}, {"id": 2, "url": "b"}])
+    store.append([{"url": "d"}])
+    assert [record["url"] for record in store.iter_records()] == ["a", "b", "c", "d"]
+    store.close()
+
+
+def test_legacy_duplicate_urls_keep_first(tmp_path):
+    store = RawStore(str(tmp_path / "raw"))
+    imported = store.import_legacy([{"id": 1, "url": "a", "title": "đầu"}, {"id": 2, "url": "b"},
+                                    {"id": 3, "url": "a", "title": "trùng"}])
+    assert imported == 2
+    assert [(record["id"], record.get("title")) for record in store.iter_records()] == [(1, "đầu"), (2, None)]
+    # Không còn dòng JSONL nào nằm ngoài index
+    with open(tmp_path / "raw" / "legacy.jsonl", encoding="utf-8") as f:
+        assert len(f.readlines()) == 2
+    store.close()
@@ -0,0 +1,49 @@
+# Ghi lại trang bị chuyển hướng: khi phát lại, crawler tìm trang theo URL ban đầu
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from crawl_data.replay import WarcWriter, iter_warc
+
+BODY = "<html><body><h1>Bài 1</h1></body></html>".encode("utf-8")
+
+
+class RedirectHandler(BaseHTTPRequestHandler):
+    # /bai-1 -> /bai-1/ -> /m/bai-1/ (vd. thêm dấu /, rồi chuyển sang bản mobile)
+    def do_GET(self):
+        if self.path in ("/bai-1", "/bai-1/"):
+            self.send_response(301)
+            self.send_header("Location", "/bai-1/" if self.path == "/bai-1" else "/m/bai-1/")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_redirected_page_is_recorded_under_requested_url(tmp_path):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RedirectHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    path = str(tmp_path / "pages.warc.gz")
+    writer = WarcWriter(path)
+    session = requests.Session()
+    session.hooks["response"].append(writer.record_response)
+    try:
+        session.get(f"{base_url}/bai-1", timeout=5)
+    finally:
+        writer.close()
+        session.close()
+        server.shutdown()
+        server.server_close()
+
+    pages = {url: body for url, _, _, _, body in iter_warc(path)}
+    assert set(pages) == {f"{base_url}/bai-1", f"{base_url}/m/bai-1/"}
+    assert pages[f"{base_url}/bai-1"] == BODY
+    assert writer.redirects == {}
@@ -0,0 +1,66 @@
+# Lập lịch crawl: trang danh sách không đổi chỉ bị bỏ qua khi không còn link chưa tải
+from datetime import datetime, timedelta
+
+from crawl_data.discovery import FeedCache
+from crawl_data.frontier import Frontier
+from crawl_data.scheduler import CrawlScheduler, listing_fingerprint
+
+URLS = [f"https://vnexpress.net/bai-{i}.html" for i in range(5)]
+CANDIDATES = [(url, None) for url in URLS]
+
+
+def make(tmp_path):
+    db_path = str(tmp_path / "frontier.sqlite3")
+    frontier = Frontier(db_path)
+    scheduler = CrawlScheduler(db_path=db_path)
+    # Lần crawl trước (1 giờ trước) đã thấy đúng trang danh sách này
+    now = datetime.now()
+    scheduler.record([{"site": "vnexpress", "action": "crawl", "fingerprint": listing_fingerprint(URLS),
+                       "rate_per_hour": 1.0}], now=now - timedelta(hours=1))
+    return frontier, scheduler, now
+
+
+def test_unchanged_listing_without_pending_links_is_skipped(tmp_path):
+    frontier, scheduler, now = make(tmp_path)
+    frontier.seed(URLS)
+    entry = scheduler.plan_site("vnexpress", CANDIDATES, frontier, 50, now)
+    assert entry["action"] == "skip"
+    assert entry["reason"] == "trang danh sách không đổi"
+
+
+def test_unchanged_listing_with_pending_links_is_crawled(tmp_path):
+    frontier, scheduler, now = make(tmp_path)
+    # 3 bài đã lưu, 2 bài bị cắt vì hết giờ (vẫn "discovered") ở lượt trước
+    frontier.seed(URLS[:3])
+    frontier.mark_discovered("vnexpress", URLS[3:])
+    entry = scheduler.plan_site("vnexpress", CANDIDATES, frontier, 50, now)
+    assert entry["action"] == "crawl"
+    assert entry["new_links"] == 2
+
+
+def test_failed_links_under_max_attempts_are_retried(tmp_path):
+    frontier, scheduler, now = make(tmp_path)
+    frontier.seed(URLS[1:])
+    frontier.mark_fetched("vnexpress", URLS[0], False, "missing title/content")
+    entry = scheduler.plan_site("vnexpress", CANDIDATES, frontier, 50, now)
+    assert entry["action"] == "crawl"
+    assert entry["new_links"] == 1
+
+
+def test_read_only_feed_cache_does_not_persist(tmp_path):
+    db_path = str(tmp_path / "frontier.sqlite3")
+    cache = FeedCache(db_path)
+    cache.put("https://vnexpress.net/rss", "etag-1", None, CANDIDATES)
+    cache.close()
+
+    # Xem trước lịch (dry-run): ETag mới chỉ dùng trong lượt xem, lượt crawl thật vẫn thấy ETag cũ
+    preview = FeedCache(db_path, read_only=True)
+    preview.put("https://vnexpress.net/rss", "etag-2", None, CANDIDATES[:1])
+    assert preview.get("https://vnexpress.net/rss")[0] == "etag-2"
+    preview.close()
+
+    cache = FeedCache(db_path)
+    etag, _, items = cache.get("https://vnexpress.net/rss")
+    cache.close()
+    assert etag == "etag-1"
+    assert items == CANDIDATES